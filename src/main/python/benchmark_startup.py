@@ -0,0 +1,60 @@
+"""Startup time benchmark for merchant_comparison.py
+
+Runs the command line entry points in fresh interpreters and reports the
+median wall time of each. Usage:
+
+    python3 benchmark_startup.py [--repeat N] [--piggy FILE --ctx FILE]
+
+With --piggy/--ctx a small geocoding-free comparison is timed as well.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "merchant_comparison.py")
+
+# Importing the module must not pull in the heavy dependencies
+IMPORT_CHECK = (
+    "import sys; sys.path.insert(0, {dir!r}); import merchant_comparison; "
+    "loaded = [m for m in ('pandas', 'numpy', 'geopy', 'tkinter') if m in sys.modules]; "
+    "sys.exit('eagerly imported: ' + ', '.join(loaded) if loaded else 0)"
+).format(dir=os.path.dirname(SCRIPT))
+
+def time_command(args, repeat):
+    """Median wall time of running args in a fresh process"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="runs per command (default: %(default)s)")
+    parser.add_argument('--piggy', help="Piggy CSV file for the comparison run")
+    parser.add_argument('--ctx', help="CTX CSV file for the comparison run")
+    args = parser.parse_args()
+
+    commands = [
+        ("import", [sys.executable, "-c", IMPORT_CHECK]),
+        ("--version", [sys.executable, SCRIPT, "--version"]),
+        ("--help", [sys.executable, SCRIPT, "--help"]),
+        ("compare --help", [sys.executable, SCRIPT, "compare", "--help"]),
+    ]
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        if args.piggy and args.ctx:
+            commands.append(("compare", [sys.executable, SCRIPT, "compare", args.piggy, args.ctx,
+                                         "-o", output_dir, "--no-resume"]))
+
+        print(f"{'command':<20} {'median':>10}")
+        for label, command in commands:
+            print(f"{label:<20} {time_command(command, args.repeat):>9.3f}s")
+
+if __name__ == "__main__":
+    main()
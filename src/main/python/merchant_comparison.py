@@ -1,34 +1,94 @@
-import pandas as pd
-import numpy as np
 import math
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
-from difflib import SequenceMatcher
 import os
 import sys
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+import argparse
+import importlib
+import importlib.util
+import multiprocessing
+import concurrent.futures
 import threading
+import collections
+import queue
 import json
+import hashlib
+import pickle
+import shutil
+import gzip
+import zlib
+import io
+import csv
+import tempfile
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
 import re
+import difflib
+import itertools
 import time
 from datetime import datetime
 
-# Initialize geocoder globally with rate limiting
-geocoder = Nominatim(user_agent="MerchantComparison_v3", timeout=5)  # Reduced timeout
+__version__ = "3.0.1"
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access.
+
+    pandas, numpy, tkinter and friends take most of the startup time, so they
+    are only loaded once a job or the GUI actually needs them; --version,
+    --help and the worker start-up stay fast.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if attr in ('_name', '_module'):
+            raise AttributeError(attr)
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+tk = LazyModule('tkinter')
+filedialog = LazyModule('tkinter.filedialog')
+messagebox = LazyModule('tkinter.messagebox')
+ttk = LazyModule('tkinter.ttk')
+pl = LazyModule('polars')
+
+# How often the GUI drains worker events, and how many it handles per tick
+EVENT_POLL_INTERVAL_MS = 100
+MAX_EVENTS_PER_POLL = 500
+# How long a cancelled worker gets to stop before it is terminated
+CANCEL_GRACE_SECONDS = 5
+
+# Geocoder is created on first use so runs without reverse geocoding never import geopy
+_geocoder = None
+# Shortest time between two reverse geocoding requests: Nominatim's usage policy allows one per second
+GEOCODING_MIN_DELAY_SECONDS = 1.0
+
+def get_geocoder():
+    """Nominatim reverse geocoding function, rate limited to one request per GEOCODING_MIN_DELAY_SECONDS
+    across threads and created on first use; raises RuntimeError if geopy is not installed"""
+    global _geocoder
+    if _geocoder is None:
+        if missing_packages(['geopy']):
+            raise RuntimeError("Reverse geocoding needs geopy. Please install it using:\npip install geopy")
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+        geocoder = Nominatim(user_agent="MerchantComparison_v3", timeout=5)  # Reduced timeout
+        _geocoder = RateLimiter(geocoder.reverse, min_delay_seconds=GEOCODING_MIN_DELAY_SECONDS)
+    return _geocoder
 
 @lru_cache(maxsize=5000)  # Increased cache size
 def reverse_geocode_cached(lat, lon):
     """Cached reverse geocoding to get city and state from coordinates"""
+    reverse = get_geocoder()
     try:
         # Round coordinates to reduce cache misses while maintaining accuracy
         rounded_lat = round(float(lat), 3)  # Reduced precision for better caching
         rounded_lon = round(float(lon), 3)
         
-        location = geocoder.reverse((rounded_lat, rounded_lon), exactly_one=True)
+        location = reverse((rounded_lat, rounded_lon), exactly_one=True)
         
         if location and location.address:
             address_parts = location.raw.get('address', {})
@@ -53,26 +113,109 @@ def reverse_geocode_cached(lat, lon):
     
     return '', ''
 
-def batch_reverse_geocode(coordinates, progress_callback=None):
-    """Process multiple coordinates in batch with progress tracking"""
-    results = []
-    total = len(coordinates)
-    
-    for i, (lat, lon) in enumerate(coordinates):
-        if pd.notna(lat) and pd.notna(lon):
-            city, state = reverse_geocode_cached(lat, lon)
-            results.append((city, state))
-        else:
-            results.append(('', ''))
-        
-        # Update progress
-        if progress_callback and (i + 1) % 10 == 0:  # Update every 10 records
-            progress_callback(i + 1, total)
-        
-        # Reduced sleep time for faster processing
-        time.sleep(0.05)  # 50ms instead of 100ms
-    
-    return results
+class ReverseGeocodingPipeline:
+    """Reverse geocodes locations in a background thread while the caller keeps working.
+
+    Locations are rounded as reverse_geocode_cached rounds them, so each distinct
+    one is looked up once, and are worked through in the order given.
+    prioritize() moves locations to the front; location() waits for one
+    location's result, moving it to the front if it is still queued. Lookups
+    are rate limited by get_geocoder. Use as a context manager.
+    """
+
+    def __init__(self, coordinates):
+        get_geocoder()  # fail here, not in the thread, if geopy is missing
+        self._pending = collections.OrderedDict()
+        self._results = {}
+        self._in_flight = None
+        self._closed = False
+        self._stopped = False
+        self._error = None
+        self._condition = threading.Condition()
+        for key in itertools.starmap(self._key, coordinates):
+            if key is not None:
+                self._pending[key] = None
+        self._thread = threading.Thread(target=self._run, name='reverse-geocoding', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _key(lat, lon):
+        if pd.isna(lat) or pd.isna(lon):
+            return None
+        return round(float(lat), 3), round(float(lon), 3)
+
+    def lookups(self):
+        """Number of locations looked up so far"""
+        with self._condition:
+            return len(self._results)
+
+    def _run(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._pending and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        return
+                    key, _ = self._pending.popitem(last=False)
+                    self._in_flight = key
+                result = reverse_geocode_cached(*key)
+                with self._condition:
+                    self._results[key] = result
+                    self._in_flight = None
+                    self._condition.notify_all()
+        except Exception as e:
+            with self._condition:
+                self._error = e
+        finally:
+            # Wake callers waiting in location() so they see the thread has stopped
+            with self._condition:
+                self._in_flight = None
+                self._stopped = True
+                self._condition.notify_all()
+
+    def prioritize(self, coordinates):
+        """Look up these locations next, in this order"""
+        keys = [key for key in itertools.starmap(self._key, coordinates) if key is not None]
+        with self._condition:
+            for key in reversed(keys):
+                if key in self._pending:
+                    self._pending.move_to_end(key, last=False)
+
+    def location(self, lat, lon):
+        """(city, state) of a location, as reverse_geocode_cached returns it.
+
+        Waits as long as the lookup thread runs: the location is looked up
+        next, and each lookup ends within the geocoder's timeout. Returns ('', '')
+        once the pipeline is closed; raises RuntimeError if the lookup thread failed.
+        """
+        key = self._key(lat, lon)
+        if key is None:
+            return '', ''
+        with self._condition:
+            while key not in self._results:
+                if self._error is not None:
+                    raise RuntimeError(f"Reverse geocoding failed: {self._error}") from self._error
+                if self._closed or self._stopped:
+                    return '', ''
+                if key != self._in_flight:
+                    self._pending[key] = None
+                    self._pending.move_to_end(key, last=False)
+                    self._condition.notify_all()
+                self._condition.wait()
+            return self._results[key]
+
+    def close(self):
+        """Stop looking up queued locations"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
 
 def clean_name_advanced_cached(name):
     """Cached version of advanced name cleaning for better performance"""
@@ -108,9 +251,11 @@ def advanced_name_similarity_cached(name1, name2):
     if not name1 or not name2:
         return 0.0
     
-    clean1 = clean_name_advanced_cached(name1)
-    clean2 = clean_name_advanced_cached(name2)
-    
+    return cleaned_name_similarity(clean_name_advanced_cached(name1), clean_name_advanced_cached(name2))
+
+@lru_cache(maxsize=50000)
+def cleaned_name_similarity(clean1, clean2):
+    """Name similarity of two names already passed through clean_name_advanced_cached"""
     if not clean1 or not clean2:
         return 0.0
     
@@ -124,7 +269,7 @@ def advanced_name_similarity_cached(name1, name2):
         return 0.0
     
     # Sequence matcher
-    seq_sim = SequenceMatcher(None, clean1, clean2).ratio()
+    seq_sim = difflib.SequenceMatcher(None, clean1, clean2).ratio()
     
     # Early exit if sequence similarity is very low
     if seq_sim < 0.3:
@@ -148,12 +293,10 @@ def advanced_name_similarity_cached(name1, name2):
 
 def haversine_vectorized(lat1, lon1, lat2_array, lon2_array):
     """Vectorized haversine distance calculation"""
-    # Convert to radians
-    lat1_rad = np.radians(lat1)
-    lon1_rad = np.radians(lon1)
-    lat2_rad = np.radians(lat2_array)
-    lon2_rad = np.radians(lon2_array)
-    
+    return haversine_radians(np.radians(lat1), np.radians(lon1), np.radians(lat2_array), np.radians(lon2_array))
+
+def haversine_radians(lat1_rad, lon1_rad, lat2_rad, lon2_rad):
+    """haversine_vectorized of coordinates already in radians"""
     # Haversine formula
     dlat = lat2_rad - lat1_rad
     dlon = lon2_rad - lon1_rad
@@ -163,24 +306,6 @@ def haversine_vectorized(lat1, lon1, lat2_array, lon2_array):
     # Earth's radius in miles
     return 3959 * c
 
-def spatial_index_filter(piggy_lat, piggy_lon, ctx_df, max_distance_miles):
-    """Fast spatial filtering using bounding box"""
-    # Approximate degrees per mile
-    lat_deg_per_mile = 1 / 69.0
-    lon_deg_per_mile = 1 / (69.0 * np.cos(np.radians(piggy_lat)))
-    
-    # Create bounding box
-    lat_min = piggy_lat - (max_distance_miles * lat_deg_per_mile)
-    lat_max = piggy_lat + (max_distance_miles * lat_deg_per_mile)
-    lon_min = piggy_lon - (max_distance_miles * lon_deg_per_mile)
-    lon_max = piggy_lon + (max_distance_miles * lon_deg_per_mile)
-    
-    # Filter using bounding box
-    mask = ((ctx_df['latitude'] >= lat_min) & (ctx_df['latitude'] <= lat_max) & 
-            (ctx_df['longitude'] >= lon_min) & (ctx_df['longitude'] <= lon_max))
-    
-    return ctx_df[mask].copy()
-
 @lru_cache(maxsize=3000)
 def cities_match_enhanced(city1, city2):
     """Enhanced city matching with common abbreviations"""
@@ -212,6 +337,30 @@ def cities_match_enhanced(city1, city2):
     
     return c1 == c2
 
+# Full US state names and their abbreviations
+STATE_ABBREVIATIONS = {
+    'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR',
+    'CALIFORNIA': 'CA', 'COLORADO': 'CO', 'CONNECTICUT': 'CT', 'DELAWARE': 'DE',
+    'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI', 'IDAHO': 'ID',
+    'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
+    'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD',
+    'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS',
+    'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV',
+    'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM', 'NEW YORK': 'NY',
+    'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
+    'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC',
+    'SOUTH DAKOTA': 'SD', 'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT',
+    'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA', 'WEST VIRGINIA': 'WV',
+    'WISCONSIN': 'WI', 'WYOMING': 'WY'
+}
+
+def normalize_state(state):
+    """Upper-case state abbreviation of a state name or abbreviation, '' if missing"""
+    if pd.isna(state):
+        return ''
+    state = str(state).upper().strip()
+    return STATE_ABBREVIATIONS.get(state, state)
+
 @lru_cache(maxsize=500)
 def states_match_enhanced(state1, state2):
     """Enhanced state matching with abbreviations"""
@@ -225,28 +374,8 @@ def states_match_enhanced(state1, state2):
     if s1 == s2:
         return True
     
-    # State abbreviation mapping
-    state_abbrevs = {
-        'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR',
-        'CALIFORNIA': 'CA', 'COLORADO': 'CO', 'CONNECTICUT': 'CT', 'DELAWARE': 'DE',
-        'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI', 'IDAHO': 'ID',
-        'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
-        'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD',
-        'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS',
-        'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV',
-        'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM', 'NEW YORK': 'NY',
-        'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
-        'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC',
-        'SOUTH DAKOTA': 'SD', 'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT',
-        'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA', 'WEST VIRGINIA': 'WV',
-        'WISCONSIN': 'WI', 'WYOMING': 'WY'
-    }
-    
     # Convert full names to abbreviations
-    s1_abbrev = state_abbrevs.get(s1, s1)
-    s2_abbrev = state_abbrevs.get(s2, s2)
-    
-    return s1_abbrev == s2_abbrev
+    return normalize_state(s1) == normalize_state(s2)
 
 @lru_cache(maxsize=2000)
 def cities_match(city1, city2):
@@ -274,106 +403,638 @@ def zip_codes_match(zip1, zip2):
     except:
         return False
 
-@lru_cache(maxsize=5000)
-def street_address_similarity(addr1, addr2):
-    """Extract and compare only street address components"""
-    if pd.isna(addr1) or pd.isna(addr2) or not addr1 or not addr2:
-        return 0.0
+def extract_street_address(address):
+    """Extract street address by removing city, state, zip patterns"""
+    addr = str(address).strip()
     
-    def extract_street_address(address):
-        """Extract street address by removing city, state, zip patterns"""
-        addr = str(address).strip()
-        
-        # Remove zip codes from the end using a simple approach
-        if ',' in addr:
-            parts = addr.split(',')
-            # Check if last part looks like zip code
-            last_part = parts[-1].strip()
-            if last_part.replace('-', '').isdigit() and (len(last_part) == 5 or len(last_part) == 10):
+    # Remove zip codes from the end using a simple approach
+    if ',' in addr:
+        parts = addr.split(',')
+        # Check if last part looks like zip code
+        last_part = parts[-1].strip()
+        if last_part.replace('-', '').isdigit() and (len(last_part) == 5 or len(last_part) == 10):
+            parts = parts[:-1]
+        # Check if second to last looks like state
+        if len(parts) > 1:
+            second_last = parts[-1].strip()
+            if len(second_last) == 2 and second_last.isalpha():
                 parts = parts[:-1]
-            # Check if second to last looks like state
-            if len(parts) > 1:
-                second_last = parts[-1].strip()
-                if len(second_last) == 2 and second_last.isalpha():
-                    parts = parts[:-1]
-            addr = ','.join(parts)
-        
-        # Take first part before any comma
-        street_addr = addr.split(',')[0].strip()
-        return street_addr
+        addr = ','.join(parts)
     
-    street1 = extract_street_address(addr1)
-    street2 = extract_street_address(addr2)
+    # Take first part before any comma
+    street_addr = addr.split(',')[0].strip()
+    return street_addr
+
+UNIT_PATTERN = re.compile(r'(?:\b(?:apt|apartment|suite|ste|unit|fl|floor)\b\.?|#)\s*([a-z0-9-]+)')
+HOUSE_NUMBER_PATTERN = re.compile(r'^\d+[a-z]?$')
+
+@lru_cache(maxsize=200000)
+def parse_street_address(address):
+    """Parse a street address once into (normalized street, house number, street tokens, unit).
+
+    The normalized street is what street_address_similarity compares; it is None
+    when no street part can be extracted.
+    """
+    if pd.isna(address) or not address:
+        return None, '', (), ''
     
-    if not street1 or not street2:
-        return 0.0
+    street = extract_street_address(address)
+    if not street:
+        return None, '', (), ''
+    
+    lowered = street.lower()
+    unit_match = UNIT_PATTERN.search(lowered)
+    unit = unit_match.group(1) if unit_match else ''
     
     # Normalize for comparison
-    street1 = re.sub(r'[^\w\s]', ' ', street1.lower())
-    street2 = re.sub(r'[^\w\s]', ' ', street2.lower())
-    street1 = re.sub(r'\s+', ' ', street1).strip()
-    street2 = re.sub(r'\s+', ' ', street2).strip()
-    
-    return SequenceMatcher(None, street1, street2).ratio()
-
-def truncate_coordinates(lat, lon, precision):
-    """Truncate coordinates to specified decimal places instead of rounding"""
-    if pd.isna(lat) or pd.isna(lon):
-        return None, None
-    
-    # Convert to float and truncate by multiplying, flooring, then dividing
-    multiplier = 10 ** precision
-    truncated_lat = math.floor(float(lat) * multiplier) / multiplier
-    truncated_lon = math.floor(float(lon) * multiplier) / multiplier
-    
-    return truncated_lat, truncated_lon
-
-def coordinate_priority_matching(piggy_df, ctx_df, coordinate_precision, max_distance_miles=0.5, ignore_name = False, min_name_sim = 0.90):
-    """Primary coordinate-based matching with exact precision using truncation"""
-    coordinate_matches = []
-    
-    # Create coordinate lookup for CTX data using truncation
-    ctx_coord_lookup = {}
-    for idx, row in ctx_df.iterrows():
-        truncated_lat, truncated_lon = truncate_coordinates(row['latitude'], row['longitude'], coordinate_precision)
-        if truncated_lat is not None and truncated_lon is not None:
-            coord_key = (truncated_lat, truncated_lon)
-            if coord_key not in ctx_coord_lookup:
-                ctx_coord_lookup[coord_key] = []
-            ctx_coord_lookup[coord_key].append(idx)
-    
-    # Find exact coordinate matches using truncation
-    for piggy_idx, piggy_row in piggy_df.iterrows():
-        truncated_lat, truncated_lon = truncate_coordinates(piggy_row['latitude'], piggy_row['longitude'], coordinate_precision)
-        if truncated_lat is not None and truncated_lon is not None:
-            coord_key = (truncated_lat, truncated_lon)
-            if coord_key in ctx_coord_lookup:
-                for ctx_idx in ctx_coord_lookup[coord_key]:
-                    ctx_row = ctx_df.iloc[ctx_idx]
-                    
-                    # Calculate exact distance
-                    distance = haversine_vectorized(
-                        piggy_row['latitude'], piggy_row['longitude'],
-                        np.array([ctx_row['latitude']]), np.array([ctx_row['longitude']])
-                    )[0]
-
-                    name_sim = advanced_name_similarity_cached(piggy_row['name'], ctx_row['name'])
-                    if ignore_name:
-                        meets_name_sim = True
-                    else:
-                        meets_name_sim = name_sim >= min_name_sim
-                    
-                    # Only include if within max distance
-                    if distance <= max_distance_miles and meets_name_sim:
-                        coordinate_matches.append({
-                            'piggy_index': piggy_idx,
-                            'ctx_index': ctx_idx,
-                            'distance_miles': distance,
-                            'match_type': 'COORDINATE_EXACT',
-                            'coordinate_precision': coordinate_precision
-                        })
-    
-    return coordinate_matches
+    normalized = re.sub(r'[^\w\s]', ' ', lowered)
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    
+    tokens = normalized.split()
+    house_number = tokens[0] if tokens and HOUSE_NUMBER_PATTERN.match(tokens[0]) else ''
+    street_tokens = tuple(tokens[1:] if house_number else tokens)
+    
+    return normalized, house_number, street_tokens, unit
+
+def parse_street_addresses(addresses):
+    """Per-dataset parsing pass over an address column.
+
+    Returns the normalized streets (list) and house numbers (object array, '' when
+    missing) so candidate pairs can be pruned and compared without re-parsing.
+    """
+    parsed = [parse_street_address(address) for address in addresses]
+    streets = [entry[0] for entry in parsed]
+    house_numbers = np.array([entry[1] for entry in parsed], dtype=object)
+    return streets, house_numbers
+
+def coordinate_radians(df):
+    """Latitudes and longitudes of a dataset in radians, taken from its snapshot when it has them"""
+    if '_latitude_radians' in df:
+        return df['_latitude_radians'].to_numpy(dtype=float), df['_longitude_radians'].to_numpy(dtype=float)
+    return np.radians(df['latitude'].to_numpy(dtype=float)), np.radians(df['longitude'].to_numpy(dtype=float))
+
+def clean_names(df):
+    """Cleaned names of a dataset, taken from its snapshot when it has them"""
+    if '_clean_name' in df:
+        return df['_clean_name'].tolist()
+    return [clean_name_advanced_cached(name) for name in df['name']]
+
+def factorize_names(piggy_names, ctx_names):
+    """Integer IDs for the cleaned names of both datasets over one shared vocabulary.
+
+    Returns (piggy_ids, ctx_ids, vocabulary) with vocabulary[id] the cleaned name.
+    """
+    vocabulary = {}
+    piggy_ids = np.array([vocabulary.setdefault(name, len(vocabulary)) for name in piggy_names], dtype=np.int64)
+    ctx_ids = np.array([vocabulary.setdefault(name, len(vocabulary)) for name in ctx_names], dtype=np.int64)
+    return piggy_ids, ctx_ids, list(vocabulary)
+
+def score_name_pairs(piggy_ids, ctx_ids, vocabulary, scores):
+    """cleaned_name_similarity of each (piggy id, ctx id) pair, computed once per distinct pair.
+
+    scores maps pair codes (piggy id * len(vocabulary) + ctx id) to similarities
+    and is extended in place, so a chain's name pair is scored once per run.
+    """
+    codes = piggy_ids * len(vocabulary) + ctx_ids
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    unique_scores = np.empty(len(unique_codes))
+    for n, code in enumerate(unique_codes.tolist()):
+        score = scores.get(code)
+        if score is None:
+            piggy_id, ctx_id = divmod(code, len(vocabulary))
+            score = scores[code] = cleaned_name_similarity(vocabulary[piggy_id], vocabulary[ctx_id])
+        unique_scores[n] = score
+    return unique_scores[inverse.reshape(-1)]
+
+# MinHash LSH over character shingles of cleaned names: NAME_LSH_BANDS bands of
+# NAME_LSH_ROWS hashes. Two names share a band with probability ~0.98 when their
+# shingle sets have Jaccard similarity 0.5, ~0.58 at 0.3 and ~0.03 at 0.1.
+NAME_SHINGLE_SIZE = 3
+NAME_LSH_BANDS = 32
+NAME_LSH_ROWS = 3
+MINHASH_PRIME = (1 << 31) - 1
+# Names hashed per numpy call when computing signatures
+MINHASH_CHUNK_NAMES = 2048
+
+def name_shingle_hashes(name):
+    """CRC-32 of the character shingles of a cleaned name, padded so word ends count"""
+    padded = f" {name} "
+    return {zlib.crc32(padded[i:i + NAME_SHINGLE_SIZE].encode('utf-8'))
+            for i in range(len(padded) - NAME_SHINGLE_SIZE + 1)}
+
+def minhash_band_keys(names):
+    """LSH band keys of non-empty cleaned names, shape (NAME_LSH_BANDS, len(names)).
+
+    The MinHash functions are (a * h + b) mod MINHASH_PRIME with fixed seeds and
+    each band's hashes are folded into one 64-bit key, so keys are the same in
+    every process and on every machine.
+    """
+    num_hashes = NAME_LSH_BANDS * NAME_LSH_ROWS
+    rng = np.random.default_rng(0)
+    a = rng.integers(1, MINHASH_PRIME, num_hashes, dtype=np.uint64)
+    b = rng.integers(0, MINHASH_PRIME, num_hashes, dtype=np.uint64)
+    multipliers = rng.integers(1, 1 << 63, NAME_LSH_ROWS, dtype=np.uint64) | np.uint64(1)
+
+    signatures = np.empty((len(names), num_hashes), dtype=np.uint64)
+    for start in range(0, len(names), MINHASH_CHUNK_NAMES):
+        shingles = [np.fromiter(name_shingle_hashes(name), dtype=np.uint64)
+                    for name in names[start:start + MINHASH_CHUNK_NAMES]]
+        lengths = np.fromiter(map(len, shingles), dtype=np.int64, count=len(shingles))
+        values = (np.concatenate(shingles)[:, None] % np.uint64(MINHASH_PRIME) * a + b) % np.uint64(MINHASH_PRIME)
+        signatures[start:start + len(shingles)] = np.minimum.reduceat(values, np.cumsum(lengths) - lengths, axis=0)
+
+    # Products wrap around modulo 2**64
+    bands = signatures.reshape(len(names), NAME_LSH_BANDS, NAME_LSH_ROWS)
+    return (bands * multipliers).sum(axis=2, dtype=np.uint64).T
+
+@lru_cache(maxsize=50000)
+def name_band_keys(name):
+    """minhash_band_keys of one cleaned name as a tuple, empty for an empty name"""
+    if not name:
+        return ()
+    return tuple(minhash_band_keys([name])[:, 0].tolist())
+
+def name_lsh_pairs(piggy_ids, ctx_ids, vocabulary):
+    """Sorted codes (piggy id * len(vocabulary) + ctx id) of the distinct name pairs
+    of factorize_names IDs that share at least one LSH band; empty names never do"""
+    size = len(vocabulary)
+    piggy_vocab = np.array([i for i in np.unique(piggy_ids).tolist() if vocabulary[i]], dtype=np.int64)
+    ctx_vocab = np.array([i for i in np.unique(ctx_ids).tolist() if vocabulary[i]], dtype=np.int64)
+    if len(piggy_vocab) == 0 or len(ctx_vocab) == 0:
+        return np.empty(0, dtype=np.int64)
+    used = np.union1d(piggy_vocab, ctx_vocab)
+    keys = minhash_band_keys([vocabulary[i] for i in used.tolist()])
+    piggy_rows = np.searchsorted(used, piggy_vocab)
+    ctx_rows = np.searchsorted(used, ctx_vocab)
+
+    codes = []
+    for band_keys in keys:
+        ctx_keys = band_keys[ctx_rows]
+        order = np.argsort(ctx_keys, kind='stable')
+        sorted_keys = ctx_keys[order]
+        piggy_keys = band_keys[piggy_rows]
+        first = np.searchsorted(sorted_keys, piggy_keys, side='left')
+        counts = np.searchsorted(sorted_keys, piggy_keys, side='right') - first
+        if not counts.any():
+            continue
+        # Every CTX name in the Piggy name's bucket
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_ctx = ctx_vocab[order[np.repeat(first, counts) + offsets]]
+        codes.append(np.unique(np.repeat(piggy_vocab, counts) * size + pair_ctx))
+    if not codes:
+        return np.empty(0, dtype=np.int64)
+    return np.unique(np.concatenate(codes))
+
+def sorted_membership(sorted_values, values):
+    """Mask of the values found in the sorted array sorted_values"""
+    positions = np.searchsorted(sorted_values, values)
+    found = positions < len(sorted_values)
+    found[found] = sorted_values[positions[found]] == values[found]
+    return found
+
+def street_features(df):
+    """parse_street_addresses of a dataset, taken from its snapshot when it has them"""
+    if '_street' in df:
+        streets = df['_street'].astype(object)
+        return streets.where(streets.notna(), None).tolist(), df['_house_number'].to_numpy(dtype=object)
+    return parse_street_addresses(df['address1'])
+
+def house_number_mask(house_number, other_house_numbers):
+    """Candidates whose house number does not clearly differ (equal, or either one missing)"""
+    if not house_number:
+        return np.ones(len(other_house_numbers), dtype=bool)
+    return (other_house_numbers == house_number) | (other_house_numbers == '')
+
+@lru_cache(maxsize=200000)
+def street_pair_similarity(street1, street2):
+    """Similarity of two normalized streets from parse_street_address"""
+    if street1 is None or street2 is None:
+        return 0.0
+    
+    # Exact-address hit needs no fuzzy comparison
+    if street1 == street2:
+        return 1.0
+    
+    return difflib.SequenceMatcher(None, street1, street2).ratio()
+
+def street_address_similarity(addr1, addr2):
+    """Extract and compare only street address components"""
+    if pd.isna(addr1) or pd.isna(addr2) or not addr1 or not addr2:
+        return 0.0
+    
+    return street_pair_similarity(parse_street_address(addr1)[0], parse_street_address(addr2)[0])
+
+# Finest level of the coordinate cascade in decimal places (cells of about 0.1 m)
+COORDINATE_CASCADE_FINEST = 6
+
+def coordinate_cell_levels(lat1, lon1, lat2, lon2, settings):
+    """Precision (decimal places) at which each pair of locations is co-located; 0 where it is not.
+
+    Without the coordinate cascade a pair is co-located at coordinate_precision
+    when its coordinates truncated (floored) to that many decimal places are the same.
+    With it, integer cell keys are computed once at COORDINATE_CASCADE_FINEST
+    and coarsened by integer division one decimal place at a time down to
+    coordinate_precision; a pair is co-located at the finest level at which its
+    cells are the same or neighbours, so points just across a cell edge match.
+    """
+    coarsest = settings['coordinate_precision']
+    if not settings.get('coordinate_cascade'):
+        multiplier = 10 ** coarsest
+        same_cell = ((np.floor(np.asarray(lat1) * multiplier) == np.floor(np.asarray(lat2) * multiplier)) &
+                     (np.floor(np.asarray(lon1) * multiplier) == np.floor(np.asarray(lon2) * multiplier)))
+        return np.where(same_cell, coarsest, 0)
+
+    finest = max(COORDINATE_CASCADE_FINEST, coarsest)
+    cells = [np.floor(np.asarray(value, dtype=float) * 10 ** finest).astype(np.int64)
+             for value in (lat1, lon1, lat2, lon2)]
+    levels = np.zeros(np.broadcast(*cells).shape, dtype=np.int64)
+    for level in range(finest, coarsest - 1, -1):
+        neighbours = (np.abs(cells[0] - cells[2]) <= 1) & (np.abs(cells[1] - cells[3]) <= 1)
+        levels[(levels == 0) & neighbours] = level
+        cells = [cell // 10 for cell in cells]
+    return levels
+
+def finest_per_row(row_index, levels):
+    """Mask of the entries whose level is the finest among the entries of their row"""
+    if not len(levels):
+        return np.zeros(0, dtype=bool)
+    _, inverse = np.unique(row_index, return_inverse=True)
+    finest = np.zeros(inverse.max() + 1, dtype=levels.dtype)
+    np.maximum.at(finest, inverse, levels)
+    return levels == finest[inverse]
+
+# Open Location Code (plus code) digits; a code alternates latitude and longitude digits in base 20
+PLUS_CODE_ALPHABET = "23456789CFGHJMPQRVWX"
+PLUS_CODE_DIGIT = {char: value for value, char in enumerate(PLUS_CODE_ALPHABET)}
+FULL_PLUS_CODE_PATTERN = re.compile(r'^([23456789CFGHJMPQRVWX]{8})\+([23456789CFGHJMPQRVWX]{2})', re.IGNORECASE)
+# Plus code prefix lengths that can be joined on
+PLUS_CODE_LENGTHS = (2, 4, 6, 8, 10)
+
+def parse_plus_code_lengths(text):
+    """Plus code prefix lengths to join on, finest first (even lengths from 2 to 10)"""
+    lengths = sorted({int(part) for part in str(text).replace(';', ',').split(',') if part.strip()}, reverse=True)
+    if any(length not in PLUS_CODE_LENGTHS for length in lengths):
+        raise ValueError("Plus code lengths must be 2, 4, 6, 8 or 10")
+    return lengths
+
+def plus_code_cell_size(length):
+    """Cell size in degrees of a plus code prefix of the given length"""
+    return 20.0 / 20 ** (length // 2 - 1)
+
+def plus_code_reach_miles(lengths):
+    """Farthest two rows can be apart and still share a neighbouring cell at one of the lengths"""
+    if not lengths:
+        return 0.0
+    return 2 * plus_code_cell_size(min(lengths)) * 69.0 * math.sqrt(2)
+
+def plus_code_cells(df, length):
+    """Integer (latitude, longitude) cell of every row at a plus code prefix length.
+
+    Rows with a full code in the plusCode column use it; the others are encoded
+    from their coordinates, which gives the same cell. The cells are taken from
+    the dataset's snapshot when it has them.
+    """
+    column = f'_plus_code_{length}'
+    if column in df:
+        codes = df[column].to_numpy(dtype=np.int64)
+        return codes >> 32, codes & 0xFFFFFFFF
+
+    size = plus_code_cell_size(length)
+    lats = np.clip(df['latitude'].to_numpy(dtype=float), -90.0, 90.0 - 1e-9)
+    lons = df['longitude'].to_numpy(dtype=float)
+    lat_cells = np.floor((lats + 90.0) / size).astype(np.int64)
+    lon_cells = np.floor(np.mod(lons + 180.0, 360.0) / size).astype(np.int64)
+
+    if 'plusCode' in df:
+        for i, code in enumerate(df['plusCode']):
+            cell = plus_code_prefix_cell(code, length)
+            if cell is not None:
+                lat_cells[i], lon_cells[i] = cell
+
+    return lat_cells, lon_cells
+
+def plus_code_cell_codes(lat_cells, lon_cells):
+    """One int64 per plus code cell"""
+    return (np.asarray(lat_cells, dtype=np.int64) << 32) + np.asarray(lon_cells, dtype=np.int64)
+
+def plus_code_prefix_cell(code, length):
+    """Integer (latitude, longitude) cell of a full plus code's prefix; None if code is not a full code"""
+    match = FULL_PLUS_CODE_PATTERN.match(code) if isinstance(code, str) else None
+    if match is None:
+        return None
+    digits = (match.group(1) + match.group(2)).upper()[:length]
+    lat_cell = lon_cell = 0
+    for pair in range(0, length, 2):
+        lat_cell = lat_cell * 20 + PLUS_CODE_DIGIT[digits[pair]]
+        lon_cell = lon_cell * 20 + PLUS_CODE_DIGIT[digits[pair + 1]]
+    return lat_cell, lon_cell
+
+def plus_code_point_cell(lat, lon, code, length):
+    """plus_code_cells for a single location"""
+    cell = plus_code_prefix_cell(code, length)
+    if cell is not None:
+        return cell
+    size = plus_code_cell_size(length)
+    lat = min(max(lat, -90.0), 90.0 - 1e-9)
+    return math.floor((lat + 90.0) / size), math.floor(((lon + 180.0) % 360.0) / size)
+
+def plus_code_join(piggy_df, ctx_df, lengths):
+    """Pure hash join of Piggy and CTX rows on plus code cells, with neighbour-cell expansion.
+
+    A CTX row joins a Piggy row when its cell is the Piggy row's cell or one of the
+    eight around it, so co-located rows on either side of a cell edge are found.
+    Lengths are tried finest first. Returns {piggy position: {ctx position: finest length}}.
+    """
+    pairs = {}
+    for length in sorted(lengths, reverse=True):
+        lon_cell_count = int(round(360.0 / plus_code_cell_size(length)))
+        ctx_lat_cells, ctx_lon_cells = plus_code_cells(ctx_df, length)
+        ctx_by_cell = {}
+        for ctx_idx, cell in enumerate(zip(ctx_lat_cells.tolist(), ctx_lon_cells.tolist())):
+            ctx_by_cell.setdefault(cell, []).append(ctx_idx)
+
+        piggy_lat_cells, piggy_lon_cells = plus_code_cells(piggy_df, length)
+        for piggy_idx, (lat_cell, lon_cell) in enumerate(zip(piggy_lat_cells.tolist(), piggy_lon_cells.tolist())):
+            for d_lat in (-1, 0, 1):
+                for d_lon in (-1, 0, 1):
+                    for ctx_idx in ctx_by_cell.get((lat_cell + d_lat, (lon_cell + d_lon) % lon_cell_count), ()):
+                        pairs.setdefault(piggy_idx, {}).setdefault(ctx_idx, length)
+
+    return pairs
+
+# Second-level labels under which the registrable domain has three labels (example.co.uk)
+SECOND_LEVEL_DOMAINS = {'co', 'com', 'net', 'org', 'gov', 'edu', 'ac', 'gob'}
+# Shared hosting, social and ordering sites that do not identify a merchant
+GENERIC_WEBSITE_DOMAINS = {
+    'facebook.com', 'fb.com', 'instagram.com', 'twitter.com', 'x.com', 'tiktok.com', 'linkedin.com',
+    'youtube.com', 'google.com', 'goo.gl', 'business.site', 'yelp.com', 'tripadvisor.com', 'linktr.ee',
+    'wixsite.com', 'wordpress.com', 'blogspot.com', 'square.site', 'squareup.com', 'godaddysites.com',
+    'ubereats.com', 'doordash.com', 'grubhub.com', 'toasttab.com', 'clover.com'
+}
+# Name similarity a pair sharing a phone number or website domain needs to be a key match: a reused
+# number or a chain's common domain must not join two different merchants. The floor is fixed so the
+# candidate table does not depend on min_name_similarity.
+KEY_MATCH_MIN_NAME_SIMILARITY = 0.8
+WEBSITE_HOST_PATTERN = re.compile(r'^(?:[a-z][a-z0-9+.-]*://)?(?:[^@/?#]*@)?([^/?#:]+)')
+
+def normalize_phone(phone):
+    """Phone number as digits only, without a leading North American country code; '' if unusable"""
+    if pd.isna(phone) or phone == '':
+        return ''
+    if isinstance(phone, float) and phone.is_integer():
+        phone = int(phone)
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits if len(digits) >= 7 else ''
+
+def registrable_domain(website):
+    """Registrable domain of a website (www.shop.example.co.uk/menu -> example.co.uk); '' if unusable"""
+    if pd.isna(website) or not website:
+        return ''
+    match = WEBSITE_HOST_PATTERN.match(str(website).strip().lower())
+    if match is None:
+        return ''
+    labels = [label for label in match.group(1).strip('.').split('.') if label]
+    if len(labels) < 2:
+        return ''
+    keep = 3 if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_DOMAINS else 2
+    domain = '.'.join(labels[-keep:])
+    return '' if domain in GENERIC_WEBSITE_DOMAINS else domain
+
+def key_match_pairs(piggy_df, ctx_df, max_distance_miles, accept=None):
+    """Hash join Piggy and CTX rows on normalized phone number, then on website domain.
+
+    Each Piggy row with a shared key is paired with the closest CTX row sharing
+    it within max_distance_miles for which accept(piggy position, ctx position)
+    holds (the name check, see KEY_MATCH_MIN_NAME_SIMILARITY); phone matches
+    win over website matches.
+    Returns {piggy position: (ctx position, distance, key name)}.
+    """
+    piggy_lats = piggy_df['latitude'].to_numpy(dtype=float)
+    piggy_lons = piggy_df['longitude'].to_numpy(dtype=float)
+    ctx_lats = ctx_df['latitude'].to_numpy(dtype=float)
+    ctx_lons = ctx_df['longitude'].to_numpy(dtype=float)
+
+    pairs = {}
+    for key_name, column, normalize in (('phone', 'phone', normalize_phone),
+                                        ('website', 'website', registrable_domain)):
+        if column not in piggy_df or column not in ctx_df:
+            continue
+
+        ctx_by_key = {}
+        for ctx_idx, value in enumerate(ctx_df[column]):
+            key = normalize(value)
+            if key:
+                ctx_by_key.setdefault(key, []).append(ctx_idx)
+
+        for piggy_idx, value in enumerate(piggy_df[column]):
+            if piggy_idx in pairs:
+                continue
+            joined = ctx_by_key.get(normalize(value))
+            if not joined:
+                continue
+            joined = np.array(joined)
+            distances = haversine_vectorized(piggy_lats[piggy_idx], piggy_lons[piggy_idx],
+                                             ctx_lats[joined], ctx_lons[joined])
+            for n in np.argsort(distances, kind='stable').tolist():
+                if distances[n] > max_distance_miles:
+                    break
+                if accept is None or accept(piggy_idx, int(joined[n])):
+                    pairs[piggy_idx] = (int(joined[n]), float(distances[n]), key_name)
+                    break
+
+    return pairs
+
+def adaptive_search_radius(distances, settings, max_distance):
+    """Search radius of a Piggy row from the distances of the CTX rows within max_distance of it.
+
+    The radius reaches the adaptive_target_candidates-th closest CTX row, so it
+    shrinks where CTX rows are dense and widens where they are sparse, bounded
+    by adaptive_min_distance and max_distance.
+    """
+    target = settings['adaptive_target_candidates']
+    if len(distances) <= target:
+        return max_distance
+    closest = np.partition(distances, target - 1)[target - 1]
+    return float(min(max(closest, settings['adaptive_min_distance']), max_distance))
+
+# Rows that match every geographic check, for confidence_upper_bound
+BEST_CASE_ROW = {'city': 'best', 'state': 'best', 'territory': 'best', 'zip': '00000'}
+
+def confidence_upper_bound(distance, settings):
+    """Highest confidence calculate_confidence_score_new gives a pair this far apart"""
+    return calculate_confidence_score_new(distance, 1.0, 1.0, BEST_CASE_ROW, BEST_CASE_ROW,
+                                          settings['ignore_name_matching'], settings['ignore_city_matching'],
+                                          settings['ignore_state_matching'], settings['ignore_zip_matching'])
+
+def nearest_candidate_order(candidates, distances, keep, nearest):
+    """Positions of the nearest candidates, closest first (ties by CTX index), with every keep one included"""
+    order = np.lexsort((candidates, distances))
+    if nearest:
+        order = order[(np.arange(len(order)) < nearest) | keep[order]]
+    return order
+
+def nearest_first_scores(distances, keep, score, settings, max_distance):
+    """Score candidates closest first until no remaining one can beat the best passing one.
+
+    distances are sorted. score(position) returns (name similarity, street
+    similarity, confidence). A candidate passes the thresholds within
+    max_distance; once confidence_upper_bound at a candidate's distance is
+    below the best passing confidence, it is skipped unless it is a keep one.
+    Returns the scored positions and their scores.
+    """
+    ignore_name = settings['ignore_name_matching']
+    best = None
+    stopped = False
+    positions = []
+    scores = []
+    for n, distance in enumerate(distances.tolist()):
+        if not keep[n]:
+            # The bound only falls with distance: once beaten, every farther candidate is
+            stopped = stopped or (best is not None and confidence_upper_bound(distance, settings) < best)
+            if stopped:
+                continue
+        name_sim, street_addr_sim, confidence = score(n)
+        positions.append(n)
+        scores.append((name_sim, street_addr_sim, confidence))
+        if (distance <= max_distance and confidence >= settings['min_confidence'] and
+                (ignore_name or name_sim >= settings['min_name_similarity'])):
+            best = confidence if best is None else max(best, confidence)
+    return positions, scores
+
+# Candidate feature table columns, before the coordinates of each pair
+CANDIDATE_FEATURE_COLUMNS = ('piggy_index', 'ctx_index', 'distance_miles', 'name_similarity', 'address_similarity',
+                             'confidence', 'plus_code_length', 'match_key', 'search_radius')
+
+class CandidateSearch:
+    """Candidate CTX rows of one Piggy row (or query record) at a time, searched in the
+    latitude band of the latitude-sorted CTX coordinates.
+
+    Shared by build_candidate_features and MerchantIndex.features, which pass
+    each row's plus code neighbours, key match, keep(candidates) mask and
+    score(CTX row, distance) function. radians holds the CTX coordinates in
+    radians (see coordinate_radians) and sorted_lats the latitudes in order;
+    both are computed unless given.
+    """
+
+    def __init__(self, lats, lons, order, settings, max_distance, sorted_lats=None, radians=None):
+        self.lats = lats
+        self.lons = lons
+        self.order = order
+        self.sorted_lats = lats[order] if sorted_lats is None else sorted_lats
+        self.lats_rad, self.lons_rad = (np.radians(lats), np.radians(lons)) if radians is None else radians
+        self.settings = settings
+        self.max_distance = max_distance
+
+    def candidates(self, lat, lon, joined=None, keep=None, score=None):
+        """(CTX rows, distances, plus code lengths, radius, scores) of the row at lat, lon; None without any.
+
+        Rows are kept within max_distance (or the adaptive radius) and plus code
+        neighbours in joined ({CTX row: length}) at any distance. With
+        nearest_candidates, the closest ones are kept (co-located ones always)
+        and with nearest_early_stop in best-match mode scored here (see
+        nearest_first_scores); scores is None otherwise.
+        """
+        settings = self.settings
+        max_distance = self.max_distance
+        lat_window = max_distance / 69.0
+        start = np.searchsorted(self.sorted_lats, lat - lat_window, side='left')
+        end = np.searchsorted(self.sorted_lats, lat + lat_window, side='right')
+
+        # Conservative longitude window using the most poleward latitude of the band
+        band_cos = np.cos(np.radians(min(abs(lat) + lat_window, 89.9)))
+        candidates = np.sort(self.order[start:end])
+        candidates = candidates[np.abs(self.lons[candidates] - lon) <= lat_window * 1.01 / band_cos]
+        if len(candidates) == 0 and not joined:
+            return None
+
+        lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+        distances = haversine_radians(lat_rad, lon_rad, self.lats_rad[candidates], self.lons_rad[candidates])
+        within = distances <= max_distance
+        radius = max_distance
+        if settings.get('adaptive_radius'):
+            radius = adaptive_search_radius(distances[within], settings, max_distance)
+            within = distances <= radius
+        if joined:
+            # Plus code neighbours are candidates whatever their distance
+            candidates = np.union1d(candidates[within], np.fromiter(joined, dtype=np.int64, count=len(joined)))
+            distances = haversine_radians(lat_rad, lon_rad, self.lats_rad[candidates], self.lons_rad[candidates])
+            within = np.ones(len(candidates), dtype=bool)
+        if keep is not None:
+            within &= keep(candidates)
+        candidates, distances = candidates[within], distances[within]
+        plus_lengths = np.zeros(len(candidates), dtype=np.int64)
+        if joined:
+            plus_lengths[:] = [joined.get(ctx_idx, 0) for ctx_idx in candidates.tolist()]
+
+        scores = None
+        nearest = settings.get('nearest_candidates', 0)
+        if nearest:
+            # Co-located pairs (plus code or coordinate cell) may be Step 1 matches: always kept
+            co_located = (plus_lengths > 0) | (
+                coordinate_cell_levels(lat, lon, self.lats[candidates], self.lons[candidates], settings) > 0)
+            order = nearest_candidate_order(candidates, distances, co_located, nearest)
+            candidates, distances, co_located, plus_lengths = (
+                candidates[order], distances[order], co_located[order], plus_lengths[order])
+            if settings.get('nearest_early_stop') and not settings['show_all_potential_matches']:
+                positions, scores = nearest_first_scores(
+                    distances, co_located, lambda n: score(int(candidates[n]), float(distances[n])),
+                    settings, min(radius, settings['max_distance']))
+                positions = np.array(positions, dtype=np.int64)
+                candidates, distances, plus_lengths = candidates[positions], distances[positions], plus_lengths[positions]
+        return candidates, distances, plus_lengths, radius, scores
+
+    def row_pairs(self, i, lat, lon, key=None, joined=None, keep=None, score=None):
+        """Candidate pairs of row i as (i, CTX rows, distances, plus code lengths, key name, radius, scores):
+        its key match (CTX row, distance, key name) alone, scored with confidence 1.0, else candidates()"""
+        if key is not None:
+            ctx_idx, distance, key_name = key
+            name_sim, street_addr_sim, _ = score(ctx_idx, distance)
+            return (i, np.array([ctx_idx]), np.array([distance]), np.zeros(1, dtype=np.int64), key_name,
+                    self.max_distance, [(name_sim, street_addr_sim, 1.0)])
+        found = self.candidates(lat, lon, joined, keep, score)
+        if found is None:
+            return None
+        candidates, distances, plus_lengths, radius, scores = found
+        return i, candidates, distances, plus_lengths, '', radius, scores
+
+def add_candidate_pairs(columns, row_pairs, score):
+    """Append CandidateSearch.row_pairs entries to candidate feature columns; pairs not scored
+    yet are scored with score(row, CTX row, distance)"""
+    for i, candidates, distances, plus_lengths, key_name, radius, scores in row_pairs:
+        for n, (ctx_idx, distance, plus_length) in enumerate(zip(candidates.tolist(), distances.tolist(),
+                                                                  plus_lengths.tolist())):
+            name_sim, street_addr_sim, confidence = scores[n] if scores is not None else score(i, ctx_idx, distance)
+            columns['piggy_index'].append(i)
+            columns['ctx_index'].append(ctx_idx)
+            columns['distance_miles'].append(distance)
+            columns['name_similarity'].append(name_sim)
+            columns['address_similarity'].append(street_addr_sim)
+            columns['confidence'].append(confidence)
+            columns['plus_code_length'].append(plus_length)
+            columns['match_key'].append(key_name)
+            columns['search_radius'].append(radius)
+
+def candidate_feature_table(columns, piggy_lats, piggy_lons, ctx_lats, ctx_lons):
+    """Candidate feature table of CANDIDATE_FEATURE_COLUMNS lists with the coordinates of each pair"""
+    features = pd.DataFrame(columns)
+    piggy_index = features['piggy_index'].to_numpy(dtype=int)
+    ctx_index = features['ctx_index'].to_numpy(dtype=int)
+    features['piggy_lat'] = piggy_lats[piggy_index]
+    features['piggy_lon'] = piggy_lons[piggy_index]
+    features['ctx_lat'] = ctx_lats[ctx_index]
+    features['ctx_lon'] = ctx_lons[ctx_index]
+    return features
+
+def candidate_radius(settings):
+    """Farthest apart a candidate pair can be: max_distance, or the plus code or key join reach if larger"""
+    radius = settings['max_distance']
+    if settings['plus_code_matching']:
+        radius = max(radius, plus_code_reach_miles(parse_plus_code_lengths(settings['plus_code_lengths'])))
+    if settings['key_matching']:
+        radius = max(radius, settings['key_match_max_distance'])
+    return radius
 
 def calculate_confidence_score_new(distance, name_sim, street_addr_sim, piggy_row, ctx_row, 
                                  ignore_name=False, ignore_city=False, ignore_state=False, ignore_zip=False):
@@ -442,188 +1103,3172 @@ def calculate_confidence_score_new(distance, name_sim, street_addr_sim, piggy_ro
     
     return final_confidence
 
-def create_comparison_report_advanced(piggy_df, ctx_df, all_matches, enable_reverse_geocoding=False):
-    """Create detailed comparison report with corrected match type assignment"""
-    results = []
-    
-    # Track used indices
-    matched_piggy_indices = set()
-    matched_ctx_indices = set()
-    
-    def get_corrected_location(lat, lon, enable_geocoding):
-        """Get corrected city and state if reverse geocoding is enabled"""
-        if enable_geocoding and not pd.isna(lat) and not pd.isna(lon):
-            try:
-                corrected_city, corrected_state = reverse_geocode_cached(lat, lon)
-                return corrected_city, corrected_state
-            except:
-                return '', ''
-        return '', ''
-    
-    # Add all matches
-    for match in all_matches:
-        piggy_row = piggy_df.iloc[match['piggy_index']]
-        ctx_row = ctx_df.iloc[match['ctx_index']]
-        
-        # Get confidence and other match data
-        confidence = match['confidence']
-        city_match = match.get('city_match', False)
-        state_match = match.get('state_match', False)
-        zip_match = match.get('zip_match', True)
-        geographic_warning = match.get('geographic_warning', '')
-        
-        # CORRECTED: Use the same confidence thresholds as the summary
-        if confidence >= 0.9:
-            match_type = 'HIGH_CONFIDENCE_DUPLICATE'
-        elif confidence >= 0.7:
-            match_type = 'MEDIUM_CONFIDENCE_DUPLICATE'
-        elif confidence >= 0.5:
-            match_type = 'LOW_CONFIDENCE_DUPLICATE'
+def corrected_location(lat, lon, enable_geocoding, geocoding=None):
+    """Get corrected city and state if reverse geocoding is enabled, from the
+    ReverseGeocodingPipeline geocoding if given"""
+    if enable_geocoding and geocoding is not None:
+        return geocoding.location(lat, lon)
+    if enable_geocoding and not pd.isna(lat) and not pd.isna(lon):
+        try:
+            corrected_city, corrected_state = reverse_geocode_cached(lat, lon)
+            return corrected_city, corrected_state
+        except:
+            return '', ''
+    return '', ''
+
+def confidence_match_type(confidence):
+    """Report match type of a confidence score, using the summary's thresholds"""
+    if confidence >= 0.9:
+        return 'HIGH_CONFIDENCE_DUPLICATE'
+    if confidence >= 0.7:
+        return 'MEDIUM_CONFIDENCE_DUPLICATE'
+    if confidence >= 0.5:
+        return 'LOW_CONFIDENCE_DUPLICATE'
+    return 'POTENTIAL_MATCH'
+
+def match_report_row(match, piggy_row, ctx_row, enable_reverse_geocoding=False, geocoding=None):
+    """Report row for one Piggy/CTX match"""
+    # Get confidence and other match data
+    confidence = match['confidence']
+    city_match = match.get('city_match', False)
+    state_match = match.get('state_match', False)
+    zip_match = match.get('zip_match', True)
+    geographic_warning = match.get('geographic_warning', '')
+    
+    # CORRECTED: Use the same confidence thresholds as the summary
+    match_type = confidence_match_type(confidence)
+    
+    # Add geographic context if relevant
+    if geographic_warning:
+        if 'different_states' in geographic_warning or 'state mismatch' in geographic_warning.lower():
+            match_type += '_GEOGRAPHIC_WARNING'
+    
+    # Get corrected locations if enabled
+    piggy_corrected_city, piggy_corrected_state = corrected_location(
+        piggy_row['latitude'], piggy_row['longitude'], enable_reverse_geocoding, geocoding)
+    ctx_corrected_city, ctx_corrected_state = corrected_location(
+        ctx_row['latitude'], ctx_row['longitude'], enable_reverse_geocoding, geocoding)
+    
+    result_row = {
+        'match_type': match_type,
+        'confidence_score': confidence,
+        'piggy_name': piggy_row['name'],
+        'piggy_address': piggy_row['address1'],
+        'piggy_city': piggy_row['city'],
+        'piggy_state': piggy_row['territory'],
+        'piggy_lat': piggy_row['latitude'],
+        'piggy_lon': piggy_row['longitude'],
+        'ctx_name': ctx_row['name'],
+        'ctx_address': ctx_row['address1'],
+        'ctx_city': ctx_row['city'],
+        'ctx_territory': ctx_row['territory'],
+        'ctx_lat': ctx_row['latitude'],
+        'ctx_lon': ctx_row['longitude'],
+        'distance_miles': match['distance_miles'],
+        'name_similarity': match['name_similarity'],
+        'address_similarity': match.get('address_similarity', 0),
+        'city_match': city_match,
+        'state_match': state_match,
+        'zip_match': zip_match,
+        'match_reasons': match.get('reasons', ''),
+        'geographic_warning': geographic_warning
+    }
+    
+    # Add corrected location columns if reverse geocoding is enabled
+    if enable_reverse_geocoding:
+        result_row.update({
+            'piggy_corrected_city': piggy_corrected_city,
+            'piggy_corrected_state': piggy_corrected_state,
+            'ctx_corrected_city': ctx_corrected_city,
+            'ctx_corrected_state': ctx_corrected_state
+        })
+    
+    return result_row
+
+def piggy_unique_report_row(row, enable_reverse_geocoding=False, geocoding=None):
+    """Report row for a Piggy location without a CTX duplicate"""
+    # Get corrected location for unique Piggy entries
+    piggy_corrected_city, piggy_corrected_state = corrected_location(
+        row['latitude'], row['longitude'], enable_reverse_geocoding, geocoding)
+
+    result_row = {
+        'match_type': 'PIGGY_UNIQUE',
+        'confidence_score': 0,
+        'piggy_name': row['name'],
+        'piggy_address': row['address1'],
+        'piggy_city': row['city'],
+        'piggy_state': row['territory'],
+        'piggy_lat': row['latitude'],
+        'piggy_lon': row['longitude'],
+        'ctx_name': '',
+        'ctx_address': '',
+        'ctx_city': '',
+        'ctx_territory': '',
+        'ctx_lat': '',
+        'ctx_lon': '',
+        'distance_miles': '',
+        'name_similarity': '',
+        'address_similarity': '',
+        'city_match': False,
+        'state_match': False,
+        'zip_match': False,
+        'match_reasons': '',
+        'geographic_warning': ''
+    }
+    
+    if enable_reverse_geocoding:
+        result_row.update({
+            'piggy_corrected_city': piggy_corrected_city,
+            'piggy_corrected_state': piggy_corrected_state,
+            'ctx_corrected_city': '',
+            'ctx_corrected_state': ''
+        })
+    
+    return result_row
+
+def ctx_unique_report_row(row, enable_reverse_geocoding=False, geocoding=None):
+    """Report row for a CTX location without a Piggy duplicate"""
+    # Get corrected location for unique CTX entries
+    ctx_corrected_city, ctx_corrected_state = corrected_location(
+        row['latitude'], row['longitude'], enable_reverse_geocoding, geocoding)
+    
+    result_row = {
+        'match_type': 'CTX_UNIQUE',
+        'confidence_score': 0,
+        'piggy_name': '',
+        'piggy_address': '',
+        'piggy_city': '',
+        'piggy_state': '',
+        'piggy_lat': '',
+        'piggy_lon': '',
+        'ctx_name': row['name'],
+        'ctx_address': row['address1'],
+        'ctx_city': row['city'],
+        'ctx_territory': row['territory'],
+        'ctx_lat': row['latitude'],
+        'ctx_lon': row['longitude'],
+        'distance_miles': '',
+        'name_similarity': '',
+        'address_similarity': '',
+        'city_match': False,
+        'state_match': False,
+        'zip_match': False,
+        'match_reasons': '',
+        'geographic_warning': ''
+    }
+    
+    if enable_reverse_geocoding:
+        result_row.update({
+            'piggy_corrected_city': '',
+            'piggy_corrected_state': '',
+            'ctx_corrected_city': ctx_corrected_city,
+            'ctx_corrected_state': ctx_corrected_state
+        })
+    
+    return result_row
+
+# Rows buffered by ReportWriter between appends to the report file
+REPORT_CHUNK_ROWS = 5000
+
+# File name suffix of each report compression
+REPORT_COMPRESSION_SUFFIXES = {'none': '.csv', 'gzip': '.csv.gz', 'zstd': '.csv.zst'}
+
+def report_file_path(output_dir, stem, compression='none'):
+    """Report file in output_dir with the suffix of the report compression"""
+    return os.path.join(output_dir, stem + REPORT_COMPRESSION_SUFFIXES[compression])
+
+def open_report_stream(path, compression='none'):
+    """Text stream for writing a report, gzip or zstd (zstandard package) compressed if asked"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', newline='', encoding='utf-8')
+    if compression == 'zstd':
+        import zstandard
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(path, 'wb')),
+                                newline='', encoding='utf-8')
+    return open(path, 'w', newline='', encoding='utf-8')
+
+class ReportWriter:
+    """Comparison report written to CSV while its rows are produced.
+
+    Rows are buffered in chunks of REPORT_CHUNK_ROWS and appended to the file, so
+    the report is never held whole in memory. The analysis summary, the sample
+    high-confidence duplicates and the matched CTX rows are kept as running
+    tallies as rows are added. Use as a context manager.
+    """
+
+    def __init__(self, path, compression='none', enable_geocoding=False, backend='pandas', geocoding=None):
+        self.path = path
+        self.enable_geocoding = enable_geocoding
+        self.geocoding = geocoding
+        self.backend = backend
+        self.summary = {'total_matches': 0, 'high_confidence': 0, 'medium_confidence': 0, 'low_confidence': 0,
+                        'potential': 0, 'unique_piggy': 0, 'unique_ctx': 0}
+        self.samples = []
+        self.matched_ctx = set()
+        self._stream = open_report_stream(path, compression)
+        self._rows = []
+        self._header = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= REPORT_CHUNK_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            # Confidences as floats whatever rows the chunk holds (unique rows have an integer 0)
+            chunk = pd.DataFrame(self._rows).astype({'confidence_score': float})
+            chunk.to_csv(self._stream, header=self._header, index=False)
+            self._header = False
+            self._rows = []
+
+    def close(self):
+        if self._stream is not None:
+            self.flush()
+            self._stream.close()
+            self._stream = None
+
+    def add_matches(self, piggy_df, ctx_df, matches):
+        """Rows for matches between rows of piggy_df and ctx_df, which are indexed like
+        the match indices. Returns the Piggy indices counted as duplicates."""
+        matched_piggy = set()
+        summary = self.summary
+        for match in matches:
+            piggy_row = piggy_df.loc[match['piggy_index']]
+            ctx_row = ctx_df.loc[match['ctx_index']]
+            confidence = match['confidence']
+
+            # Mark as matched for confidence >= 0.5
+            if confidence >= 0.5:
+                matched_piggy.add(match['piggy_index'])
+                self.matched_ctx.add(match['ctx_index'])
+
+            summary['total_matches'] += 1
+            if confidence >= 0.9:
+                summary['high_confidence'] += 1
+                if len(self.samples) < 3:
+                    self.samples.append((piggy_row['name'], ctx_row['name'], match['distance_miles'], confidence))
+            elif confidence >= 0.7:
+                summary['medium_confidence'] += 1
+            elif confidence >= 0.5:
+                summary['low_confidence'] += 1
+            else:
+                summary['potential'] += 1
+
+            self.add(match_report_row(match, piggy_row, ctx_row, self.enable_geocoding, self.geocoding))
+        return matched_piggy
+
+    def add_unique_piggy(self, piggy_df, matched_piggy):
+        """Rows for the Piggy rows not in matched_piggy"""
+        for _, row in unmatched_rows(piggy_df, matched_piggy, self.backend).iterrows():
+            self.summary['unique_piggy'] += 1
+            self.add(piggy_unique_report_row(row, self.enable_geocoding, self.geocoding))
+
+    def add_unique_ctx(self, ctx_df):
+        """Rows for the CTX rows no match took; of a tile or shard only the rows it owns"""
+        if '_owner' in ctx_df:
+            ctx_df = ctx_df[ctx_df['_owner']].set_index('_row_id')
+        for _, row in unmatched_rows(ctx_df, self.matched_ctx, self.backend).iterrows():
+            self.summary['unique_ctx'] += 1
+            self.add(ctx_unique_report_row(row, self.enable_geocoding, self.geocoding))
+
+# Report columns holding numbers (empty for unique rows)
+REPORT_NUMERIC_COLUMNS = {'confidence_score', 'piggy_lat', 'piggy_lon', 'ctx_lat', 'ctx_lon',
+                          'distance_miles', 'name_similarity', 'address_similarity'}
+
+def report_compression(path):
+    """Report compression of a report file, from its suffix"""
+    for compression, suffix in REPORT_COMPRESSION_SUFFIXES.items():
+        if compression != 'none' and path.endswith(suffix):
+            return compression
+    return 'none'
+
+def open_report_reader(path):
+    """Binary stream of a report's CSV text, decompressing gzip/zstd reports"""
+    compression = report_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+def csv_record_offsets(path, chunk_size=1 << 24):
+    """Byte offset of every CSV record of a file (the header is record 0), then the file size.
+
+    Newlines inside quoted fields do not end a record. The file is scanned in
+    chunks, so memory use does not depend on its size.
+    """
+    starts = [np.zeros(1, dtype=np.int64)]
+    position = 0
+    quotes_seen = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            quotes = np.flatnonzero(data == ord('"'))
+            newlines = np.flatnonzero(data == ord('\n'))
+            # A newline ends a record when an even number of quotes precede it
+            outside = (quotes_seen + np.searchsorted(quotes, newlines)) % 2 == 0
+            starts.append(position + newlines[outside].astype(np.int64) + 1)
+            quotes_seen += len(quotes)
+            position += len(chunk)
+    offsets = np.concatenate(starts)
+    if offsets[-1] != position:
+        offsets = np.append(offsets, position)
+    return offsets
+
+class ReportTable:
+    """Random access to the rows of a comparison report without loading it.
+
+    The file is scanned once for the byte offset of every row; compressed
+    reports are first decompressed to a temporary file. A column is read whole
+    only when a filter or sort needs it, and rows are parsed only when they are
+    shown. Call close() when done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._temp_file = None
+        if report_compression(path) != 'none':
+            handle, self._temp_file = tempfile.mkstemp(prefix='report_', suffix='.csv')
+            with os.fdopen(handle, 'wb') as out, open_report_reader(path) as source:
+                shutil.copyfileobj(source, out, 1 << 20)
+        self.data_file = self._temp_file or path
+        self.offsets = csv_record_offsets(self.data_file)
+        self._file = open(self.data_file, 'rb')
+        self.header = self._read_records(0, 1)[0] if len(self.offsets) > 1 else []
+        self._columns = {}
+
+    def __len__(self):
+        return max(len(self.offsets) - 2, 0)
+
+    def _read_records(self, first, last):
+        self._file.seek(self.offsets[first])
+        text = self._file.read(self.offsets[last] - self.offsets[first]).decode('utf-8')
+        return list(csv.reader(io.StringIO(text, newline='')))
+
+    def rows(self, positions):
+        """Rows (lists of strings) at the given data row positions"""
+        return [self._read_records(position + 1, position + 2)[0] for position in positions]
+
+    def column(self, name):
+        """One column for all rows: REPORT_NUMERIC_COLUMNS as floats (NaN if empty), others as strings"""
+        if name not in self._columns:
+            if name in REPORT_NUMERIC_COLUMNS:
+                values = pd.read_csv(self.data_file, usecols=[name], dtype={name: float})[name]
+            else:
+                values = pd.read_csv(self.data_file, usecols=[name], dtype=str, keep_default_na=False)[name]
+            self._columns[name] = values.to_numpy()
+        return self._columns[name]
+
+    def states(self):
+        """State of every row: the Piggy state, else the CTX territory, upper case"""
+        if 'state' not in self._columns:
+            piggy = self.column('piggy_state')
+            ctx = self.column('ctx_territory')
+            self._columns['state'] = np.char.upper(np.char.strip(np.where(piggy != '', piggy, ctx).astype(str)))
+        return self._columns['state']
+
+    def view(self, match_type='', min_confidence=None, state='', sort_column=None, descending=False):
+        """Positions of the rows passing the filters, in report order or sorted by one column"""
+        keep = np.ones(len(self), dtype=bool)
+        if match_type:
+            keep &= self.column('match_type') == match_type
+        if min_confidence is not None:
+            keep &= self.column('confidence_score') >= min_confidence
+        if state:
+            keep &= self.states() == state.strip().upper()
+        positions = np.flatnonzero(keep)
+        if sort_column:
+            values = self.column(sort_column)[positions]
+            if values.dtype.kind == 'f':
+                # Empty cells last in either direction
+                values = np.where(np.isnan(values), -np.inf if descending else np.inf, values)
+            order = np.argsort(values, kind='stable')
+            positions = positions[order[::-1] if descending else order]
+        return positions
+
+    def close(self):
+        self._file.close()
+        if self._temp_file:
+            os.remove(self._temp_file)
+            self._temp_file = None
+
+def find_self_duplicates(df, max_distance_miles, min_name_sim=0.6, min_confidence=0.5,
+                         include_address=True, ignore_name=False, ignore_city=False,
+                         ignore_state=False, ignore_zip=False, progress_callback=None,
+                         prune_house_numbers=False):
+    """Find duplicate locations inside a single dataset.
+
+    The dataset is indexed once (sorted by latitude) and each unordered pair (i, j)
+    with i < j is scored exactly once, so self-pairs and mirrored pairs never appear.
+    """
+    pairs = []
+    if len(df) < 2:
+        return pairs
+
+    use_street_address = include_address and (ignore_city or ignore_state or ignore_zip)
+    prune_house_numbers = prune_house_numbers and use_street_address
+    if use_street_address:
+        streets, house_numbers = street_features(df)
+    if not ignore_name:
+        names = clean_names(df)
+
+    columns = confidence_columns(df)
+    lats = df['latitude'].to_numpy(dtype=float)
+    lons = df['longitude'].to_numpy(dtype=float)
+    lats_rad, lons_rad = coordinate_radians(df)
+
+    # Sort once by latitude so every row only looks "up" the latitude band
+    order = np.argsort(lats, kind='stable')
+    sorted_lats = lats[order]
+    lat_window = max_distance_miles / 69.0
+    total = len(order)
+
+    for pos in range(total):
+        i = order[pos]
+        end = np.searchsorted(sorted_lats, sorted_lats[pos] + lat_window, side='right')
+        if end <= pos + 1:
+            continue
+
+        candidates = order[pos + 1:end]
+        lon_window = max_distance_miles / (69.0 * max(np.cos(np.radians(lats[i])), 1e-6))
+        candidates = candidates[np.abs(lons[candidates] - lons[i]) <= lon_window]
+        if len(candidates) == 0:
+            continue
+
+        distances = haversine_radians(lats_rad[i], lons_rad[i], lats_rad[candidates], lons_rad[candidates])
+        within = distances <= max_distance_miles
+        if prune_house_numbers:
+            within &= house_number_mask(house_numbers[i], house_numbers[candidates])
+
+        row_i = ColumnRow(columns, i)
+        for j, distance in zip(candidates[within], distances[within]):
+            row_j = ColumnRow(columns, j)
+
+            name_sim = 0.0 if ignore_name else cleaned_name_similarity(names[i], names[j])
+            if not ignore_name and name_sim < min_name_sim:
+                continue
+
+            street_addr_sim = 0.0
+            if use_street_address:
+                street_addr_sim = street_pair_similarity(streets[i], streets[j])
+
+            confidence = calculate_confidence_score_new(
+                distance, name_sim, street_addr_sim, row_i, row_j,
+                ignore_name, ignore_city, ignore_state, ignore_zip
+            )
+            if confidence < min_confidence:
+                continue
+
+            first, second = (int(i), int(j)) if i < j else (int(j), int(i))
+            pairs.append({
+                'first_index': first,
+                'second_index': second,
+                'distance_miles': float(distance),
+                'name_similarity': name_sim,
+                'address_similarity': street_addr_sim,
+                'confidence': confidence
+            })
+
+        if progress_callback and ((pos + 1) % 500 == 0 or pos + 1 == total):
+            progress_callback(pos + 1, total)
+
+    return pairs
+
+def group_self_duplicates(pairs):
+    """Collapse duplicate pairs into connected groups using union-find"""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for pair in pairs:
+        root_a = find(pair['first_index'])
+        root_b = find(pair['second_index'])
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups = {}
+    for index in parent:
+        groups.setdefault(find(index), []).append(index)
+
+    return [sorted(members) for _, members in sorted(groups.items())]
+
+def create_self_dedup_report(df, pairs):
+    """Create a report listing every member of each duplicate group.
+
+    Pairs hold positions in df; 'row_index' and 'matched_with' give the rows'
+    positions in the input file ('_source_row' when df has it).
+    """
+    groups = group_self_duplicates(pairs)
+    source_rows = df['_source_row'].tolist() if '_source_row' in df else list(range(len(df)))
+
+    # Best pair confidence and partners per row
+    best_confidence = {}
+    partners = {}
+    for pair in pairs:
+        for index, other in ((pair['first_index'], pair['second_index']),
+                             (pair['second_index'], pair['first_index'])):
+            best_confidence[index] = max(best_confidence.get(index, 0.0), pair['confidence'])
+            partners.setdefault(index, []).append(other)
+
+    results = []
+    for group_id, members in enumerate(groups, start=1):
+        for index in members:
+            row = df.iloc[index]
+            results.append({
+                'duplicate_group': group_id,
+                'group_size': len(members),
+                'row_index': source_rows[index],
+                'name': row['name'],
+                'address': row['address1'],
+                'city': row['city'],
+                'territory': row['territory'],
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'max_confidence': best_confidence[index],
+                'matched_with': ' '.join(str(source_rows[other]) for other in sorted(partners[index]))
+            })
+
+    return pd.DataFrame(results, columns=['duplicate_group', 'group_size', 'row_index', 'name', 'address',
+                                          'city', 'territory', 'latitude', 'longitude',
+                                          'max_confidence', 'matched_with'])
+
+class AnalysisCancelled(Exception):
+    """Raised inside a job when the user presses Cancel"""
+
+class JobReporter:
+    """Sends log, stage and progress events from a job to the GUI event queue.
+
+    Progress events are throttled so tight loops never flood the queue; log and
+    stage events are always delivered. Without a queue, messages go to stdout.
+    """
+
+    def __init__(self, events=None, cancel_event=None, min_interval=0.1):
+        self.events = events
+        self.cancel_event = cancel_event
+        self.min_interval = min_interval
+        self._last_progress = 0.0
+
+    def _put(self, event):
+        if self.events is not None:
+            self.events.put(event)
+
+    def log(self, message):
+        if self.events is None:
+            print(message)
+        self._put(('log', message))
+
+    def stage(self, text):
+        self.check_cancelled()
+        self._put(('stage', text))
+
+    def progress(self, current, total):
+        self.check_cancelled()
+        now = time.monotonic()
+        if current < total and now - self._last_progress < self.min_interval:
+            return
+        self._last_progress = now
+        self._put(('progress', current, total))
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise AnalysisCancelled()
+
+def _json_default(value):
+    """Convert NumPy scalars for json.dumps"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def input_fingerprint(paths, settings, setting_keys):
+    """Fingerprint input files (path, size, mtime) and the settings that affect the result"""
+    parts = []
+    for path in paths:
+        stat = os.stat(path)
+        parts.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    parts.append({key: settings[key] for key in setting_keys})
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+# Settings that change the scored candidate table; thresholds are applied afterwards
+CANDIDATE_SETTING_KEYS = [
+    'include_address_matching', 'prune_house_number_mismatch',
+    'ignore_state_matching', 'ignore_city_matching', 'ignore_zip_matching', 'ignore_name_matching',
+    'plus_code_matching', 'plus_code_lengths', 'key_matching', 'key_match_max_distance', 'name_lsh',
+    'adaptive_radius', 'adaptive_min_distance', 'adaptive_target_candidates', 'nearest_candidates',
+    'nearest_early_stop'
+]
+# Settings the table also depends on when nearest candidates are scored with early termination
+EARLY_STOP_SETTING_KEYS = ['show_all_potential_matches', 'max_distance', 'min_name_similarity', 'min_confidence']
+
+def candidate_setting_keys(settings):
+    """CANDIDATE_SETTING_KEYS and, with nearest candidates, the settings the kept candidates depend on"""
+    keys = CANDIDATE_SETTING_KEYS
+    if settings['nearest_candidates']:
+        # Co-located pairs are always kept
+        keys = keys + ['coordinate_precision', 'coordinate_cascade']
+        if settings['nearest_early_stop'] and not settings['show_all_potential_matches']:
+            keys = keys + EARLY_STOP_SETTING_KEYS
+    return keys
+
+class JobCheckpoint:
+    """Append-only JSON-lines sidecar file recording completed units of work.
+
+    The first line holds the fingerprint of the inputs; each further line is one
+    completed unit as {"key": ..., "data": ...}. A truncated last line (crash
+    mid-write) is ignored on load.
+    """
+
+    def __init__(self, path, fingerprint, resume=False):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.completed = {}
+
+        if resume and os.path.exists(path):
+            self._load()
+
+        # Rewrite the file so a partially written last line never precedes new entries
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({'fingerprint': fingerprint})
+        for key, data in self.completed.items():
+            self._write({'key': key, 'data': data}, sync=False)
+        self._sync()
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except (ValueError, IndexError):
+            return
+        if header.get('fingerprint') != self.fingerprint:
+            return
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.completed[entry['key']] = entry['data']
+
+    def _write(self, entry, sync=True):
+        self._file.write(json.dumps(entry, default=_json_default) + '\n')
+        if sync:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, key, data):
+        """Persist one completed unit of work"""
+        self.completed[key] = data
+        self._write({'key': key, 'data': data})
+
+    def close(self, remove=False):
+        """Close the file, deleting it once the job has fully finished"""
+        self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+# Row columns calculate_confidence_score_new reads
+CONFIDENCE_COLUMNS = ('city', 'state', 'territory', 'zip')
+
+class ColumnRow:
+    """One row of a dataset's column arrays, read in place by calculate_confidence_score_new
+    instead of building a record dict for every row"""
+    __slots__ = ('columns', 'position')
+
+    def __init__(self, columns, position):
+        self.columns = columns
+        self.position = position
+
+    def __getitem__(self, name):
+        return self.columns[name][self.position]
+
+    def get(self, name, default=None):
+        column = self.columns.get(name)
+        return default if column is None else column[self.position]
+
+def confidence_columns(df):
+    """Column arrays of a dataset for ColumnRow"""
+    return {name: df[name].to_numpy(dtype=object) for name in CONFIDENCE_COLUMNS if name in df}
+
+def latitude_order(df):
+    """Positions of a dataset's rows sorted by latitude, the band index build_candidate_features searches"""
+    return np.argsort(df['latitude'].to_numpy(dtype=float), kind='stable')
+
+def build_candidate_features(piggy_df, ctx_df, settings, max_distance, reporter=None, checkpoint=None,
+                             ctx_order=None):
+    """Score every Piggy/CTX pair within max_distance once.
+
+    Returns one row per candidate pair (CANDIDATE_FEATURE_COLUMNS and the
+    coordinates of both rows), so any thresholds with a radius up to
+    max_distance can be applied by select_matches_from_features without
+    rescoring. Key matches, plus code joins, name LSH and nearest candidates
+    follow the settings (see CandidateSearch). Batches of Piggy rows are
+    recorded in the optional checkpoint; ctx_order is the latitude_order of
+    ctx_df, computed unless given.
+    """
+    reporter = reporter or JobReporter()
+
+    include_address = settings['include_address_matching']
+    ignore_state = settings['ignore_state_matching']
+    ignore_city = settings['ignore_city_matching']
+    ignore_zip = settings['ignore_zip_matching']
+    ignore_name = settings['ignore_name_matching']
+    use_street_address = include_address and (ignore_city or ignore_state or ignore_zip)
+    prune_house_numbers = use_street_address and settings['prune_house_number_mismatch']
+    adaptive_radius = settings['adaptive_radius']
+
+    # Clean every name and parse every address once per dataset; names are
+    # scored once per distinct (Piggy name, CTX name) pair
+    if not ignore_name:
+        piggy_name_ids, ctx_name_ids, vocabulary = factorize_names(clean_names(piggy_df), clean_names(ctx_df))
+        name_scores = {}
+    if use_street_address:
+        piggy_streets, piggy_house_numbers = street_features(piggy_df)
+        ctx_streets, ctx_house_numbers = street_features(ctx_df)
+
+    def score_pair(i, ctx_idx, distance, name_sim):
+        """Street similarity and confidence of one pair"""
+        street_addr_sim = 0.0
+        if use_street_address:
+            street_addr_sim = street_pair_similarity(piggy_streets[i], ctx_streets[ctx_idx])
+        return street_addr_sim, calculate_confidence_score_new(
+            distance, name_sim, street_addr_sim, ColumnRow(piggy_columns, i), ColumnRow(ctx_columns, ctx_idx),
+            ignore_name, ignore_city, ignore_state, ignore_zip
+        )
+
+    def name_similarity(i, ctx_idx):
+        """Name similarity of one pair, scored once per name pair (shares score_name_pairs' cache)"""
+        if ignore_name:
+            return 0.0
+        piggy_id, ctx_id = int(piggy_name_ids[i]), int(ctx_name_ids[ctx_idx])
+        code = piggy_id * len(vocabulary) + ctx_id
+        name_sim = name_scores.get(code)
+        if name_sim is None:
+            name_sim = name_scores[code] = cleaned_name_similarity(vocabulary[piggy_id], vocabulary[ctx_id])
+        return name_sim
+
+    def score_nearest(i, ctx_idx, distance):
+        """Name similarity, street similarity and confidence of one pair"""
+        name_sim = name_similarity(i, ctx_idx)
+        return (name_sim, *score_pair(i, ctx_idx, distance, name_sim))
+
+    # Strong phone/website keys first; matched rows skip the fuzzy scoring
+    key_pairs = {}
+    key_ctx = np.zeros(len(ctx_df), dtype=bool)
+    if settings['key_matching']:
+        same_name = None
+        if not ignore_name:
+            same_name = lambda i, ctx_idx: name_similarity(i, ctx_idx) >= KEY_MATCH_MIN_NAME_SIMILARITY
+        key_pairs = key_match_pairs(piggy_df, ctx_df, settings['key_match_max_distance'], same_name)
+        key_ctx[[ctx_idx for ctx_idx, _, _ in key_pairs.values()]] = True
+
+    # Name-similar pairs by MinHash LSH; other pairs are not scored
+    lsh_codes = None
+    if settings['name_lsh'] and not ignore_name:
+        lsh_codes = name_lsh_pairs(piggy_name_ids, ctx_name_ids, vocabulary)
+
+    # Co-located pairs by plus code cell, found before any distance or name computation
+    plus_pairs = {}
+    if settings['plus_code_matching']:
+        plus_pairs = plus_code_join(piggy_df, ctx_df, parse_plus_code_lengths(settings['plus_code_lengths']))
+
+    piggy_columns = confidence_columns(piggy_df)
+    ctx_columns = confidence_columns(ctx_df)
+    piggy_lats = piggy_df['latitude'].to_numpy(dtype=float)
+    piggy_lons = piggy_df['longitude'].to_numpy(dtype=float)
+    ctx_lats = ctx_df['latitude'].to_numpy(dtype=float)
+    ctx_lons = ctx_df['longitude'].to_numpy(dtype=float)
+
+    # Latitude-sorted CTX index for band lookups
+    if ctx_order is None:
+        ctx_order = latitude_order(ctx_df)
+    search = CandidateSearch(ctx_lats, ctx_lons, ctx_order, settings, max_distance,
+                             radians=coordinate_radians(ctx_df))
+
+    def keep(i, candidates):
+        """Candidates of Piggy row i that are scored: not key matched, name-similar by LSH, house numbers agreeing"""
+        within = ~key_ctx[candidates]
+        if lsh_codes is not None:
+            within &= sorted_membership(lsh_codes, piggy_name_ids[i] * len(vocabulary) + ctx_name_ids[candidates])
+        if prune_house_numbers:
+            within &= house_number_mask(piggy_house_numbers[i], ctx_house_numbers[candidates])
+        return within
+
+    columns = {name: [] for name in CANDIDATE_FEATURE_COLUMNS}
+    total = len(piggy_df)
+
+    batch_size = settings['batch_size']
+    for batch_start in range(0, total, batch_size):
+        batch_key = f"features_{batch_start}"
+        if checkpoint is not None and batch_key in checkpoint.completed:
+            for name, values in checkpoint.completed[batch_key].items():
+                columns[name].extend(values)
+            continue
+
+        # Collect the batch's candidate pairs first
+        batch_pairs = []
+        for i in range(batch_start, min(batch_start + batch_size, total)):
+            reporter.progress(i + 1, total)
+            found = search.row_pairs(i, piggy_lats[i], piggy_lons[i], key_pairs.get(i), plus_pairs.get(i),
+                                     lambda candidates: keep(i, candidates),
+                                     lambda ctx_idx, distance: score_nearest(i, ctx_idx, distance))
+            if found is not None:
+                batch_pairs.append(found)
+
+        # Then score the distinct name pairs among them and broadcast back to the location pairs
+        scored = [entry for entry in batch_pairs if entry[6] is None]
+        name_sims = None
+        if not ignore_name and scored:
+            pair_piggy = np.concatenate([np.full(len(entry[1]), entry[0], dtype=np.int64) for entry in scored])
+            pair_ctx = np.concatenate([entry[1] for entry in scored]).astype(np.int64)
+            name_sims = iter(score_name_pairs(piggy_name_ids[pair_piggy], ctx_name_ids[pair_ctx],
+                                              vocabulary, name_scores).tolist())
+
+        def score_scored(i, ctx_idx, distance):
+            """Scores of a pair whose name similarity is the next of name_sims"""
+            name_sim = 0.0 if ignore_name else next(name_sims)
+            return (name_sim, *score_pair(i, ctx_idx, distance, name_sim))
+
+        batch_columns = {name: [] for name in columns}
+        add_candidate_pairs(batch_columns, batch_pairs, score_scored)
+        for name, values in batch_columns.items():
+            columns[name].extend(values)
+        if checkpoint is not None:
+            checkpoint.record(batch_key, batch_columns)
+
+    features = candidate_feature_table(columns, piggy_lats, piggy_lons, ctx_lats, ctx_lons)
+    features.attrs['max_distance'] = max_distance
+    if adaptive_radius and len(features):
+        radii = features.groupby('piggy_index')['search_radius'].first()
+        reporter.log(f"Adaptive search radius: median {radii.median():.2f} mi "
+                     f"({radii.min():.2f}-{radii.max():.2f} mi)")
+    return features
+
+def threshold_passes(features, settings, check_distance=True):
+    """Rows of a candidate feature table that pass the distance, name and confidence thresholds"""
+    passes = features['confidence'].to_numpy() >= settings['min_confidence']
+    if check_distance:
+        passes &= features['distance_miles'].to_numpy() <= search_radii(features, settings)
+    if not settings['ignore_name_matching']:
+        passes &= features['name_similarity'].to_numpy() >= settings['min_name_similarity']
+    return passes
+
+def search_radii(features, settings):
+    """Radius of each row of a candidate feature table: its search_radius, at most settings['max_distance']"""
+    return np.minimum(features['search_radius'].to_numpy(), settings['max_distance'])
+
+def key_match_rows(features):
+    """Positions of phone/website key matches in a candidate feature table, ordered by Piggy index"""
+    key_rows = np.flatnonzero(features['match_key'].to_numpy() != '')
+    return key_rows[np.argsort(features['piggy_index'].to_numpy()[key_rows], kind='stable')]
+
+def coordinate_step_rows(features, settings, passes=None, key_ctx=None):
+    """Positions of Step 1 matches (co-located pairs), ordered by Piggy then CTX index.
+
+    Co-located means a coordinate cell level (see coordinate_cell_levels; with
+    the cascade, the finest level at which the Piggy row is co-located with a
+    passing CTX row) or, with plus code matching, the finest plus code length at
+    which the Piggy row joined a passing CTX row. Plus code pairs only need to
+    pass the name and confidence thresholds. CTX
+    rows taken by key matches (key_ctx, by default those in this table) are
+    left out, as they are when the table is built in one piece.
+    """
+    if passes is None:
+        passes = threshold_passes(features, settings)
+    piggy_index = features['piggy_index'].to_numpy()
+    ctx_index = features['ctx_index'].to_numpy()
+    key_rows = key_match_rows(features)
+    if key_ctx is None:
+        key_ctx = ctx_index[key_rows]
+    available = ~np.isin(ctx_index, key_ctx)
+    available[key_rows] = False
+
+    # Same coordinate cell; with the cascade each Piggy row's pairs at its finest level
+    levels = coordinate_cell_levels(features['piggy_lat'].to_numpy(), features['piggy_lon'].to_numpy(),
+                                    features['ctx_lat'].to_numpy(), features['ctx_lon'].to_numpy(), settings)
+    cell_rows = np.flatnonzero(passes & (levels > 0) & available)
+    step1 = np.zeros(len(features), dtype=bool)
+    step1[cell_rows[finest_per_row(piggy_index[cell_rows], levels[cell_rows])]] = True
+
+    if settings['plus_code_matching']:
+        # Keep each Piggy row's pairs at its finest joined length
+        plus_length = features['plus_code_length'].to_numpy()
+        plus_rows = np.flatnonzero((plus_length > 0) & available &
+                                   threshold_passes(features, settings, check_distance=False))
+        step1[plus_rows[finest_per_row(piggy_index[plus_rows], plus_length[plus_rows])]] = True
+
+    step1 = np.flatnonzero(step1)
+    return step1[np.lexsort((ctx_index[step1], piggy_index[step1]))]
+
+def select_matches_from_features(features, settings, step1_ctx=None, key_ctx=None):
+    """Apply thresholds to a candidate feature table.
+
+    Key matches come first and are kept whatever the thresholds, then Step 1
+    (co-located pairs, see coordinate_step_rows), then Step 2 (the remaining
+    pairs, best confidence first). settings['max_distance'] must not exceed
+    the radius the table was built with; rows are searched within their
+    search_radius (see search_radii). When the table only covers part of the
+    Piggy rows (tiled runs), step1_ctx and key_ctx list the CTX indices matched
+    in Step 1 and by key matches anywhere so they are excluded here as well.
+    """
+    coordinate_precision = settings['coordinate_precision']
+    ignore_city = settings['ignore_city_matching']
+    ignore_state = settings['ignore_state_matching']
+
+    piggy_index = features['piggy_index'].to_numpy()
+    ctx_index = features['ctx_index'].to_numpy()
+    confidence = features['confidence'].to_numpy()
+    piggy_lat = features['piggy_lat'].to_numpy()
+    piggy_lon = features['piggy_lon'].to_numpy()
+    ctx_lat = features['ctx_lat'].to_numpy()
+    ctx_lon = features['ctx_lon'].to_numpy()
+
+    # Step 0: phone/website key matches
+    key_rows = key_match_rows(features)
+    if key_ctx is None:
+        key_ctx = ctx_index[key_rows]
+
+    # Step 1: co-located pairs (truncated coordinates or plus codes)
+    passes = threshold_passes(features, settings)
+    step1 = coordinate_step_rows(features, settings, passes, key_ctx)
+    if step1_ctx is None:
+        step1_ctx = ctx_index[step1]
+
+    # Step 2: remaining rows inside the bounding box of the search radius
+    radii = search_radii(features, settings)
+    lat_deg = radii * (1 / 69.0)
+    lon_deg = radii * (1 / (69.0 * np.cos(np.radians(piggy_lat))))
+    in_box = ((ctx_lat >= piggy_lat - lat_deg) & (ctx_lat <= piggy_lat + lat_deg) &
+              (ctx_lon >= piggy_lon - lon_deg) & (ctx_lon <= piggy_lon + lon_deg))
+    unmatched = (~np.isin(piggy_index, piggy_index[np.concatenate([key_rows, step1])]) &
+                 ~np.isin(ctx_index, step1_ctx) & ~np.isin(ctx_index, key_ctx))
+    step2 = np.flatnonzero(passes & in_box & unmatched)
+    step2 = step2[np.lexsort((ctx_index[step2], -confidence[step2], piggy_index[step2]))]
+    if not settings['show_all_potential_matches']:
+        _, first = np.unique(piggy_index[step2], return_index=True)
+        step2 = step2[np.sort(first)]
+
+    records = features.iloc[np.concatenate([key_rows, step1, step2])].to_dict('records')
+    step1_levels = coordinate_cell_levels(piggy_lat[step1], piggy_lon[step1], ctx_lat[step1], ctx_lon[step1],
+                                          settings).tolist()
+    matches = []
+    for number, record in enumerate(records):
+        if number < len(key_rows):
+            reasons = f"{record['match_key']}_key_match"
+        elif number < len(key_rows) + len(step1) and record['plus_code_length']:
+            reasons = f"plus_code_{record['plus_code_length']}, coordinate_priority_match"
+        elif number < len(key_rows) + len(step1) and settings.get('coordinate_cascade'):
+            reasons = f"coordinate_cell_{step1_levels[number - len(key_rows)]}dp, coordinate_priority_match"
+        elif number < len(key_rows) + len(step1):
+            reasons = f"truncated_coordinates_{coordinate_precision}dp, coordinate_priority_match"
+        else:
+            reasons = f"coordinate_priority_proximity, distance_{record['distance_miles']:.3f}mi"
+        matches.append({
+            'piggy_index': record['piggy_index'],
+            'ctx_index': record['ctx_index'],
+            'distance_miles': record['distance_miles'],
+            'name_similarity': record['name_similarity'],
+            'address_similarity': record['address_similarity'],
+            'confidence': record['confidence'],
+            'reasons': reasons,
+            'city_match': not ignore_city,
+            'state_match': not ignore_state,
+            'geographic_warning': ''
+        })
+
+    return matches
+
+# Street similarity a pair without a distance needs, besides the same house number: the same
+# name in the same state is not enough, as chains have many stores per state
+NAME_ONLY_MIN_STREET_SIMILARITY = 0.8
+
+def name_only_confidence(name_sim, street_addr_sim, city_match, zip_match):
+    """Confidence of a pair without a distance: name and street address similarity plus the city and ZIP bonuses"""
+    confidence = name_sim * 0.6 + street_addr_sim * 0.3
+    if city_match:
+        confidence += 0.05
+    if zip_match:
+        confidence += 0.05
+    return min(confidence, 1.0)
+
+def match_rows_without_coordinates(piggy_df, ctx_df, settings, matched_piggy, matched_ctx):
+    """Matches between unmatched rows of which at least one has no coordinates.
+
+    piggy_df and ctx_df hold all rows of both files, those without coordinates
+    included. Candidates are pairs in the same state whose names share a band
+    of name_lsh_pairs; Piggy rows in matched_piggy and CTX rows in matched_ctx
+    are left out. Pairs are scored with name_only_confidence and must pass the
+    name and confidence thresholds and agree on the street address: the same
+    house number and streets at least NAME_ONLY_MIN_STREET_SIMILARITY alike. Each row is matched at most once:
+    pairs are taken best confidence first, skipping rows already matched, and
+    listed by Piggy row.
+    """
+    ignore_city = settings['ignore_city_matching']
+    ignore_zip = settings['ignore_zip_matching']
+
+    piggy_missing = (piggy_df['latitude'].isna() | piggy_df['longitude'].isna()).to_numpy()
+    ctx_missing = (ctx_df['latitude'].isna() | ctx_df['longitude'].isna()).to_numpy()
+    piggy_open = np.flatnonzero(~np.isin(np.arange(len(piggy_df)), list(matched_piggy)))
+    ctx_open = np.flatnonzero(~np.isin(np.arange(len(ctx_df)), list(matched_ctx)))
+    if not (piggy_missing[piggy_open].any() or ctx_missing[ctx_open].any()):
+        return []
+
+    piggy_ids, ctx_ids, vocabulary = factorize_names(clean_names(piggy_df), clean_names(ctx_df))
+    lsh_codes = name_lsh_pairs(piggy_ids[piggy_open], ctx_ids[ctx_open], vocabulary)
+
+    # Expand the name pairs to row pairs in the same state
+    name_pairs = pd.DataFrame({'piggy_name': lsh_codes // len(vocabulary), 'ctx_name': lsh_codes % len(vocabulary)})
+    piggy_rows = pd.DataFrame({'piggy_index': piggy_open, 'piggy_name': piggy_ids[piggy_open],
+                               'state': [normalize_state(state) for state in piggy_df['state'].to_numpy()[piggy_open]]})
+    ctx_rows = pd.DataFrame({'ctx_index': ctx_open, 'ctx_name': ctx_ids[ctx_open],
+                             'state': [normalize_state(state) for state in ctx_df['territory'].to_numpy()[ctx_open]]})
+    pairs = piggy_rows[piggy_rows['state'] != ''].merge(name_pairs, on='piggy_name').merge(ctx_rows, on=['ctx_name', 'state'])
+    pair_piggy = pairs['piggy_index'].to_numpy(dtype=np.int64)
+    pair_ctx = pairs['ctx_index'].to_numpy(dtype=np.int64)
+    keep = piggy_missing[pair_piggy] | ctx_missing[pair_ctx]
+    pair_piggy, pair_ctx = pair_piggy[keep], pair_ctx[keep]
+    if len(pair_piggy) == 0:
+        return []
+
+    name_sims = score_name_pairs(piggy_ids[pair_piggy], ctx_ids[pair_ctx], vocabulary, {})
+    piggy_streets, piggy_house_numbers = street_features(piggy_df)
+    ctx_streets, ctx_house_numbers = street_features(ctx_df)
+    same_house_number = ((piggy_house_numbers[pair_piggy] == ctx_house_numbers[pair_ctx]) &
+                         (piggy_house_numbers[pair_piggy] != ''))
+    piggy_columns = {name: piggy_df[name].to_numpy(dtype=object) for name in ('city', 'zip')}
+    ctx_columns = {name: ctx_df[name].to_numpy(dtype=object) if name in ctx_df else np.full(len(ctx_df), '', dtype=object)
+                   for name in ('city', 'zip')}
+    street_sims = np.empty(len(pair_piggy))
+    confidences = np.empty(len(pair_piggy))
+    for n, (piggy_idx, ctx_idx, name_sim) in enumerate(zip(pair_piggy.tolist(), pair_ctx.tolist(), name_sims.tolist())):
+        street_sims[n] = street_pair_similarity(piggy_streets[piggy_idx], ctx_streets[ctx_idx])
+        city_match = not ignore_city and cities_match(piggy_columns['city'][piggy_idx], ctx_columns['city'][ctx_idx])
+        zip_match = not ignore_zip and zip_codes_match(piggy_columns['zip'][piggy_idx], ctx_columns['zip'][ctx_idx])
+        confidences[n] = name_only_confidence(name_sim, street_sims[n], city_match, zip_match)
+
+    passes = np.flatnonzero((name_sims >= settings['min_name_similarity']) &
+                            same_house_number & (street_sims >= NAME_ONLY_MIN_STREET_SIMILARITY) &
+                            (confidences >= settings['min_confidence']))
+
+    # Best pair per row: greedily by confidence, so neither side is matched twice
+    taken_piggy, taken_ctx, best = set(), set(), []
+    for n in passes[np.lexsort((pair_ctx[passes], pair_piggy[passes], -confidences[passes]))].tolist():
+        if pair_piggy[n] not in taken_piggy and pair_ctx[n] not in taken_ctx:
+            taken_piggy.add(pair_piggy[n])
+            taken_ctx.add(pair_ctx[n])
+            best.append(n)
+    passes = np.array(best, dtype=np.int64)
+    passes = passes[np.argsort(pair_piggy[passes], kind='stable')]
+
+    return [{
+        'piggy_index': int(pair_piggy[n]),
+        'ctx_index': int(pair_ctx[n]),
+        'distance_miles': float('nan'),
+        'name_similarity': float(name_sims[n]),
+        'address_similarity': float(street_sims[n]),
+        'confidence': float(confidences[n]),
+        'reasons': "name_lsh_match, no_coordinates",
+        'city_match': not ignore_city,
+        'state_match': True,
+        'geographic_warning': ''
+    } for n in passes.tolist()]
+
+def summarize_matches(matches, piggy_count, ctx_count):
+    """Confidence breakdown and unique counts, as shown in the analysis summary"""
+    confidences = np.array([m['confidence'] for m in matches], dtype=float)
+    duplicates = [m for m in matches if m['confidence'] >= 0.5]
+    return {
+        'total_matches': len(matches),
+        'high_confidence': int(np.sum(confidences >= 0.9)),
+        'medium_confidence': int(np.sum((confidences >= 0.7) & (confidences < 0.9))),
+        'low_confidence': int(np.sum((confidences >= 0.5) & (confidences < 0.7))),
+        'potential': int(np.sum(confidences < 0.5)),
+        'unique_piggy': piggy_count - len({m['piggy_index'] for m in duplicates}),
+        'unique_ctx': ctx_count - len({m['ctx_index'] for m in duplicates})
+    }
+
+def candidate_cache_key(settings):
+    """Key of the candidate table for the selected input files and matching options"""
+    return input_fingerprint([settings['piggy_file'], settings['ctx_file']], settings, candidate_setting_keys(settings))
+
+def save_candidate_cache(path, key, features, piggy_count, ctx_count):
+    """Store the last run's scored candidate table for instant re-thresholding"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump({
+            'key': key,
+            'radius': features.attrs['max_distance'],
+            'features': features,
+            'piggy_count': piggy_count,
+            'ctx_count': ctx_count
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+
+def load_candidate_cache(path, key=None, max_distance=None):
+    """Load a cached candidate table, or None if missing, stale or built with a smaller radius"""
+    try:
+        with open(path, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+    if key is not None and cache.get('key') != key:
+        return None
+    if max_distance is not None and max_distance > cache['radius']:
+        return None
+    return cache
+
+# Preprocessed input snapshots: bump the version when the stored columns change
+SNAPSHOT_VERSION = 5
+# Snapshots kept in the snapshot directory; the least recently used are removed
+SNAPSHOT_KEEP = 8
+# Content hashes of input files in the snapshot directory, by path, with the size and modification time hashed
+SNAPSHOT_HASHES_FILE = 'file_hashes.json'
+
+def category_code_dtype(count):
+    """Code dtype pandas uses for count categories, which Categorical.from_codes keeps without a copy"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if count < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def file_sha1(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def snapshot_file_sha1(path, snapshot_root):
+    """file_sha1 of an input file, hashed again only when its size or modification time changed
+    since it was last hashed for snapshot_root"""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    hashes_file = os.path.join(snapshot_root, SNAPSHOT_HASHES_FILE)
+    try:
+        with open(hashes_file, 'r', encoding='utf-8') as f:
+            hashes = json.load(f)
+    except (OSError, ValueError):
+        hashes = {}
+    entry = hashes.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha1']
+
+    sha1 = file_sha1(path)
+    # Forget files whose snapshots were pruned; a concurrent run's entry may be lost, costing one rehash
+    hashes = {name: value for name, value in hashes.items() if os.path.isdir(os.path.join(snapshot_root, value['sha1']))}
+    hashes[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': sha1}
+    os.makedirs(snapshot_root, exist_ok=True)
+    temp_file = f"{hashes_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f)
+    os.replace(temp_file, hashes_file)
+    return sha1
+
+def write_dataset_snapshot(df, total_rows, snapshot_dir, arrays=None):
+    """Store a dataset column by column so it can be memory-mapped later.
+
+    Numeric and boolean columns are saved as .npy arrays. Text columns are
+    dictionary-encoded: their distinct values as one UTF-8 file with an offsets
+    array, and each row's value as an integer code into them (-1 when missing),
+    which loads far faster than parsing the CSV. arrays, named arrays derived
+    from the rows, are saved with them for read_snapshot_arrays. The snapshot
+    appears atomically.
+    """
+    temp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=os.path.dirname(snapshot_dir))
+    columns = []
+    for number, name in enumerate(df.columns):
+        values = df[name]
+        stem = os.path.join(temp_dir, f"{number:03d}")
+        if values.dtype.kind in 'biuf':
+            np.save(stem + '.npy', values.to_numpy())
+            columns.append({'name': name, 'kind': 'array'})
+            continue
+
+        # Values that only differ in type (1 and '1') share their text
+        codes, uniques = pd.factorize(values)
+        remap, strings = pd.factorize(np.array([str(value) for value in uniques], dtype=object))
+        codes = np.where(codes >= 0, remap[codes], -1).astype(category_code_dtype(len(strings)))
+        encoded = [string.encode('utf-8') for string in strings]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        np.save(stem + '.codes.npy', codes)
+        np.save(stem + '.offsets.npy', np.concatenate([[0], np.cumsum(lengths)]))
+        with open(stem + '.txt', 'wb') as f:
+            f.write(b''.join(encoded))
+        columns.append({'name': name, 'kind': 'text'})
+
+    arrays = arrays or {}
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_dir, f"{name}.npy"), array)
+
+    with open(os.path.join(temp_dir, 'snapshot.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'total_rows': total_rows, 'rows': len(df), 'columns': columns,
+                   'arrays': list(arrays)}, f)
+    os.replace(temp_dir, snapshot_dir)
+
+def read_dataset_snapshot(snapshot_dir):
+    """Load a snapshot written by write_dataset_snapshot, or None if it is missing or outdated.
+
+    Returns (DataFrame, total_rows). Numeric columns are memory-mapped. Text
+    columns are categorical: only their distinct values are decoded, and the
+    codes of the rows stay memory-mapped.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, 'snapshot.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != SNAPSHOT_VERSION:
+        return None
+
+    data = {}
+    try:
+        for number, column in enumerate(meta['columns']):
+            stem = os.path.join(snapshot_dir, f"{number:03d}")
+            if column['kind'] == 'array':
+                data[column['name']] = np.load(stem + '.npy', mmap_mode='r')
+                continue
+
+            offsets = np.load(stem + '.offsets.npy').tolist()
+            with open(stem + '.txt', 'rb') as f:
+                text = f.read()
+            categories = pd.Index([text[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])],
+                                  dtype=object)
+            codes = np.load(stem + '.codes.npy', mmap_mode='r')
+            data[column['name']] = pd.Categorical.from_codes(codes, categories=categories, validate=False)
+    except (OSError, ValueError):
+        return None
+
+    # Mark as recently used for pruning
+    os.utime(os.path.join(snapshot_dir, 'snapshot.json'))
+    return pd.DataFrame(data, copy=False), meta['total_rows']
+
+def read_snapshot_arrays(snapshot_dir):
+    """The arrays saved with a snapshot by write_dataset_snapshot, memory-mapped, by name"""
+    with open(os.path.join(snapshot_dir, 'snapshot.json'), 'r', encoding='utf-8') as f:
+        names = json.load(f).get('arrays', [])
+    return {name: np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode='r') for name in names}
+
+def prune_dataset_snapshots(snapshot_root, keep=SNAPSHOT_KEEP):
+    """Remove all but the most recently used snapshots"""
+    snapshots = []
+    for entry in os.scandir(snapshot_root):
+        meta_file = os.path.join(entry.path, 'snapshot.json')
+        if entry.is_dir() and not entry.name.startswith('.') and os.path.exists(meta_file):
+            snapshots.append((os.path.getmtime(meta_file), entry.path))
+    for _, path in sorted(snapshots, reverse=True)[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+# Data frame libraries for loading datasets and the report's anti-joins
+DATAFRAME_BACKENDS = ('pandas', 'polars')
+# Dataset columns the jobs use; the Polars backend reads only these
+DATASET_COLUMNS = ['name', 'address1', 'city', 'territory', 'state', 'zip', 'latitude', 'longitude',
+                   'plusCode', 'phone', 'website']
+# Strings pandas.read_csv reads as missing values by default
+CSV_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                 '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+def scan_dataset(path):
+    """Lazy Polars scan of a dataset CSV with the DATASET_COLUMNS it has, typed from the whole
+    file, plus '_source_row' (as read_dataset), and the names of its decimal columns.
+
+    Decimal columns are scanned as text: Polars parses decimals exactly while
+    pandas.read_csv may be one unit in the last place off, which would change
+    distances in the report. polars_to_pandas parses them as pandas does.
+    """
+    schema = pl.scan_csv(path, infer_schema_length=None, null_values=CSV_NA_VALUES).collect_schema()
+    decimal_columns = [name for name, dtype in schema.items() if dtype.is_float()]
+    scan = pl.scan_csv(path, infer_schema_length=None, null_values=CSV_NA_VALUES,
+                       schema_overrides={name: pl.String for name in decimal_columns})
+    scan = scan.select([name for name in schema.names() if name in DATASET_COLUMNS])
+    return scan.with_columns(pl.int_range(pl.len(), dtype=pl.Int64).alias('_source_row')), decimal_columns
+
+def polars_to_pandas(frame, decimal_columns=()):
+    """pandas DataFrame of a Polars DataFrame, typed as pandas.read_csv types it (missing values
+    as NaN, all-missing columns as floats); decimal_columns hold text parsed here"""
+    data = {}
+    for name in frame.columns:
+        column = frame[name]
+        if column.null_count() == len(column):
+            data[name] = np.full(len(column), np.nan)
+        elif name in decimal_columns:
+            data[name] = pd.to_numeric(column.to_numpy()).astype(float)
+        elif column.null_count() and not column.dtype.is_numeric():
+            data[name] = np.where(column.is_null().to_numpy(), np.nan, column.to_numpy().astype(object))
+        else:
+            data[name] = column.to_numpy()
+    return pd.DataFrame(data)
+
+def read_dataset(path, backend='pandas', without_coordinates=False):
+    """Rows of a CSV file that have coordinates, followed with without_coordinates by
+    those that do not, and the file's total row count.
+
+    The rows are renumbered from 0; '_source_row' keeps each row's position in
+    the file. The Polars backend runs one lazy plan: the coordinate filter and the column
+    selection are pushed into the multi-threaded CSV scan, and the row count
+    shares the scan.
+    """
+    if backend == 'polars':
+        scan, decimal_columns = scan_dataset(path)
+        has_coordinates = pl.col('latitude').is_not_null() & pl.col('longitude').is_not_null()
+        plans = [scan.select(pl.len()), scan.filter(has_coordinates)]
+        if without_coordinates:
+            plans.append(scan.filter(~has_coordinates))
+        total, *rows = pl.collect_all(plans)
+        return polars_to_pandas(pl.concat(rows), decimal_columns), total.item()
+
+    df = pd.read_csv(path)
+    df['_source_row'] = np.arange(len(df))
+    has_coordinates = (df['latitude'].notna() & df['longitude'].notna()).to_numpy()
+    rows = df[has_coordinates]
+    if without_coordinates:
+        rows = pd.concat([rows, df[~has_coordinates]])
+    return rows.reset_index(drop=True), len(df)
+
+def rows_with_coordinates(df):
+    """The rows of a dataset from read_dataset or load_dataset that have coordinates (they come first)"""
+    return df.iloc[:int((df['latitude'].notna() & df['longitude'].notna()).sum())]
+
+def name_only_matching(settings):
+    """Whether a comparison also matches rows without coordinates by name (see match_rows_without_coordinates)"""
+    return settings['name_lsh'] and not settings['ignore_name_matching']
+
+def unmatched_rows(df, matched, backend='pandas'):
+    """Rows of df whose index label is not in matched, in order; an anti-join in Polars with that backend"""
+    if backend == 'polars':
+        labels = pl.LazyFrame({'label': df.index.to_numpy()}, schema={'label': pl.Int64}).with_row_index('position')
+        matched_labels = pl.LazyFrame({'label': list(matched)}, schema={'label': pl.Int64})
+        kept = labels.join(matched_labels, on='label', how='anti', maintain_order='left').select('position').collect()
+        return df.iloc[kept['position'].to_numpy()]
+    return df[~df.index.isin(list(matched))]
+
+def load_dataset(path, snapshot_root=None, reporter=None, backend='pandas', without_coordinates=False):
+    """Rows of a CSV file as read_dataset returns them, and the file's total row count.
+
+    With a snapshot directory the parsed rows (all of them) and the columns
+    preprocess_dataset derives from them are stored there keyed by the file's
+    content hash (see snapshot_file_sha1), and later runs on the same file load
+    the snapshot instead of parsing the CSV again.
+    """
+    reporter = reporter or JobReporter()
+
+    if not snapshot_root:
+        return read_dataset(path, backend, without_coordinates)
+
+    snapshot_dir = os.path.join(snapshot_root, snapshot_file_sha1(path, snapshot_root))
+    snapshot = read_dataset_snapshot(snapshot_dir)
+    if snapshot is not None:
+        reporter.log(f"Loaded {os.path.basename(path)} from snapshot")
+        rows, total_rows = snapshot
+    else:
+        rows, total_rows = read_dataset(path, backend, without_coordinates=True)
+        preprocess_dataset(rows)
+        os.makedirs(snapshot_root, exist_ok=True)
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        write_dataset_snapshot(rows, total_rows, snapshot_dir)
+        prune_dataset_snapshots(snapshot_root)
+        reporter.log(f"Saved snapshot of {os.path.basename(path)} for faster reruns")
+
+    return (rows if without_coordinates else rows_with_coordinates(rows)), total_rows
+
+def preprocess_dataset(df):
+    """Add what every run derives from the rows (cleaned names, parsed street addresses, coordinates
+    in radians, plus code cells of the rows with coordinates, -1 for the others) as the snapshot
+    columns, unless df already has them"""
+    if '_clean_name' not in df:
+        df['_clean_name'] = clean_names(df)
+        df['_street'], df['_house_number'] = street_features(df)
+        df['_latitude_radians'], df['_longitude_radians'] = coordinate_radians(df)
+        located = (df['latitude'].notna() & df['longitude'].notna()).to_numpy()
+        for length in PLUS_CODE_LENGTHS:
+            codes = np.full(len(df), -1, dtype=np.int64)
+            codes[located] = plus_code_cell_codes(*plus_code_cells(df[located], length))
+            df[f'_plus_code_{length}'] = codes
+    return df
+
+def run_advanced_comparison(settings, reporter):
+    """Load both CSV files, match them and save the comparison report"""
+    if settings['tiled_matching']:
+        return run_tiled_comparison(settings, reporter)
+
+    start_time = time.time()
+    reporter.stage("Loading and analyzing CSV files...")
+
+    # Load files (from their snapshots when unchanged since the last run)
+    piggy_rows, piggy_total = load_dataset(settings['piggy_file'], settings.get('snapshot_dir'), reporter,
+                                           settings['dataframe_backend'], name_only_matching(settings))
+    ctx_rows, ctx_total = load_dataset(settings['ctx_file'], settings.get('snapshot_dir'), reporter,
+                                       settings['dataframe_backend'], name_only_matching(settings))
+
+    return compare_datasets(settings, reporter, piggy_rows, piggy_total, ctx_rows, ctx_total, start_time)
+
+def compare_datasets(settings, reporter, piggy_rows, piggy_total, ctx_rows, ctx_total, start_time, ctx_order=None):
+    """Match loaded Piggy and CTX datasets (as returned by load_dataset, with the rows without
+    coordinates when name_only_matching) and save the comparison report. ctx_order is the
+    latitude_order of the CTX rows with coordinates, computed unless given."""
+    reporter.log(f"Loaded {piggy_total} records from Piggy file")
+    reporter.log(f"Loaded {ctx_total} records from CTX file")
+
+    # Data quality analysis
+    reporter.stage("Analyzing data quality...")
+
+    reporter.log(f"Data quality check:")
+    reporter.log(f"  Piggy: {len(rows_with_coordinates(piggy_rows))}/{piggy_total} have valid coordinates")
+    reporter.log(f"  CTX: {len(rows_with_coordinates(ctx_rows))}/{ctx_total} have valid coordinates")
+
+    if not settings['enable_reverse_geocoding']:
+        return match_and_report(settings, reporter, piggy_rows, ctx_rows, start_time, ctx_order=ctx_order)
+
+    # Reverse geocode every location in the background while matching runs
+    reporter.log("Reverse geocoding enabled - locations are looked up in the background while matching runs")
+    with ReverseGeocodingPipeline(itertools.chain(
+            zip(piggy_rows['latitude'], piggy_rows['longitude']),
+            zip(ctx_rows['latitude'], ctx_rows['longitude']))) as geocoding:
+        return match_and_report(settings, reporter, piggy_rows, ctx_rows, start_time, geocoding, ctx_order)
+
+def match_and_report(settings, reporter, piggy_rows, ctx_rows, start_time, geocoding=None, ctx_order=None):
+    """Match loaded datasets and stream the comparison report, its corrected locations from the
+    ReverseGeocodingPipeline geocoding when reverse geocoding is enabled. Rows without
+    coordinates, if loaded, are matched by name and listed in the report. ctx_order is passed
+    on to build_candidate_features."""
+    piggy_valid_coords = rows_with_coordinates(piggy_rows)
+    ctx_valid_coords = rows_with_coordinates(ctx_rows)
+
+    # Advanced matching analysis
+    reporter.stage("Performing coordinate-priority matching...")
+
+    # Reuse the last run's candidate table unless the search got wider or the inputs changed
+    cache_file = settings.get('candidate_cache_file')
+    cache_key = candidate_cache_key(settings)
+    cache = load_candidate_cache(cache_file, cache_key, settings['max_distance']) if cache_file else None
+
+    if cache is not None:
+        features = cache['features']
+        reporter.log(f"Reusing cached candidate table ({len(features)} pairs within {cache['radius']} miles)")
+    else:
+        # Checkpoint completed candidate batches next to the output
+        piggy_stem = os.path.splitext(os.path.basename(settings['piggy_file']))[0]
+        ctx_stem = os.path.splitext(os.path.basename(settings['ctx_file']))[0]
+        checkpoint = JobCheckpoint(
+            os.path.join(settings['output_dir'], f"{piggy_stem}_vs_{ctx_stem}.matching.checkpoint"),
+            input_fingerprint([settings['piggy_file'], settings['ctx_file']], settings,
+                              candidate_setting_keys(settings) + ['max_distance', 'batch_size']),
+            settings['resume_from_checkpoint']
+        )
+        if checkpoint.completed:
+            reporter.log(f"Resuming from checkpoint: {len(checkpoint.completed)} completed batches")
+
+        try:
+            features = build_candidate_features(piggy_valid_coords, ctx_valid_coords, settings,
+                                                settings['max_distance'], reporter, checkpoint, ctx_order)
+        finally:
+            checkpoint.close()
+
+        if cache_file:
+            save_candidate_cache(cache_file, cache_key, features, len(piggy_valid_coords), len(ctx_valid_coords))
+
+    all_matches = select_matches_from_features(features, settings)
+
+    # Rows without coordinates are matched by name within their state
+    if name_only_matching(settings):
+        matched = [match for match in all_matches if match['confidence'] >= 0.5]
+        name_matches = match_rows_without_coordinates(
+            piggy_rows, ctx_rows, settings,
+            {match['piggy_index'] for match in matched}, {match['ctx_index'] for match in matched})
+        reporter.log(f"Matched {len(name_matches)} rows without coordinates by name and state")
+        all_matches += name_matches
+
+    processing_time = time.time() - start_time
+    reporter.log(f"Found {len(all_matches)} potential matches in {processing_time:.1f} seconds")
+
+    # Create detailed comparison report
+    reporter.stage("Creating detailed comparison report...")
+
+    # Check if reverse geocoding is enabled
+    enable_geocoding = settings['enable_reverse_geocoding']
+    if geocoding is not None:
+        # The report starts with the matched rows: look their locations up next
+        geocoding.prioritize(itertools.chain.from_iterable(
+            ((piggy_rows.at[match['piggy_index'], 'latitude'], piggy_rows.at[match['piggy_index'], 'longitude']),
+             (ctx_rows.at[match['ctx_index'], 'latitude'], ctx_rows.at[match['ctx_index'], 'longitude']))
+            for match in all_matches))
+        reporter.log(f"Reverse geocoded {geocoding.lookups()} locations while matching")
+    elif enable_geocoding:
+        reporter.log("Reverse geocoding enabled - this may take additional time...")
+        # Add rate limiting delay for geocoding API
+        time.sleep(0.1)
+
+    # Stream the report with timestamp; the summary is tallied as rows are written
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename_suffix = "_with_geocoding" if enable_geocoding else ""
+    output_file = report_file_path(settings['output_dir'], f"coordinate_priority_comparison_{timestamp}{filename_suffix}",
+                                   settings['report_compression'])
+    with ReportWriter(output_file, settings['report_compression'], enable_geocoding,
+                      settings['dataframe_backend'], geocoding) as writer:
+        matched_piggy = writer.add_matches(piggy_rows, ctx_rows, all_matches)
+        writer.add_unique_piggy(piggy_rows, matched_piggy)
+        writer.add_unique_ctx(ctx_rows)
+    if cache is None:
+        checkpoint.close(remove=True)
+
+    return finish_comparison(reporter, writer.summary, writer.samples, time.time() - start_time, output_file,
+                             enable_geocoding, cache_file)
+
+def finish_comparison(reporter, summary, samples, total_time, output_file, enable_geocoding, cache_file=None):
+    """Log the analysis summary and build the job result of a comparison run"""
+    reporter.log("\n" + "="*70)
+    reporter.log("COORDINATE-PRIORITY ANALYSIS COMPLETE!")
+    reporter.log("="*70)
+    reporter.log(f"Total processing time: {total_time:.1f} seconds")
+    reporter.log(f"\nMatch Quality Breakdown:")
+    reporter.log(f"  High confidence duplicates (≥90%): {summary['high_confidence']}")
+    reporter.log(f"  Medium confidence duplicates (70-89%): {summary['medium_confidence']}")
+    reporter.log(f"  Low confidence duplicates (50-69%): {summary['low_confidence']}")
+    reporter.log(f"  Potential matches (<50%): {summary['potential']}")
+    reporter.log(f"\nUnique Locations:")
+    reporter.log(f"  Unique to Piggy: {summary['unique_piggy']}")
+    reporter.log(f"  Unique to CTX: {summary['unique_ctx']}")
+
+    if enable_geocoding:
+        reporter.log(f"\nReverse geocoding completed - corrected city/state columns added")
+
+    reporter.log(f"\nResults saved to: {output_file}")
+
+    # Show sample high-confidence matches
+    if samples:
+        reporter.log("\nSample high-confidence duplicates:")
+        for piggy_name, ctx_name, distance, confidence in samples:
+            reporter.log(f"  • {piggy_name} ↔ {ctx_name}")
+            distance = "unknown" if pd.isna(distance) else f"{distance:.3f} mi"
+            reporter.log(f"    Distance: {distance}, Confidence: {confidence:.1%}")
+
+    reporter.stage("Coordinate-priority analysis complete!")
+
+    return {
+        'output_file': output_file,
+        'candidate_cache_file': cache_file,
+        'report_file': output_file,
+        'summary': summary,
+        'title': "Advanced Analysis Complete",
+        'message': (f"Analysis complete in {total_time:.1f} seconds!\n\n"
+                    f"High confidence duplicates: {summary['high_confidence']}\n"
+                    f"Medium confidence duplicates: {summary['medium_confidence']}\n"
+                    f"Low confidence duplicates: {summary['low_confidence']}\n"
+                    f"Potential matches: {summary['potential']}\n\n"
+                    f"Unique to Piggy: {summary['unique_piggy']}\n"
+                    f"Unique to CTX: {summary['unique_ctx']}\n\n"
+                    f"Results saved to:\n{os.path.basename(output_file)}")
+    }
+
+# CTX dataset of a batch worker process, attached once by init_batch_worker
+_batch_ctx = None
+
+def init_batch_worker(ctx_snapshot_dir):
+    """Batch worker initializer: attach to the CTX dataset snapshot shared by all workers.
+
+    Its coordinate and other numeric columns, the codes of its text columns and
+    its latitude order are memory-mapped, so the workers read the same pages of
+    the operating system's file cache instead of each holding (or sorting) a
+    copy; each worker only decodes the distinct text values.
+    """
+    global _batch_ctx
+    ctx_rows, ctx_total = read_dataset_snapshot(ctx_snapshot_dir)
+    _batch_ctx = ctx_rows, ctx_total, read_snapshot_arrays(ctx_snapshot_dir)['latitude_order']
+
+def run_batch_pair(settings, reporter=None, ctx=None):
+    """Compare settings['piggy_file'] with the CTX dataset ctx, (rows, total rows) as returned by
+    load_dataset and the latitude_order of its rows with coordinates, by default the one attached
+    by init_batch_worker"""
+    start_time = time.time()
+    reporter = reporter or JobReporter()
+    ctx_rows, ctx_total, ctx_order = ctx or _batch_ctx
+    piggy_rows, piggy_total = load_dataset(settings['piggy_file'], settings.get('snapshot_dir'), reporter,
+                                           settings['dataframe_backend'], name_only_matching(settings))
+    return compare_datasets(settings, reporter, piggy_rows, piggy_total, ctx_rows, ctx_total, start_time,
+                            ctx_order)
+
+def batch_pair_settings(settings, piggy_file, ctx_file):
+    """Settings of one batch comparison; its report and checkpoint go to a directory named after the pair"""
+    piggy_stem = os.path.splitext(os.path.basename(piggy_file))[0]
+    ctx_stem = os.path.splitext(os.path.basename(ctx_file))[0]
+    output_dir = os.path.join(settings['output_dir'], f"{piggy_stem}_vs_{ctx_stem}")
+    os.makedirs(output_dir, exist_ok=True)
+    # One candidate cache file would be overwritten by every pair
+    return dict(settings, piggy_file=piggy_file, ctx_file=ctx_file, output_dir=output_dir,
+                candidate_cache_file=None, tiled_matching=False)
+
+def run_batch_comparison(settings, reporter):
+    """Compare every Piggy file of a batch against every CTX file.
+
+    Each CTX file is loaded and preprocessed (cleaned names, parsed addresses,
+    latitude order) once and shared by its comparisons. They run back to back in this process,
+    which also keeps the name similarity caches warm, or with batch_workers > 1
+    in worker processes that attach to one memory-mapped snapshot of the CTX
+    dataset (see init_batch_worker) rather than each receiving a pickled copy.
+    """
+    start_time = time.time()
+    piggy_files = settings['batch_piggy_files']
+    ctx_files = settings['batch_ctx_files']
+    workers = max(1, min(settings['batch_workers'], len(piggy_files)))
+    total = len(piggy_files) * len(ctx_files)
+
+    rows = []
+    for ctx_file in ctx_files:
+        reporter.stage(f"Loading {os.path.basename(ctx_file)}...")
+        ctx_rows, ctx_total = load_dataset(ctx_file, settings.get('snapshot_dir'), reporter,
+                                           settings['dataframe_backend'], name_only_matching(settings))
+        preprocess_dataset(ctx_rows)
+        ctx_order = latitude_order(rows_with_coordinates(ctx_rows))
+        reporter.log(f"Prepared {os.path.basename(ctx_file)} once for {len(piggy_files)} comparisons")
+
+        pairs = [batch_pair_settings(settings, piggy_file, ctx_file) for piggy_file in piggy_files]
+        if workers == 1:
+            results = []
+            for pair in pairs:
+                reporter.stage(f"Comparing {os.path.basename(pair['piggy_file'])} with "
+                               f"{os.path.basename(ctx_file)} ({len(rows) + len(results) + 1}/{total})...")
+                results.append(run_batch_pair(pair, reporter, (ctx_rows, ctx_total, ctx_order)))
+        else:
+            reporter.stage(f"Comparing {len(pairs)} files with {os.path.basename(ctx_file)} "
+                           f"in {workers} processes...")
+            with tempfile.TemporaryDirectory(prefix='batch_ctx_') as shared_dir:
+                ctx_snapshot_dir = os.path.join(shared_dir, 'ctx')
+                write_dataset_snapshot(ctx_rows, ctx_total, ctx_snapshot_dir, {'latitude_order': ctx_order})
+                with concurrent.futures.ProcessPoolExecutor(
+                        workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_batch_worker,
+                        initargs=(ctx_snapshot_dir,)) as pool:
+                    results = list(pool.map(run_batch_pair, pairs))
+
+        for pair, result in zip(pairs, results):
+            rows.append({'piggy_file': pair['piggy_file'], 'ctx_file': ctx_file,
+                         'report_file': result['output_file'], **result['summary']})
+        reporter.progress(len(rows), total)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = os.path.join(settings['output_dir'], f"batch_comparison_{timestamp}.csv")
+    pd.DataFrame(rows).to_csv(output_file, index=False)
+
+    total_time = time.time() - start_time
+    reporter.log("\n" + "="*70)
+    reporter.log(f"BATCH COMPARISON COMPLETE: {total} comparisons in {total_time:.1f} seconds")
+    reporter.log("="*70)
+    for row in rows:
+        reporter.log(f"  {os.path.basename(row['piggy_file'])} vs {os.path.basename(row['ctx_file'])}: "
+                     f"{row['high_confidence']} high, {row['medium_confidence']} medium, "
+                     f"{row['low_confidence']} low confidence -> {row['report_file']}")
+    reporter.log(f"\nSummary saved to: {output_file}")
+    reporter.stage("Batch comparison complete!")
+
+    return {
+        'output_file': output_file,
+        'title': "Batch Comparison Complete",
+        'message': (f"{total} comparisons complete in {total_time:.1f} seconds!\n\n"
+                    f"Summary saved to:\n{os.path.basename(output_file)}")
+    }
+
+# Rows read per chunk when partitioning input files into tiles
+TILE_READ_CHUNK_ROWS = 50000
+
+def tile_path(work_dir, prefix, tile):
+    return os.path.join(work_dir, f"{prefix}_{tile[0]}_{tile[1]}.pkl")
+
+def partition_csv_into_tiles(path, work_dir, prefix, tile_size, halo_distance=0.0, without_coordinates=False):
+    """Stream a CSV file into per-tile chunk files without loading it whole.
+
+    Rows without coordinates are dropped, or kept in one more chunk file with
+    without_coordinates (see load_rows_without_coordinates). Every other row keeps
+    its position among the valid rows in '_row_id', so indices agree with an
+    in-memory run. With a halo
+    distance, rows are also copied into every neighbouring tile they could match
+    from ('_owner' is False there). Returns ({tile: owned row count}, valid row count).
+    """
+    tiles = {}
+    row_count = 0
+    for chunk in pd.read_csv(path, chunksize=TILE_READ_CHUNK_ROWS):
+        missing = (chunk['latitude'].isna() | chunk['longitude'].isna()).to_numpy()
+        if without_coordinates and missing.any():
+            with open(os.path.join(work_dir, f"{prefix}_without_coordinates.pkl"), 'ab') as f:
+                pickle.dump(chunk[missing], f, protocol=pickle.HIGHEST_PROTOCOL)
+        chunk = chunk[~missing].copy()
+        chunk['_row_id'] = np.arange(row_count, row_count + len(chunk))
+        row_count += len(chunk)
+
+        lats = chunk['latitude'].to_numpy(dtype=float)
+        lons = chunk['longitude'].to_numpy(dtype=float)
+        own_y = np.floor(lats / tile_size).astype(int)
+        own_x = np.floor(lons / tile_size).astype(int)
+
+        # Conservative halo, as in build_candidate_features
+        lat_halo = halo_distance / 69.0
+        lon_halo = lat_halo * 1.01 / np.cos(np.radians(np.minimum(np.abs(lats) + 2 * lat_halo, 89.9)))
+        first_y = np.floor((lats - lat_halo) / tile_size).astype(int)
+        last_y = np.floor((lats + lat_halo) / tile_size).astype(int)
+        first_x = np.floor((lons - lon_halo) / tile_size).astype(int)
+        last_x = np.floor((lons + lon_halo) / tile_size).astype(int)
+
+        for dy in range(int((last_y - first_y).max(initial=0)) + 1):
+            for dx in range(int((last_x - first_x).max(initial=0)) + 1):
+                covered = (first_y + dy <= last_y) & (first_x + dx <= last_x)
+                tile_y = first_y[covered] + dy
+                tile_x = first_x[covered] + dx
+                part = chunk[covered].assign(_owner=(tile_y == own_y[covered]) & (tile_x == own_x[covered]))
+                for (y, x), group in part.groupby([tile_y, tile_x], sort=False):
+                    tile = (int(y), int(x))
+                    with open(tile_path(work_dir, prefix, tile), 'ab') as f:
+                        pickle.dump(group, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    tiles[tile] = tiles.get(tile, 0) + int(group['_owner'].sum())
+
+    return tiles, row_count
+
+def load_tile(work_dir, prefix, tile):
+    """Rows written to one tile, in file order, or None if the tile is empty"""
+    return load_chunk_file(tile_path(work_dir, prefix, tile))
+
+def load_rows_without_coordinates(work_dir, prefix, row_count):
+    """Rows of a file partitioned with without_coordinates that have no coordinates, or None;
+    their '_row_id' continues after the row_count rows that have, as in read_dataset"""
+    rows = load_chunk_file(os.path.join(work_dir, f"{prefix}_without_coordinates.pkl"))
+    if rows is None:
+        return None
+    return rows.assign(_row_id=np.arange(row_count, row_count + len(rows)))
+
+def load_chunk_file(path):
+    """Frames pickled one after another into a chunk file, concatenated, or None if there is no file"""
+    if not os.path.exists(path):
+        return None
+
+    parts = []
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                parts.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(parts, ignore_index=True)
+
+def taken_ctx_indices(features_files, settings):
+    """CTX indices taken by Step 1 and by key matches across the feature tables of a split run.
+
+    Key matches are collected over all tables first, so Step 1 leaves their CTX
+    rows out exactly as it does for a table built in one piece.
+    Returns (step1_ctx, key_ctx).
+    """
+    key_ctx = [np.array([], dtype=int)]
+    for path in features_files:
+        features = pd.read_pickle(path)
+        key_ctx.append(features['ctx_index'].to_numpy(dtype=int)[key_match_rows(features)])
+    key_ctx = np.unique(np.concatenate(key_ctx))
+
+    step1_ctx = [np.array([], dtype=int)]
+    for path in features_files:
+        features = pd.read_pickle(path)
+        if len(features):
+            step1_ctx.append(features['ctx_index'].to_numpy()[coordinate_step_rows(features, settings, key_ctx=key_ctx)])
+    return np.unique(np.concatenate(step1_ctx)), key_ctx
+
+def tiled_name_only_matches(work_dir, tiles, ctx_tiles, piggy_missing, ctx_missing, settings, matched_piggy,
+                            matched_ctx):
+    """match_rows_without_coordinates for a tiled run, given the rows without coordinates of both files.
+
+    A pair needs a row without coordinates and the same state on both sides, so
+    only the unmatched rows with coordinates in those states are loaded from the
+    tiles. Returns the matches and the Piggy and CTX rows they index (by '_row_id').
+    """
+    piggy_states = set() if piggy_missing is None else {normalize_state(state) for state in piggy_missing['state']}
+    ctx_states = set() if ctx_missing is None else {normalize_state(state) for state in ctx_missing['territory']}
+
+    piggy_parts = [] if piggy_missing is None else [piggy_missing]
+    ctx_parts = [] if ctx_missing is None else [ctx_missing]
+    if ctx_states:
+        for tile in tiles:
+            rows = load_tile(work_dir, 'piggy', tile)
+            piggy_parts.append(rows[rows['state'].map(normalize_state).isin(ctx_states) &
+                                    ~rows['_row_id'].isin(list(matched_piggy))])
+    if piggy_states:
+        for tile in sorted(ctx_tiles):
+            rows = load_tile(work_dir, 'ctx', tile)
+            ctx_parts.append(rows[rows['_owner'] & rows['territory'].map(normalize_state).isin(piggy_states) &
+                                  ~rows['_row_id'].isin(list(matched_ctx))].drop(columns='_owner'))
+    if not piggy_parts or not ctx_parts:
+        return [], None, None
+
+    # Sorted by row id, so positions break ties in the order of an in-memory run
+    piggy_rows = pd.concat(piggy_parts, ignore_index=True).sort_values('_row_id', ignore_index=True)
+    ctx_rows = pd.concat(ctx_parts, ignore_index=True).sort_values('_row_id', ignore_index=True)
+    matches = match_rows_without_coordinates(piggy_rows, ctx_rows, settings, set(), set())
+    piggy_ids, ctx_ids = piggy_rows['_row_id'].to_numpy(), ctx_rows['_row_id'].to_numpy()
+    for match in matches:
+        match['piggy_index'] = int(piggy_ids[match['piggy_index']])
+        match['ctx_index'] = int(ctx_ids[match['ctx_index']])
+    return matches, piggy_rows.set_index('_row_id'), ctx_rows.set_index('_row_id')
+
+def run_tiled_comparison(settings, reporter):
+    """Out-of-core comparison for files that do not fit in memory.
+
+    Both files are partitioned by geographic tile on disk in one streaming pass;
+    CTX rows are also copied into neighbouring tiles within max_distance so no
+    boundary pair is lost. Tiles are then matched one at a time and the report is
+    appended as each tile finishes, so peak memory follows the largest tile rather
+    than the dataset. With name-only matching, rows without coordinates are kept
+    aside and matched by tiled_name_only_matches. The report has the same rows
+    as run_advanced_comparison, matches grouped by tile.
+    """
+    start_time = time.time()
+    max_distance = settings['max_distance']
+    tile_size = settings['tile_size_degrees']
+    enable_geocoding = settings['enable_reverse_geocoding']
+    name_only = name_only_matching(settings)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename_suffix = "_with_geocoding" if enable_geocoding else ""
+    output_file = report_file_path(settings['output_dir'], f"coordinate_priority_comparison_{timestamp}{filename_suffix}",
+                                   settings['report_compression'])
+
+    with tempfile.TemporaryDirectory(prefix='tiles_', dir=settings['output_dir']) as work_dir:
+        reporter.stage("Partitioning CSV files into tiles...")
+        piggy_tiles, piggy_count = partition_csv_into_tiles(settings['piggy_file'], work_dir, 'piggy', tile_size,
+                                                            without_coordinates=name_only)
+        ctx_tiles, ctx_count = partition_csv_into_tiles(settings['ctx_file'], work_dir, 'ctx', tile_size,
+                                                        candidate_radius(settings), name_only)
+
+        reporter.log(f"Partitioned {piggy_count} Piggy and {ctx_count} CTX records with valid coordinates")
+        reporter.log(f"  {len(piggy_tiles)} Piggy tiles of {tile_size}°, largest has {max(piggy_tiles.values(), default=0)} records")
+        reporter.log(f"  {len(ctx_tiles)} CTX tiles (with {candidate_radius(settings):.2f} mile halo)")
+
+        # Pass 1: score each tile, then collect the CTX rows taken by key matches and Step 1 anywhere
+        tiles = sorted(piggy_tiles)
+        for number, tile in enumerate(tiles, 1):
+            reporter.stage(f"Scoring tile {number}/{len(tiles)}...")
+            ctx_tile = load_tile(work_dir, 'ctx', tile)
+            if ctx_tile is None:
+                continue
+            piggy_tile = load_tile(work_dir, 'piggy', tile)
+
+            features = build_candidate_features(piggy_tile, ctx_tile, settings, max_distance, reporter)
+            features['piggy_index'] = piggy_tile['_row_id'].to_numpy()[features['piggy_index'].to_numpy(dtype=int)]
+            features['ctx_index'] = ctx_tile['_row_id'].to_numpy()[features['ctx_index'].to_numpy(dtype=int)]
+            features.to_pickle(tile_path(work_dir, 'features', tile))
+        features_files = [tile_path(work_dir, 'features', tile) for tile in tiles]
+        step1_ctx, key_ctx = taken_ctx_indices([path for path in features_files if os.path.exists(path)], settings)
+
+        with ReportWriter(output_file, settings['report_compression'], enable_geocoding,
+                      settings['dataframe_backend']) as writer:
+            # Pass 2: select matches per tile and stream them
+            matched_piggy = set()
+            for number, tile in enumerate(tiles, 1):
+                reporter.stage(f"Writing tile {number}/{len(tiles)}...")
+                reporter.progress(number, len(tiles))
+                features_file = tile_path(work_dir, 'features', tile)
+                if not os.path.exists(features_file):
+                    continue
+                matches = select_matches_from_features(pd.read_pickle(features_file), settings, step1_ctx, key_ctx)
+                if matches:
+                    piggy_tile = load_tile(work_dir, 'piggy', tile).set_index('_row_id')
+                    ctx_tile = load_tile(work_dir, 'ctx', tile).set_index('_row_id')
+                    matched_piggy |= writer.add_matches(piggy_tile, ctx_tile, matches)
+
+            # Rows without coordinates are matched by name within their state
+            piggy_missing = ctx_missing = None
+            if name_only:
+                reporter.stage("Matching rows without coordinates...")
+                piggy_missing = load_rows_without_coordinates(work_dir, 'piggy', piggy_count)
+                ctx_missing = load_rows_without_coordinates(work_dir, 'ctx', ctx_count)
+                name_matches, piggy_rows, ctx_rows = tiled_name_only_matches(
+                    work_dir, tiles, ctx_tiles, piggy_missing, ctx_missing, settings, matched_piggy, writer.matched_ctx)
+                reporter.log(f"Matched {len(name_matches)} rows without coordinates by name and state")
+                if name_matches:
+                    matched_piggy |= writer.add_matches(piggy_rows, ctx_rows, name_matches)
+
+            # Pass 3: Piggy rows no match took, tile by tile
+            reporter.stage("Writing unique Piggy locations...")
+            for tile in tiles:
+                writer.add_unique_piggy(load_tile(work_dir, 'piggy', tile).set_index('_row_id'), matched_piggy)
+            if piggy_missing is not None:
+                writer.add_unique_piggy(piggy_missing.set_index('_row_id'), matched_piggy)
+
+            # Pass 4: CTX rows no tile matched, each from the tile that owns it
+            reporter.stage("Writing unique CTX locations...")
+            for tile in sorted(ctx_tiles):
+                if ctx_tiles[tile] == 0:
+                    continue
+                writer.add_unique_ctx(load_tile(work_dir, 'ctx', tile))
+            if ctx_missing is not None:
+                writer.add_unique_ctx(ctx_missing.set_index('_row_id'))
+
+    reporter.log(f"Found {writer.summary['total_matches']} potential matches in {time.time() - start_time:.1f} seconds")
+    return finish_comparison(reporter, writer.summary, writer.samples, time.time() - start_time, output_file,
+                             enable_geocoding)
+
+# Settings a shard plan fixes for every shard and the merge
+SHARD_SETTING_KEYS = CANDIDATE_SETTING_KEYS + [
+    'max_distance', 'min_name_similarity', 'min_confidence', 'coordinate_precision', 'coordinate_cascade',
+    'show_all_potential_matches', 'batch_size', 'enable_reverse_geocoding', 'tile_size_degrees'
+]
+
+def shard_file(manifest_file, name):
+    """Path of a shard file, which lives next to the manifest"""
+    return os.path.join(os.path.dirname(os.path.abspath(manifest_file)), name)
+
+def load_shard_manifest(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def assign_tiles_to_shards(tile_weights, shard_count):
+    """Greedy balancing: heaviest tile first, each to the currently lightest shard"""
+    shards = [[] for _ in range(shard_count)]
+    loads = [0] * shard_count
+    for tile in sorted(tile_weights, key=lambda tile: (-tile_weights[tile], tile)):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(tile)
+        loads[lightest] += tile_weights[tile]
+    return [sorted(tiles) for tiles in shards]
+
+def run_shard_plan(settings, reporter):
+    """Cut both input files into geographic shards that can be matched on separate machines.
+
+    The files are partitioned into tiles as for tiled matching and whole tiles are
+    assigned to shards. Each shard gets its own Piggy file and a CTX file that also
+    holds the halo rows within the candidate radius of its tiles, so shards need nothing
+    but their own files. manifest.json records the shards and the settings; copy
+    the manifest directory to every machine, run each shard with run-shard and
+    combine the results with merge.
+    """
+    start_time = time.time()
+    shard_count = settings['shard_count']
+    if shard_count < 1:
+        raise ValueError("The number of shards must be at least 1")
+
+    plan_dir = settings['output_dir']
+    os.makedirs(plan_dir, exist_ok=True)
+    manifest_file = os.path.join(plan_dir, 'manifest.json')
+
+    with tempfile.TemporaryDirectory(prefix='tiles_', dir=plan_dir) as work_dir:
+        reporter.stage("Partitioning CSV files into tiles...")
+        tile_size = settings['tile_size_degrees']
+        piggy_tiles, piggy_count = partition_csv_into_tiles(settings['piggy_file'], work_dir, 'piggy', tile_size)
+        ctx_tiles, ctx_count = partition_csv_into_tiles(settings['ctx_file'], work_dir, 'ctx', tile_size,
+                                                        candidate_radius(settings))
+        # Balance by owned rows; CTX-only tiles still need a shard to report their unique rows
+        tile_weights = {tile: piggy_tiles.get(tile, 0) + ctx_tiles.get(tile, 0)
+                        for tile in set(piggy_tiles) | {tile for tile, owned in ctx_tiles.items() if owned}}
+        reporter.log(f"Partitioned {piggy_count} Piggy and {ctx_count} CTX records into "
+                     f"{len(tile_weights)} tiles of {tile_size}°")
+
+        shards = []
+        for number, tiles in enumerate(assign_tiles_to_shards(tile_weights, shard_count)):
+            reporter.stage(f"Writing shard {number + 1}/{shard_count}...")
+            reporter.progress(number + 1, shard_count)
+
+            piggy_parts = [load_tile(work_dir, 'piggy', tile) for tile in tiles]
+            ctx_parts = [load_tile(work_dir, 'ctx', tile) for tile in tiles]
+            piggy_parts = [part for part in piggy_parts if part is not None]
+            ctx_parts = [part for part in ctx_parts if part is not None]
+            piggy_shard = (pd.concat(piggy_parts, ignore_index=True).sort_values('_row_id', ignore_index=True)
+                           if piggy_parts else None)
+            ctx_shard = None
+            if ctx_parts:
+                # A CTX row in the halo of several tiles of this shard is kept once, owned if any copy is
+                ctx_shard = (pd.concat(ctx_parts, ignore_index=True)
+                             .sort_values(['_row_id', '_owner'], ascending=[True, False])
+                             .drop_duplicates('_row_id', ignore_index=True))
+
+            shard = {
+                'shard': number,
+                'tiles': [list(tile) for tile in tiles],
+                'piggy_rows': 0 if piggy_shard is None else len(piggy_shard),
+                'ctx_rows': 0 if ctx_shard is None else len(ctx_shard),
+                'piggy_file': f"shard_{number:03d}.piggy.pkl",
+                'ctx_file': f"shard_{number:03d}.ctx.pkl",
+                'result_file': f"shard_{number:03d}.features.pkl"
+            }
+            for name, frame in ((shard['piggy_file'], piggy_shard), (shard['ctx_file'], ctx_shard)):
+                if frame is not None:
+                    frame.to_pickle(os.path.join(plan_dir, name))
+            shards.append(shard)
+
+    manifest = {
+        'version': __version__,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'piggy_file': os.path.abspath(settings['piggy_file']),
+        'ctx_file': os.path.abspath(settings['ctx_file']),
+        'piggy_count': piggy_count,
+        'ctx_count': ctx_count,
+        'settings': {key: settings[key] for key in SHARD_SETTING_KEYS},
+        'shards': shards
+    }
+    with open(manifest_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, default=_json_default)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+    total_time = time.time() - start_time
+    reporter.log(f"\nShard plan written to: {manifest_file}")
+    for shard in shards:
+        reporter.log(f"  Shard {shard['shard']}: {len(shard['tiles'])} tiles, "
+                     f"{shard['piggy_rows']} Piggy rows, {shard['ctx_rows']} CTX rows (with halo)")
+    reporter.stage("Shard plan complete!")
+
+    return {
+        'output_file': manifest_file,
+        'title': "Shard Plan Complete",
+        'message': (f"Shard plan complete in {total_time:.1f} seconds!\n\n"
+                    f"Shards: {shard_count}\n"
+                    f"Piggy records: {piggy_count}\n"
+                    f"CTX records: {ctx_count}\n\n"
+                    f"Manifest saved to:\n{manifest_file}")
+    }
+
+def run_shard(settings, reporter):
+    """Score the candidate pairs of one shard from a shard plan.
+
+    Uses the settings stored in the manifest. The candidate table is written next
+    to the manifest only once complete, so merge never sees a partial shard.
+    """
+    start_time = time.time()
+    manifest_file = settings['manifest_file']
+    manifest = load_shard_manifest(manifest_file)
+    number = settings['shard_number']
+    if not 0 <= number < len(manifest['shards']):
+        raise ValueError(f"Shard {number} does not exist; the plan has shards 0-{len(manifest['shards']) - 1}")
+
+    shard = manifest['shards'][number]
+    shard_settings = dict(settings, **manifest['settings'])
+    result_file = shard_file(manifest_file, shard['result_file'])
+
+    reporter.stage(f"Scoring shard {number}...")
+    features = None
+    if shard['piggy_rows'] and shard['ctx_rows']:
+        piggy_shard = pd.read_pickle(shard_file(manifest_file, shard['piggy_file']))
+        ctx_shard = pd.read_pickle(shard_file(manifest_file, shard['ctx_file']))
+        reporter.log(f"Shard {number}: {len(piggy_shard)} Piggy rows, {len(ctx_shard)} CTX rows (with halo)")
+
+        checkpoint = JobCheckpoint(
+            result_file + '.checkpoint',
+            input_fingerprint([shard_file(manifest_file, shard['piggy_file']),
+                               shard_file(manifest_file, shard['ctx_file'])],
+                              shard_settings, SHARD_SETTING_KEYS),
+            settings['resume_from_checkpoint']
+        )
+        if checkpoint.completed:
+            reporter.log(f"Resuming from checkpoint: {len(checkpoint.completed)} completed batches")
+        try:
+            features = build_candidate_features(piggy_shard, ctx_shard, shard_settings,
+                                                shard_settings['max_distance'], reporter, checkpoint)
+        finally:
+            checkpoint.close()
+
+        # Shard positions to global row ids, as in run_tiled_comparison
+        features['piggy_index'] = piggy_shard['_row_id'].to_numpy()[features['piggy_index'].to_numpy(dtype=int)]
+        features['ctx_index'] = ctx_shard['_row_id'].to_numpy()[features['ctx_index'].to_numpy(dtype=int)]
+
+    if features is None:
+        features = pd.DataFrame(columns=['piggy_index', 'ctx_index', 'distance_miles', 'name_similarity',
+                                         'address_similarity', 'confidence', 'plus_code_length', 'match_key',
+                                         'search_radius', 'piggy_lat', 'piggy_lon', 'ctx_lat', 'ctx_lon'])
+    features.to_pickle(result_file + '.tmp')
+    os.replace(result_file + '.tmp', result_file)
+    if os.path.exists(result_file + '.checkpoint'):
+        os.remove(result_file + '.checkpoint')
+
+    total_time = time.time() - start_time
+    reporter.log(f"Shard {number}: scored {len(features)} candidate pairs in {total_time:.1f} seconds")
+    reporter.log(f"Results saved to: {result_file}")
+    reporter.stage(f"Shard {number} complete!")
+
+    return {
+        'output_file': result_file,
+        'title': "Shard Complete",
+        'message': (f"Shard {number} complete in {total_time:.1f} seconds!\n\n"
+                    f"Candidate pairs: {len(features)}\n\n"
+                    f"Results saved to:\n{os.path.basename(result_file)}")
+    }
+
+def run_shard_merge(settings, reporter):
+    """Combine the shard results of a shard plan into the standard comparison report.
+
+    Every Piggy row belongs to exactly one shard, but halo CTX rows appear in
+    several, so CTX rows are tracked by global row id: Step 1 CTX matches are
+    collected across all shards before Step 2 is selected (as in an in-memory
+    run), a CTX row matched in any shard is not unique, and unique CTX rows are
+    only reported by the shard that owns them. The report has the same rows as
+    run_advanced_comparison, grouped by shard.
+    """
+    start_time = time.time()
+    manifest_file = settings['manifest_file']
+    manifest = load_shard_manifest(manifest_file)
+    shards = manifest['shards']
+    merge_settings = dict(settings, **manifest['settings'])
+    enable_geocoding = merge_settings['enable_reverse_geocoding']
+
+    missing = [str(shard['shard']) for shard in shards
+               if not os.path.exists(shard_file(manifest_file, shard['result_file']))]
+    if missing:
+        raise ValueError(f"Shards not finished yet: {', '.join(missing)}\n"
+                         f"Run them with: run-shard {manifest_file} <shard>")
+
+    # Pass 1: CTX rows taken by key matches and Step 1 in any shard
+    reporter.stage("Collecting shard results...")
+    step1_ctx, key_ctx = taken_ctx_indices(
+        [shard_file(manifest_file, shard['result_file']) for shard in shards], merge_settings)
+    reporter.log(f"Merged candidate pairs from {len(shards)} shards")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename_suffix = "_with_geocoding" if enable_geocoding else ""
+    output_file = report_file_path(settings['output_dir'], f"coordinate_priority_comparison_{timestamp}{filename_suffix}",
+                                   settings['report_compression'])
+
+    with ReportWriter(output_file, settings['report_compression'], enable_geocoding,
+                      settings['dataframe_backend']) as writer:
+        # Pass 2: matches and unique Piggy rows shard by shard
+        for number, shard in enumerate(shards, 1):
+            reporter.stage(f"Writing shard {number}/{len(shards)}...")
+            reporter.progress(number, len(shards))
+            if not shard['piggy_rows']:
+                continue
+            piggy_shard = pd.read_pickle(shard_file(manifest_file, shard['piggy_file'])).set_index('_row_id')
+            features = pd.read_pickle(shard_file(manifest_file, shard['result_file']))
+            matches = select_matches_from_features(features, merge_settings, step1_ctx, key_ctx) if len(features) else []
+            ctx_shard = None
+            if matches:
+                ctx_shard = pd.read_pickle(shard_file(manifest_file, shard['ctx_file'])).set_index('_row_id')
+            writer.add_unique_piggy(piggy_shard, writer.add_matches(piggy_shard, ctx_shard, matches))
+
+        # Pass 3: CTX rows no shard matched, each from the shard that owns it
+        reporter.stage("Writing unique CTX locations...")
+        for shard in shards:
+            if shard['ctx_rows']:
+                writer.add_unique_ctx(pd.read_pickle(shard_file(manifest_file, shard['ctx_file'])))
+
+    reporter.log(f"Found {writer.summary['total_matches']} potential matches in {time.time() - start_time:.1f} seconds")
+    return finish_comparison(reporter, writer.summary, writer.samples, time.time() - start_time, output_file,
+                             enable_geocoding)
+
+def run_geocoding_only(settings, reporter):
+    """Add corrected city/state columns to a single CSV file"""
+    start_time = time.time()
+    reporter.stage("Loading CSV file for geocoding...")
+
+    # Load file
+    df = pd.read_csv(settings['geocoding_file'])
+    reporter.log(f"Loaded {len(df)} records for geocoding")
+
+    # Detect coordinate columns
+    lat_col = None
+    lon_col = None
+
+    # Common latitude column names
+    lat_candidates = ['latitude', 'latitude', 'latitude', 'Latitude', 'latitude', 'LATITUDE']
+    lon_candidates = ['longitude', 'lng', 'longitude', 'longitude', 'Lng', 'Longitude', 'longitude', 'LNG', 'LONGITUDE']
+
+    for col in df.columns:
+        if col in lat_candidates:
+            lat_col = col
+        elif col in lon_candidates:
+            lon_col = col
+
+    if not lat_col or not lon_col:
+        raise ValueError(
+            f"Could not find latitude/longitude columns.\n"
+            f"Looking for columns named: {', '.join(lat_candidates + lon_candidates)}\n"
+            f"Found columns: {', '.join(df.columns.tolist())}")
+
+    reporter.log(f"Using columns: {lat_col}, {lon_col}")
+
+    # Filter valid coordinates
+    valid_coords = df.dropna(subset=[lat_col, lon_col])
+    reporter.log(f"Found {len(valid_coords)} records with valid coordinates")
+
+    if len(valid_coords) == 0:
+        raise ValueError("No valid coordinates found in the file")
+
+    # Set up progress bar
+    total_records = len(df)
+    reporter.stage("Starting reverse geocoding...")
+
+    # Prepare coordinate pairs for batch processing
+    coordinates = [(row[lat_col] if pd.notna(row[lat_col]) else None,
+                   row[lon_col] if pd.notna(row[lon_col]) else None)
+                  for _, row in df.iterrows()]
+
+    # Progress callback function
+    log_every = settings['geocoding_batch_size']
+
+    def update_progress(current, total):
+        reporter.progress(current, total)
+
+        # Also log progress at certain intervals
+        if current % log_every == 0:
+            percentage = (current / total) * 100
+            reporter.log(f"Processed {current}/{total} records ({percentage:.1f}%)")
+
+    # Checkpoint geocoded chunks so a crashed or cancelled run can resume
+    input_filename = os.path.basename(settings['geocoding_file'])
+    name_without_ext = os.path.splitext(input_filename)[0]
+    checkpoint = JobCheckpoint(
+        os.path.join(settings['output_dir'], f"{name_without_ext}.geocoding.checkpoint"),
+        input_fingerprint([settings['geocoding_file']], settings, []),
+        settings['resume_from_checkpoint']
+    )
+    if checkpoint.completed:
+        reporter.log(f"Resuming from checkpoint: {len(checkpoint.completed)} completed chunks")
+
+    # Perform batch reverse geocoding
+    reporter.log("Starting optimized reverse geocoding process...")
+
+    # Process in smaller chunks for better performance
+    chunk_size = 50  # Process 50 records at a time
+    all_results = []
+
+    try:
+        for i in range(0, len(coordinates), chunk_size):
+            chunk = coordinates[i:i + chunk_size]
+            chunk_key = f"chunk_{i}"
+
+            # Skip chunks finished by an earlier run
+            if chunk_key in checkpoint.completed:
+                all_results.extend(tuple(result) for result in checkpoint.completed[chunk_key])
+                update_progress(min(i + chunk_size, total_records), total_records)
+                continue
+
+            # Process this chunk
+            chunk_results = []
+            for j, (lat, lon) in enumerate(chunk):
+                if lat is not None and lon is not None:
+                    city, state = reverse_geocode_cached(lat, lon)
+                    chunk_results.append((city, state))
+                else:
+                    chunk_results.append(('', ''))
+
+                # Update progress
+                current_record = i + j + 1
+                if current_record % 10 == 0 or current_record == total_records:
+                    update_progress(current_record, total_records)
+
+                # Faster rate limiting - only 20ms delay
+                time.sleep(0.02)
+
+            all_results.extend(chunk_results)
+            checkpoint.record(chunk_key, chunk_results)
+
+            # Small pause between chunks to prevent overwhelming the service
+            if i + chunk_size < len(coordinates):
+                time.sleep(0.1)
+    finally:
+        checkpoint.close()
+
+    # Ensure final progress update
+    update_progress(total_records, total_records)
+
+    # Add corrected columns to dataframe
+    corrected_cities = [result[0] for result in all_results]
+    corrected_states = [result[1] for result in all_results]
+
+    df['corrected_city'] = corrected_cities
+    df['corrected_state'] = corrected_states
+
+    # Save results
+    reporter.stage("Saving geocoded results...")
+
+    # Create output filename
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_filename = f"{name_without_ext}_geocoded_{timestamp}.csv"
+    output_file = os.path.join(settings['output_dir'], output_filename)
+
+    df.to_csv(output_file, index=False)
+    checkpoint.close(remove=True)
+
+    processing_time = time.time() - start_time
+    valid_geocoded = len([city for city in corrected_cities if city.strip()])
+    processing_rate = len(df) / processing_time if processing_time > 0 else 0
+    cache_info = reverse_geocode_cached.cache_info()
+    cache_lookups = cache_info.hits + cache_info.misses
+
+    reporter.log("\n" + "="*50)
+    reporter.log("REVERSE GEOCODING COMPLETE!")
+    reporter.log("="*50)
+    reporter.log(f"Total processing time: {processing_time:.1f} seconds")
+    reporter.log(f"Processing rate: {processing_rate:.1f} records/second")
+    reporter.log(f"Total records processed: {len(df)}")
+    reporter.log(f"Successfully geocoded: {valid_geocoded}")
+    reporter.log(f"Failed to geocode: {len(df) - valid_geocoded}")
+    reporter.log(f"Cache hit rate: {(cache_info.hits / cache_lookups * 100):.1f}%" if cache_lookups else "Cache info not available")
+    reporter.log(f"Results saved to: {output_file}")
+
+    reporter.stage("Reverse geocoding complete!")
+
+    return {
+        'output_file': output_file,
+        'title': "Geocoding Complete",
+        'message': (f"Reverse geocoding complete in {processing_time:.1f} seconds!\n\n"
+                    f"Processing rate: {processing_rate:.1f} records/second\n"
+                    f"Total records: {len(df)}\n"
+                    f"Successfully geocoded: {valid_geocoded}\n"
+                    f"Failed to geocode: {len(df) - valid_geocoded}\n\n"
+                    f"Results saved to:\n{output_filename}")
+    }
+
+def run_self_dedup(settings, reporter):
+    """Find duplicate groups inside a single CSV file and save them"""
+    start_time = time.time()
+    reporter.stage("Loading CSV file for self-deduplication...")
+
+    valid_coords, total_rows = load_dataset(settings['dedup_file'], settings.get('snapshot_dir'), reporter,
+                                             settings['dataframe_backend'])
+
+    reporter.log(f"Loaded {total_rows} records for self-deduplication")
+    reporter.log(f"  {len(valid_coords)}/{total_rows} have valid coordinates")
+
+    reporter.stage("Self-deduplication...")
+    pairs = find_self_duplicates(
+        valid_coords, settings['max_distance'], settings['min_name_similarity'],
+        settings['min_confidence'], settings['include_address_matching'],
+        settings['ignore_name_matching'], settings['ignore_city_matching'],
+        settings['ignore_state_matching'], settings['ignore_zip_matching'],
+        progress_callback=reporter.progress,
+        prune_house_numbers=settings['prune_house_number_mismatch']
+    )
+    report_df = create_self_dedup_report(valid_coords, pairs)
+
+    # Save results with timestamp
+    input_filename = os.path.basename(settings['dedup_file'])
+    name_without_ext = os.path.splitext(input_filename)[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = os.path.join(settings['output_dir'], f"{name_without_ext}_duplicates_{timestamp}.csv")
+    report_df.to_csv(output_file, index=False)
+
+    group_count = report_df['duplicate_group'].nunique()
+    total_time = time.time() - start_time
+
+    reporter.log("\n" + "="*50)
+    reporter.log("SELF-DEDUPLICATION COMPLETE!")
+    reporter.log("="*50)
+    reporter.log(f"Total processing time: {total_time:.1f} seconds")
+    reporter.log(f"Duplicate pairs found: {len(pairs)}")
+    reporter.log(f"Duplicate groups: {group_count}")
+    reporter.log(f"Rows in duplicate groups: {len(report_df)}")
+    reporter.log(f"Results saved to: {output_file}")
+
+    reporter.stage("Self-deduplication complete!")
+
+    return {
+        'output_file': output_file,
+        'title': "Self-Deduplication Complete",
+        'message': (f"Self-deduplication complete in {total_time:.1f} seconds!\n\n"
+                    f"Duplicate pairs: {len(pairs)}\n"
+                    f"Duplicate groups: {group_count}\n"
+                    f"Rows in duplicate groups: {len(report_df)}\n\n"
+                    f"Results saved to:\n{os.path.basename(output_file)}")
+    }
+
+def parse_sweep_values(text, cast, default):
+    """Parse a comma-separated list of sweep values, falling back to the current setting"""
+    values = [cast(part) for part in str(text).replace(';', ',').split(',') if part.strip()]
+    return sorted(set(values)) or [default]
+
+def run_threshold_sweep(settings, reporter):
+    """Evaluate a grid of thresholds against one shared candidate generation pass"""
+    start_time = time.time()
+    reporter.stage("Loading and analyzing CSV files...")
+
+    piggy_valid_coords, piggy_total = load_dataset(settings['piggy_file'], settings.get('snapshot_dir'), reporter,
+                                                     settings['dataframe_backend'])
+    ctx_valid_coords, ctx_total = load_dataset(settings['ctx_file'], settings.get('snapshot_dir'), reporter,
+                                                 settings['dataframe_backend'])
+
+    reporter.log(f"Loaded {piggy_total} records from Piggy file ({len(piggy_valid_coords)} with coordinates)")
+    reporter.log(f"Loaded {ctx_total} records from CTX file ({len(ctx_valid_coords)} with coordinates)")
+
+    distances = parse_sweep_values(settings['sweep_max_distances'], float, settings['max_distance'])
+    name_sims = parse_sweep_values(settings['sweep_min_name_similarities'], float, settings['min_name_similarity'])
+    confidences = parse_sweep_values(settings['sweep_min_confidences'], float, settings['min_confidence'])
+    precisions = parse_sweep_values(settings['sweep_coordinate_precisions'], int, settings['coordinate_precision'])
+    grid = list(itertools.product(distances, name_sims, confidences, precisions))
+
+    # Nearest candidates always keep the co-located ones, which depend on the
+    # coordinate precision: one table per swept precision then
+    table_precisions = precisions if settings['nearest_candidates'] else [settings['coordinate_precision']]
+    generated = 'once' if len(table_precisions) == 1 else 'once per coordinate precision'
+    reporter.log(f"Threshold sweep: {len(grid)} settings, candidates generated {generated} at {max(distances)} miles")
+
+    # One candidate generation and scoring pass at the largest radius, unless the
+    # last analysis already scored a wide enough radius; nearest candidates are
+    # not cut short by the base thresholds
+    cache_file = settings.get('candidate_cache_file')
+    tables = {}
+    for precision in table_precisions:
+        build_settings = dict(settings, show_all_potential_matches=True, coordinate_precision=precision)
+        cache = load_candidate_cache(cache_file, candidate_cache_key(build_settings), max(distances)) if cache_file else None
+        if cache is not None:
+            tables[precision] = cache['features']
+            reporter.log(f"Reusing cached candidate table ({cache['radius']} miles)")
+        else:
+            reporter.stage("Generating and scoring candidate pairs...")
+            tables[precision] = build_candidate_features(piggy_valid_coords, ctx_valid_coords, build_settings,
+                                                         max(distances), reporter)
+    scored_pairs = sum(len(features) for features in tables.values())
+    reporter.log(f"Scored {scored_pairs} candidate pairs in {time.time() - start_time:.1f} seconds")
+
+    reporter.stage("Evaluating threshold settings...")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_rows = []
+    for number, (max_distance, min_name_sim, min_confidence, precision) in enumerate(grid, start=1):
+        reporter.progress(number, len(grid))
+
+        point_settings = dict(settings, max_distance=max_distance, min_name_similarity=min_name_sim,
+                              min_confidence=min_confidence, coordinate_precision=precision)
+        features = tables[precision if settings['nearest_candidates'] else table_precisions[0]]
+        matches = select_matches_from_features(features, point_settings)
+        summary = summarize_matches(matches, len(piggy_valid_coords), len(ctx_valid_coords))
+
+        report_file = ''
+        if settings['sweep_write_reports']:
+            report_file = report_file_path(settings['output_dir'], f"threshold_sweep_{timestamp}_{number:03d}",
+                                           settings['report_compression'])
+            with ReportWriter(report_file, settings['report_compression'],
+                              backend=settings['dataframe_backend']) as writer:
+                writer.add_unique_piggy(piggy_valid_coords,
+                                        writer.add_matches(piggy_valid_coords, ctx_valid_coords, matches))
+                writer.add_unique_ctx(ctx_valid_coords)
+
+        summary_rows.append({
+            'setting': number,
+            'max_distance': max_distance,
+            'min_name_similarity': min_name_sim,
+            'min_confidence': min_confidence,
+            'coordinate_precision': precision,
+            **summary,
+            'report_file': os.path.basename(report_file)
+        })
+
+    summary_df = pd.DataFrame(summary_rows)
+    output_file = os.path.join(settings['output_dir'], f"threshold_sweep_{timestamp}.csv")
+    summary_df.to_csv(output_file, index=False)
+
+    total_time = time.time() - start_time
+
+    reporter.log("\n" + "="*70)
+    reporter.log("THRESHOLD SWEEP COMPLETE!")
+    reporter.log("="*70)
+    reporter.log(f"Total processing time: {total_time:.1f} seconds")
+    reporter.log(summary_df[['max_distance', 'min_name_similarity', 'min_confidence', 'coordinate_precision',
+                             'total_matches', 'high_confidence', 'unique_piggy', 'unique_ctx']].to_string(index=False))
+    reporter.log(f"\nSweep summary saved to: {output_file}")
+
+    reporter.stage("Threshold sweep complete!")
+
+    return {
+        'output_file': output_file,
+        'title': "Threshold Sweep Complete",
+        'message': (f"Threshold sweep complete in {total_time:.1f} seconds!\n\n"
+                    f"Settings evaluated: {len(grid)}\n"
+                    f"Candidate pairs scored: {scored_pairs}\n\n"
+                    f"Results saved to:\n{os.path.basename(output_file)}")
+    }
+
+# Fields a match query record may leave out
+QUERY_RECORD_DEFAULTS = {'name': '', 'address1': '', 'city': '', 'state': '', 'territory': '', 'zip': '',
+                         'phone': '', 'website': '', 'plusCode': ''}
+
+# Dataset columns a MerchantIndex keeps; missing ones are stored as empty
+INDEX_COLUMNS = ['name', 'address1', 'city', 'territory', 'zip', 'phone', 'website']
+# Settings stored with a MerchantIndex; the candidate settings shape the index itself
+INDEX_SETTING_KEYS = CANDIDATE_SETTING_KEYS + [
+    'max_distance', 'min_name_similarity', 'min_confidence', 'coordinate_precision', 'coordinate_cascade',
+    'show_all_potential_matches', 'key_match_max_distance'
+]
+INDEX_FILE_MAGIC = b'MCINDEX1'
+# Bump when the stored arrays change; older index files must be rebuilt
+INDEX_FILE_VERSION = 3
+INDEX_FILE_ALIGNMENT = 64
+
+class TextColumn:
+    """Read-only text column kept as UTF-8 bytes with offsets and a missing-value mask.
+
+    Values are decoded on access, so a memory-mapped column costs nothing to load.
+    Missing values read as missing_value.
+    """
+
+    def __init__(self, data, offsets, missing, missing_value=float('nan')):
+        self.data = data
+        self.offsets = offsets
+        self.missing = missing
+        self.missing_value = missing_value
+
+    @classmethod
+    def from_values(cls, values, missing_value=float('nan')):
+        missing = np.array([value is None or (isinstance(value, float) and math.isnan(value)) for value in values],
+                           dtype=bool)
+        encoded = [b'' if absent else str(value).encode('utf-8') for value, absent in zip(values, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets, missing, missing_value)
+
+    def __len__(self):
+        return len(self.missing)
+
+    def __getitem__(self, i):
+        if self.missing[i]:
+            return self.missing_value
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def take(self, positions):
+        return np.array([self[i] for i in positions], dtype=object)
+
+def align_offset(offset):
+    """offset rounded up to INDEX_FILE_ALIGNMENT"""
+    return -(-offset // INDEX_FILE_ALIGNMENT) * INDEX_FILE_ALIGNMENT
+
+def key_hashes(keys):
+    """Stable 64-bit hashes of normalized keys, for sorted-array lookups"""
+    return np.array([int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+                     for key in keys], dtype=np.int64)
+
+class MerchantIndex:
+    """Matching index over one dataset (CTX side), reusable across queries and processes.
+
+    build() computes once everything candidate scoring derives from the dataset:
+    latitude-sorted coordinates (also in radians), cleaned names and their LSH band keys, parsed
+    streets, phone/website key lookups and plus code cells. save() writes it to
+    a single file that load() memory-maps in milliseconds. query() and
+    query_batch() find candidates with the same CandidateSearch and scoring as
+    the batch comparison and select with select_matches_from_features; each
+    query is independent, so no dataset row is reserved by an earlier one.
+
+    The candidate settings (CANDIDATE_SETTING_KEYS) are fixed when the index is
+    built; the thresholds in index.settings may be changed between queries.
+    """
+
+    def __init__(self, arrays, columns, settings):
+        self.arrays = arrays
+        self.columns = columns
+        self.settings = settings
+        self.lats = arrays['latitude']
+        self.lons = arrays['longitude']
+        self.use_street_address = settings['include_address_matching'] and (
+            settings['ignore_city_matching'] or settings['ignore_state_matching'] or settings['ignore_zip_matching'])
+        self.plus_code_lengths = (parse_plus_code_lengths(settings['plus_code_lengths'])
+                                  if settings['plus_code_matching'] else [])
+        self.search = CandidateSearch(self.lats, self.lons, arrays['order'], settings, settings['max_distance'],
+                                      arrays['sorted_lats'], (arrays['latitude_radians'], arrays['longitude_radians']))
+
+    @classmethod
+    def build(cls, df, settings):
+        """Index the rows of df, positions being the row numbers; rows without coordinates are never matched"""
+        settings = {key: settings[key] for key in INDEX_SETTING_KEYS}
+        lats = df['latitude'].to_numpy(dtype=float)
+        lons = df['longitude'].to_numpy(dtype=float)
+        located = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        order = located[np.argsort(lats[located], kind='stable')]
+        lats_rad, lons_rad = coordinate_radians(df)
+        arrays = {
+            'latitude': lats,
+            'longitude': lons,
+            'latitude_radians': lats_rad,
+            'longitude_radians': lons_rad,
+            'order': order,
+            'sorted_lats': lats[order]
+        }
+
+        columns = {}
+        for name in INDEX_COLUMNS:
+            values = df[name] if name in df else pd.Series([''] * len(df), dtype=object)
+            if values.dtype.kind in 'biuf':
+                columns[name] = values.to_numpy()
+            else:
+                columns[name] = TextColumn.from_values(values.tolist())
+        names = clean_names(df)
+        columns['_clean_name'] = TextColumn.from_values(names, missing_value='')
+        streets, house_numbers = street_features(df)
+        columns['_street'] = TextColumn.from_values(streets, missing_value=None)
+        columns['_house_number'] = TextColumn.from_values(house_numbers.tolist(), missing_value='')
+
+        # Sorted (hash, row) arrays stand in for the phone and website hash joins
+        for column, normalize in (('phone', normalize_phone), ('website', registrable_domain)):
+            rows, keys = [], []
+            if settings['key_matching'] and column in df:
+                values = df[column].to_numpy(dtype=object)
+                for row in located.tolist():
+                    key = normalize(values[row])
+                    if key:
+                        rows.append(row)
+                        keys.append(key)
+            hashes = key_hashes(keys)
+            by_hash = np.argsort(hashes, kind='stable')
+            arrays[f'{column}_hashes'] = hashes[by_hash]
+            arrays[f'{column}_rows'] = np.array(rows, dtype=np.int64)[by_hash]
+
+        # LSH band keys of every cleaned name (zero for empty names)
+        if settings['name_lsh'] and not settings['ignore_name_matching']:
+            named = np.flatnonzero([bool(name) for name in names])
+            arrays['name_bands'] = np.zeros((NAME_LSH_BANDS, len(df)), dtype=np.uint64)
+            if len(named):
+                arrays['name_bands'][:, named] = minhash_band_keys([names[row] for row in named.tolist()])
+
+        # Sorted (cell, row) arrays per plus code length
+        if settings['plus_code_matching']:
+            for length in parse_plus_code_lengths(settings['plus_code_lengths']):
+                codes = plus_code_cell_codes(*plus_code_cells(df.iloc[located], length))
+                by_code = np.argsort(codes, kind='stable')
+                arrays[f'plus_{length}_codes'] = codes[by_code]
+                arrays[f'plus_{length}_rows'] = located[by_code].astype(np.int64)
+
+        return cls(arrays, columns, settings)
+
+    def save(self, path):
+        """Write the index to a single file, atomically"""
+        buffers = []
+        arrays_meta = {}
+
+        def add(name, array):
+            array = np.ascontiguousarray(array)
+            arrays_meta[name] = {'dtype': array.dtype.str, 'shape': list(array.shape)}
+            buffers.append((name, array))
+
+        for name, array in self.arrays.items():
+            add(name, array)
+        columns_meta = {}
+        for name, column in self.columns.items():
+            if isinstance(column, TextColumn):
+                add(f'{name}.data', column.data)
+                add(f'{name}.offsets', column.offsets)
+                add(f'{name}.missing', column.missing)
+                columns_meta[name] = {'kind': 'text', 'missing_value': column.missing_value}
+            else:
+                add(name, column)
+                columns_meta[name] = {'kind': 'array'}
+
+        # Buffers follow the header, each aligned for memory-mapping; offsets are
+        # relative to the aligned end of the header
+        offset = 0
+        for name, array in buffers:
+            arrays_meta[name]['offset'] = offset
+            offset = align_offset(offset + array.nbytes)
+        header = json.dumps({'version': INDEX_FILE_VERSION, 'settings': self.settings, 'columns': columns_meta,
+                             'arrays': arrays_meta}, default=_json_default).encode('utf-8')
+        data_start = align_offset(len(INDEX_FILE_MAGIC) + 8 + len(header))
+
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(INDEX_FILE_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, array in buffers:
+                f.seek(data_start + arrays_meta[name]['offset'])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(temp_file, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map an index written by save()"""
+        with open(path, 'rb') as f:
+            if f.read(len(INDEX_FILE_MAGIC)) != INDEX_FILE_MAGIC:
+                raise ValueError(f"{path} is not a merchant index file")
+            header_size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_size))
+        if header.get('version') != INDEX_FILE_VERSION:
+            raise ValueError(f"{path} was written by an older version; run build-index again")
+        data_start = align_offset(len(INDEX_FILE_MAGIC) + 8 + header_size)
+
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        arrays = {}
+        for name, meta in header['arrays'].items():
+            dtype = np.dtype(meta['dtype'])
+            count = int(np.prod(meta['shape'], dtype=np.int64))
+            start = data_start + meta['offset']
+            data = buffer[start:start + count * dtype.itemsize]
+            arrays[name] = data.view(dtype).reshape(meta['shape'])
+
+        columns = {}
+        for name, meta in header['columns'].items():
+            if meta['kind'] == 'text':
+                columns[name] = TextColumn(arrays.pop(f'{name}.data'), arrays.pop(f'{name}.offsets'),
+                                           arrays.pop(f'{name}.missing'), meta['missing_value'])
+            else:
+                columns[name] = arrays.pop(name)
+        return cls(arrays, columns, header['settings'])
+
+    @staticmethod
+    def is_index_file(path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read(len(INDEX_FILE_MAGIC)) == INDEX_FILE_MAGIC
+        except OSError:
+            return False
+
+    def __len__(self):
+        return len(self.lats)
+
+    def row(self, position):
+        """Indexed fields of one dataset row as a dict"""
+        row = {name: self.columns[name][position] for name in INDEX_COLUMNS}
+        row['latitude'] = float(self.lats[position])
+        row['longitude'] = float(self.lons[position])
+        return row
+
+    def key_match(self, record, accept=None):
+        """(position, distance, key name) of the closest row sharing the record's phone, else website,
+        for which accept(position) holds"""
+        for column, normalize in (('phone', normalize_phone), ('website', registrable_domain)):
+            key = normalize(record[column])
+            if not key:
+                continue
+            hashes = self.arrays[f'{column}_hashes']
+            key_hash = key_hashes([key])[0]
+            start = np.searchsorted(hashes, key_hash, side='left')
+            end = np.searchsorted(hashes, key_hash, side='right')
+            joined = [row for row in self.arrays[f'{column}_rows'][start:end].tolist()
+                      if normalize(self.columns[column][row]) == key]
+            if not joined:
+                continue
+            joined = np.array(joined)
+            distances = haversine_vectorized(record['latitude'], record['longitude'],
+                                             self.lats[joined], self.lons[joined])
+            for n in np.argsort(distances, kind='stable').tolist():
+                if distances[n] > self.settings['key_match_max_distance']:
+                    break
+                if accept is None or accept(int(joined[n])):
+                    return int(joined[n]), float(distances[n]), column
+        return None
+
+    def plus_code_neighbours(self, record):
+        """{position: finest length} of the rows in the record's plus code cell or the eight around it"""
+        joined = {}
+        for length in self.plus_code_lengths:
+            codes = self.arrays[f'plus_{length}_codes']
+            rows = self.arrays[f'plus_{length}_rows']
+            lat_cell, lon_cell = plus_code_point_cell(record['latitude'], record['longitude'], record['plusCode'], length)
+            lon_cell_count = int(round(360.0 / plus_code_cell_size(length)))
+            for d_lat in (-1, 0, 1):
+                for d_lon in (-1, 0, 1):
+                    code = ((lat_cell + d_lat) << 32) + (lon_cell + d_lon) % lon_cell_count
+                    start = np.searchsorted(codes, code, side='left')
+                    end = np.searchsorted(codes, code, side='right')
+                    for row in rows[start:end].tolist():
+                        joined.setdefault(row, length)
+        return joined
+
+    def shares_name_band(self, name, candidates):
+        """Mask of the candidates whose cleaned name shares an LSH band with name; empty names share none"""
+        bands = name_band_keys(name)
+        if not bands:
+            return np.zeros(len(candidates), dtype=bool)
+        offsets = self.columns['_clean_name'].offsets
+        named = offsets[candidates + 1] > offsets[candidates]
+        return named & (self.arrays['name_bands'][:, candidates] == np.array(bands, dtype=np.uint64)[:, None]).any(axis=0)
+
+    def features(self, queries):
+        """Candidate feature table of query records, as build_candidate_features builds it"""
+        settings = self.settings
+        ignore_name = settings['ignore_name_matching']
+        names = self.columns['_clean_name']
+        streets = self.columns['_street']
+
+        columns = {name: [] for name in CANDIDATE_FEATURE_COLUMNS}
+        for i, record in enumerate(queries):
+            name = clean_name_advanced_cached(record['name'])
+            if self.use_street_address:
+                street, house_number = parse_street_address(record['address1'])[:2]
+
+            def score(ctx_idx, distance):
+                ctx_row = {'city': self.columns['city'][ctx_idx], 'territory': self.columns['territory'][ctx_idx],
+                           'zip': self.columns['zip'][ctx_idx]}
+                name_sim = 0.0 if ignore_name else cleaned_name_similarity(name, names[ctx_idx])
+                street_addr_sim = 0.0
+                if self.use_street_address:
+                    street_addr_sim = street_pair_similarity(street, streets[ctx_idx])
+                return name_sim, street_addr_sim, calculate_confidence_score_new(
+                    distance, name_sim, street_addr_sim, record, ctx_row, ignore_name,
+                    settings['ignore_city_matching'], settings['ignore_state_matching'], settings['ignore_zip_matching']
+                )
+
+            def keep(candidates):
+                """Candidates that are scored: house numbers agreeing, name-similar by LSH"""
+                within = np.ones(len(candidates), dtype=bool)
+                if self.use_street_address and settings['prune_house_number_mismatch']:
+                    within &= house_number_mask(house_number, self.columns['_house_number'].take(candidates))
+                if 'name_bands' in self.arrays:
+                    within &= self.shares_name_band(name, candidates)
+                return within
+
+            key = None
+            if settings['key_matching']:
+                key = self.key_match(record, None if ignore_name else lambda ctx_idx: cleaned_name_similarity(
+                    name, names[ctx_idx]) >= KEY_MATCH_MIN_NAME_SIMILARITY)
+            found = self.search.row_pairs(i, record['latitude'], record['longitude'], key,
+                                          self.plus_code_neighbours(record), keep, score)
+            if found is not None:
+                add_candidate_pairs(columns, [found], lambda i, ctx_idx, distance: score(ctx_idx, distance))
+
+        return candidate_feature_table(columns, np.array([record['latitude'] for record in queries]),
+                                       np.array([record['longitude'] for record in queries]), self.lats, self.lons)
+
+    def query_records(self, records):
+        """Matches of each record (a dict of dataset fields with at least latitude and longitude), best first"""
+        queries = []
+        for record in records:
+            record = {**QUERY_RECORD_DEFAULTS, **record}
+            try:
+                record['latitude'] = float(record['latitude'])
+                record['longitude'] = float(record['longitude'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Every record needs numeric latitude and longitude")
+            if not (math.isfinite(record['latitude']) and math.isfinite(record['longitude'])):
+                raise ValueError("Every record needs numeric latitude and longitude")
+            queries.append(record)
+
+        results = [[] for _ in queries]
+        if not queries:
+            return results
+        features = self.features(queries)
+        if len(features) == 0:
+            return results
+
+        none = np.array([], dtype=int)
+        for match in select_matches_from_features(features, self.settings, none, none):
+            ctx_row = {key: None if pd.isna(value) else value for key, value in self.row(match['ctx_index']).items()}
+            results[match['piggy_index']].append({
+                'match_type': confidence_match_type(match['confidence']),
+                'confidence': match['confidence'],
+                'distance_miles': match['distance_miles'],
+                'name_similarity': None if pd.isna(match['name_similarity']) else match['name_similarity'],
+                'address_similarity': None if pd.isna(match['address_similarity']) else match['address_similarity'],
+                'reasons': match['reasons'],
+                'ctx_index': int(match['ctx_index']),
+                'ctx_name': ctx_row['name'],
+                'ctx_address': ctx_row['address1'],
+                'ctx_city': ctx_row['city'],
+                'ctx_territory': ctx_row['territory'],
+                'ctx_lat': ctx_row['latitude'],
+                'ctx_lon': ctx_row['longitude']
+            })
+        for matches in results:
+            matches.sort(key=lambda match: -match['confidence'])
+        return results
+
+    def query(self, lat, lon, name='', address='', city='', state='', zip='', phone='', website='', plus_code=''):
+        """Matches of one location, best first"""
+        return self.query_records([{'latitude': lat, 'longitude': lon, 'name': name, 'address1': address,
+                                    'city': city, 'state': state, 'zip': zip, 'phone': phone,
+                                    'website': website, 'plusCode': plus_code}])[0]
+
+    def query_batch(self, frame):
+        """Matches of every row of a DataFrame with dataset columns (latitude, longitude, name,
+        address1, city, state, zip, phone, website, plusCode), one row per match with the
+        frame's index label in 'query_index'."""
+        records = frame.to_dict('records')
+        rows = []
+        for label, matches in zip(frame.index, self.query_records(records)):
+            rows.extend({'query_index': label, **match} for match in matches)
+        return pd.DataFrame(rows, columns=['query_index', 'match_type', 'confidence', 'distance_miles',
+                                           'name_similarity', 'address_similarity', 'reasons', 'ctx_index',
+                                           'ctx_name', 'ctx_address', 'ctx_city', 'ctx_territory',
+                                           'ctx_lat', 'ctx_lon'])
+
+def load_merchant_index(settings, reporter):
+    """MerchantIndex of settings['ctx_file']: memory-mapped if it is an index file, else built from the CSV"""
+    if MerchantIndex.is_index_file(settings['ctx_file']):
+        index = MerchantIndex.load(settings['ctx_file'])
+        reporter.log(f"Memory-mapped index of {len(index)} records")
+        return index
+    ctx_valid_coords, ctx_total = load_dataset(settings['ctx_file'], settings.get('snapshot_dir'), reporter,
+                                                 settings['dataframe_backend'])
+    index = MerchantIndex.build(ctx_valid_coords, settings)
+    reporter.log(f"Indexed {len(index)} of {ctx_total} CTX records")
+    return index
+
+def run_build_index(settings, reporter):
+    """Build a MerchantIndex of the CTX file and save it for serve and in-process queries"""
+    start_time = time.time()
+    reporter.stage("Building index...")
+    ctx_valid_coords, ctx_total = load_dataset(settings['ctx_file'], settings.get('snapshot_dir'), reporter,
+                                                 settings['dataframe_backend'])
+    index = MerchantIndex.build(ctx_valid_coords, settings)
+    output_file = os.path.join(settings['output_dir'], f"{Path(settings['ctx_file']).stem}.mcindex")
+    index.save(output_file)
+    reporter.log(f"Indexed {len(index)} of {ctx_total} records in {time.time() - start_time:.1f} seconds")
+    reporter.stage("Index saved")
+    return {
+        'output_file': output_file,
+        'title': "Index Saved",
+        'message': f"Indexed {len(index)} records into\n{os.path.basename(output_file)}"
+    }
+
+# Largest number of records one service request may ask about
+MATCH_SERVICE_MAX_BATCH = 100
+# Largest request body the service reads; larger requests get 413 without being read
+MATCH_SERVICE_MAX_BODY_BYTES = 1 << 20
+
+def make_match_server(index, host='127.0.0.1', port=0, ctx_file=''):
+    """HTTP server answering match queries on a MerchantIndex (see run_match_service), not started yet;
+    port 0 picks a free port"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MatchRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True  # answers go out as soon as they are written
+
+        def send_json(self, status, body):
+            data = json.dumps(body, default=_json_default).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != '/health':
+                return self.send_json(404, {'error': f"Unknown path {self.path}"})
+            self.send_json(200, {'status': 'ok', 'ctx_file': ctx_file, 'ctx_records': len(index)})
+
+        def do_POST(self):
+            if self.path != '/match':
+                return self.send_json(404, {'error': f"Unknown path {self.path}"})
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MATCH_SERVICE_MAX_BODY_BYTES:
+                # The body is left unread, so the connection cannot be reused
+                self.close_connection = True
+                if length < 0:
+                    return self.send_json(400, {'error': "Invalid Content-Length"})
+                return self.send_json(413, {'error': f"Request bodies are limited to {MATCH_SERVICE_MAX_BODY_BYTES} bytes"})
+            try:
+                body = json.loads(self.rfile.read(length) or b'null')
+                batch = isinstance(body, dict) and 'records' in body
+                records = body['records'] if batch else [body]
+                if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+                    raise ValueError("Expected a record object or {\"records\": [...]}")
+                if len(records) > MATCH_SERVICE_MAX_BATCH:
+                    raise ValueError(f"At most {MATCH_SERVICE_MAX_BATCH} records per request")
+                results = index.query_records(records)
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+            if batch:
+                return self.send_json(200, {'results': [{'matches': matches} for matches in results],
+                                            'elapsed_ms': elapsed_ms})
+            self.send_json(200, {'matches': results[0], 'elapsed_ms': elapsed_ms})
+
+        def log_message(self, format, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), MatchRequestHandler)
+
+def run_match_service(settings, reporter):
+    """Local HTTP/JSON service answering "does this merchant already exist?" queries.
+
+    The CTX file (or an index file written by build-index) is loaded into a
+    MerchantIndex once, then POST /match takes one record (a JSON object) or a
+    small batch ({"records": [...]}) and returns its matches; GET /health
+    reports the index size. Runs until interrupted.
+    """
+    reporter.stage("Loading CTX file...")
+    index = load_merchant_index(settings, reporter)
+
+    server = make_match_server(index, settings['service_host'], settings['service_port'], settings['ctx_file'])
+    url = f"http://{settings['service_host']}:{server.server_address[1]}"
+    reporter.stage(f"Match service listening on {url}")
+    reporter.log(f"POST {url}/match with a record or {{\"records\": [...]}}; Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return {
+        'output_file': url,
+        'title': "Match Service Stopped",
+        'message': f"Match service on {url} stopped"
+    }
+
+# Jobs that can be started from the GUI in a worker process
+JOBS = {
+    'comparison': run_advanced_comparison,
+    'batch': run_batch_comparison,
+    'geocoding': run_geocoding_only,
+    'self_dedup': run_self_dedup,
+    'sweep': run_threshold_sweep,
+    'shard_plan': run_shard_plan,
+    'shard': run_shard,
+    'shard_merge': run_shard_merge,
+    'serve': run_match_service,
+    'build_index': run_build_index,
+}
+
+def run_job_process(job_name, settings, events, cancel_event):
+    """Worker process entry point: run a job and report the outcome on the event queue"""
+    reporter = JobReporter(events, cancel_event)
+    try:
+        result = JOBS[job_name](settings, reporter)
+        events.put(('done', result))
+    except AnalysisCancelled:
+        events.put(('cancelled',))
+    except Exception as e:
+        events.put(('error', str(e)))
+
+# Rows a ResultsBrowser shows at once
+BROWSER_PAGE_ROWS = 30
+
+class ResultsBrowser:
+    """Window paging through a comparison report with sorting and filtering.
+
+    Only the visible page of rows is parsed and put into the Treeview, so
+    scrolling stays smooth on million-row reports; sorting and filtering work on
+    the columns they need (see ReportTable.view).
+    """
+
+    def __init__(self, parent, path):
+        self.table = ReportTable(path)
+        self.positions = self.table.view()
+        self.offset = 0
+        self.sort_column = None
+        self.descending = False
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Results - {os.path.basename(path)}")
+        self.window.geometry("1200x720")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Filters
+        filter_frame = tk.Frame(self.window)
+        filter_frame.pack(fill="x", padx=10, pady=5)
+        tk.Label(filter_frame, text="Match type:").pack(side="left")
+        self.match_type = tk.StringVar(value="All")
+        match_types = sorted(set(self.table.column('match_type').tolist())) if len(self.table) else []
+        ttk.Combobox(filter_frame, textvariable=self.match_type, values=["All"] + match_types,
+                     state="readonly", width=36).pack(side="left", padx=(5,15))
+        tk.Label(filter_frame, text="Min confidence:").pack(side="left")
+        self.min_confidence = tk.StringVar(value="")
+        tk.Entry(filter_frame, textvariable=self.min_confidence, width=6).pack(side="left", padx=(5,15))
+        tk.Label(filter_frame, text="State:").pack(side="left")
+        self.state = tk.StringVar(value="")
+        tk.Entry(filter_frame, textvariable=self.state, width=6).pack(side="left", padx=(5,15))
+        tk.Button(filter_frame, text="Apply", command=self.apply_filters).pack(side="left")
+        tk.Button(filter_frame, text="Reset", command=self.reset_filters).pack(side="left", padx=5)
+        self.status_var = tk.StringVar(value="")
+        tk.Label(filter_frame, textvariable=self.status_var, fg="gray").pack(side="right")
+
+        # Table: a fixed page of rows moved by a scrollbar over the whole view
+        table_frame = tk.Frame(self.window)
+        table_frame.pack(fill="both", expand=True, padx=10, pady=(0,10))
+        self.tree = ttk.Treeview(table_frame, columns=self.table.header, show="headings", height=BROWSER_PAGE_ROWS)
+        for name in self.table.header:
+            self.tree.heading(name, text=name, command=lambda name=name: self.sort_by(name))
+            self.tree.column(name, width=140, stretch=False)
+        self.scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=self.on_scroll)
+        h_scrollbar = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+        self.scrollbar.pack(side="right", fill="y")
+        h_scrollbar.pack(side="bottom", fill="x")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_to(self.offset - 3 * (1 if e.delta > 0 else -1)))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_to(self.offset + 3))
+        self.tree.bind("<Prior>", lambda e: self.scroll_to(self.offset - BROWSER_PAGE_ROWS))
+        self.tree.bind("<Next>", lambda e: self.scroll_to(self.offset + BROWSER_PAGE_ROWS))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(len(self.positions)))
+        self.tree.focus_set()
+
+        self.render()
+
+    def render(self):
+        """Show the page of rows starting at the current offset"""
+        page = self.positions[self.offset:self.offset + BROWSER_PAGE_ROWS]
+        self.tree.delete(*self.tree.get_children())
+        for row in self.table.rows(page.tolist()):
+            self.tree.insert("", "end", values=row)
+
+        total = len(self.positions)
+        if total:
+            self.scrollbar.set(self.offset / total, min(self.offset + BROWSER_PAGE_ROWS, total) / total)
+            shown = f"Rows {self.offset + 1:,}-{self.offset + len(page):,} of {total:,}"
         else:
-            match_type = 'POTENTIAL_MATCH'
-        
-        # Add geographic context if relevant
-        if geographic_warning:
-            if 'different_states' in geographic_warning or 'state mismatch' in geographic_warning.lower():
-                match_type += '_GEOGRAPHIC_WARNING'
-        
-        # Mark as matched for confidence >= 0.5 (instead of 0.8)
-        if confidence >= 0.5:
-            matched_piggy_indices.add(match['piggy_index'])
-            matched_ctx_indices.add(match['ctx_index'])
-        
-        # Get corrected locations if enabled
-        piggy_corrected_city, piggy_corrected_state = get_corrected_location(
-            piggy_row['latitude'], piggy_row['longitude'], enable_reverse_geocoding)
-        ctx_corrected_city, ctx_corrected_state = get_corrected_location(
-            ctx_row['latitude'], ctx_row['longitude'], enable_reverse_geocoding)
-        
-        result_row = {
-            'match_type': match_type,
-            'confidence_score': confidence,
-            'piggy_name': piggy_row['name'],
-            'piggy_address': piggy_row['address1'],
-            'piggy_city': piggy_row['city'],
-            'piggy_state': piggy_row['territory'],
-            'piggy_lat': piggy_row['latitude'],
-            'piggy_lon': piggy_row['longitude'],
-            'ctx_name': ctx_row['name'],
-            'ctx_address': ctx_row['address1'],
-            'ctx_city': ctx_row['city'],
-            'ctx_territory': ctx_row['territory'],
-            'ctx_lat': ctx_row['latitude'],
-            'ctx_lon': ctx_row['longitude'],
-            'distance_miles': match['distance_miles'],
-            'name_similarity': match['name_similarity'],
-            'address_similarity': match.get('address_similarity', 0),
-            'city_match': city_match,
-            'state_match': state_match,
-            'zip_match': zip_match,
-            'match_reasons': match.get('reasons', ''),
-            'geographic_warning': geographic_warning
-        }
-        
-        # Add corrected location columns if reverse geocoding is enabled
-        if enable_reverse_geocoding:
-            result_row.update({
-                'piggy_corrected_city': piggy_corrected_city,
-                'piggy_corrected_state': piggy_corrected_state,
-                'ctx_corrected_city': ctx_corrected_city,
-                'ctx_corrected_state': ctx_corrected_state
-            })
-        
-        results.append(result_row)
-    
-    # Add unique Piggy locations
-    for i, row in piggy_df.iterrows():
-        if i not in matched_piggy_indices:
-            # Get corrected location for unique Piggy entries
-            piggy_corrected_city, piggy_corrected_state = get_corrected_location(
-                row['latitude'], row['longitude'], enable_reverse_geocoding)
-
-            result_row = {
-                'match_type': 'PIGGY_UNIQUE',
-                'confidence_score': 0,
-                'piggy_name': row['name'],
-                'piggy_address': row['address1'],
-                'piggy_city': row['city'],
-                'piggy_state': row['territory'],
-                'piggy_lat': row['latitude'],
-                'piggy_lon': row['longitude'],
-                'ctx_name': '',
-                'ctx_address': '',
-                'ctx_city': '',
-                'ctx_territory': '',
-                'ctx_lat': '',
-                'ctx_lon': '',
-                'distance_miles': '',
-                'name_similarity': '',
-                'address_similarity': '',
-                'city_match': False,
-                'state_match': False,
-                'zip_match': False,
-                'match_reasons': '',
-                'geographic_warning': ''
-            }
-            
-            if enable_reverse_geocoding:
-                result_row.update({
-                    'piggy_corrected_city': piggy_corrected_city,
-                    'piggy_corrected_state': piggy_corrected_state,
-                    'ctx_corrected_city': '',
-                    'ctx_corrected_state': ''
-                })
-            
-            results.append(result_row)
-    
-    # Add unique CTX locations
-    for i, row in ctx_df.iterrows():
-        if i not in matched_ctx_indices:
-            # Get corrected location for unique CTX entries
-            ctx_corrected_city, ctx_corrected_state = get_corrected_location(
-                row['latitude'], row['longitude'], enable_reverse_geocoding)
-            
-            result_row = {
-                'match_type': 'CTX_UNIQUE',
-                'confidence_score': 0,
-                'piggy_name': '',
-                'piggy_address': '',
-                'piggy_city': '',
-                'piggy_state': '',
-                'piggy_lat': '',
-                'piggy_lon': '',
-                'ctx_name': row['name'],
-                'ctx_address': row['address1'],
-                'ctx_city': row['city'],
-                'ctx_territory': row['territory'],
-                'ctx_lat': row['latitude'],
-                'ctx_lon': row['longitude'],
-                'distance_miles': '',
-                'name_similarity': '',
-                'address_similarity': '',
-                'city_match': False,
-                'state_match': False,
-                'zip_match': False,
-                'match_reasons': '',
-                'geographic_warning': ''
-            }
-            
-            if enable_reverse_geocoding:
-                result_row.update({
-                    'piggy_corrected_city': '',
-                    'piggy_corrected_state': '',
-                    'ctx_corrected_city': ctx_corrected_city,
-                    'ctx_corrected_state': ctx_corrected_state
-                })
-            
-            results.append(result_row)
-    
-    return pd.DataFrame(results)
+            self.scrollbar.set(0, 1)
+            shown = "No rows"
+        if total != len(self.table):
+            shown += f" (filtered from {len(self.table):,})"
+        self.status_var.set(shown)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), len(self.positions) - BROWSER_PAGE_ROWS))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * len(self.positions))
+        elif unit == "pages":
+            self.scroll_to(self.offset + int(amount) * BROWSER_PAGE_ROWS)
+        else:
+            self.scroll_to(self.offset + int(amount))
+
+    def refresh_view(self):
+        self.status_var.set("Working...")
+        self.window.update_idletasks()
+        min_confidence = None
+        if self.min_confidence.get().strip():
+            try:
+                min_confidence = float(self.min_confidence.get())
+            except ValueError:
+                messagebox.showerror("Invalid Filter", "Min confidence must be a number", parent=self.window)
+                return
+        match_type = self.match_type.get()
+        self.positions = self.table.view(match_type if match_type != "All" else '', min_confidence,
+                                         self.state.get(), self.sort_column, self.descending)
+        self.offset = 0
+        self.render()
+
+    def apply_filters(self):
+        self.refresh_view()
+
+    def reset_filters(self):
+        self.match_type.set("All")
+        self.min_confidence.set("")
+        self.state.set("")
+        self.refresh_view()
+
+    def sort_by(self, name):
+        """Sort by a column; clicking it again reverses the order"""
+        self.descending = not self.descending if self.sort_column == name else name == 'confidence_score'
+        self.sort_column = name
+        for column in self.table.header:
+            arrow = (" ▼" if self.descending else " ▲") if column == name else ""
+            self.tree.heading(column, text=column + arrow)
+        self.refresh_view()
+
+    def close(self):
+        self.table.close()
+        self.window.destroy()
 
 class MerchantComparisonGUI:
     def __init__(self, root):
         self.root = root
-        self.root.title("Advanced Merchant Location Comparison Tool v3.0.1")
+        self.root.title(f"Advanced Merchant Location Comparison Tool v{__version__}")
         self.root.geometry("950x900")
         self.root.resizable(True, True)
         
@@ -634,28 +4279,63 @@ class MerchantComparisonGUI:
         # Settings file path
         self.settings_file = Path.home() / "merchant_comparison_settings.json"
         
+        # Last run's scored candidate table, used to re-threshold without rerunning
+        self.candidate_cache_file = Path.home() / "merchant_comparison_candidates.pkl"
+        self.candidate_cache = None
+        
+        # Preprocessed snapshots of input files, reused while a file is unchanged
+        self.snapshot_dir = Path.home() / "merchant_comparison_snapshots"
+        
+        # Report of the last comparison, for the results browser
+        self.last_report_file = None
+        
         # Variables
         self.piggy_file = tk.StringVar()
         self.ctx_file = tk.StringVar()
         self.geocoding_file = tk.StringVar()
+        self.dedup_file = tk.StringVar()
         self.output_dir = tk.StringVar(value=os.path.expanduser("~/Desktop"))
         self.max_distance = tk.DoubleVar(value=2.0)
         self.min_name_similarity = tk.DoubleVar(value=0.6)
         self.min_confidence = tk.DoubleVar(value=0.5)
         self.coordinate_precision = tk.IntVar(value=4)
+        self.coordinate_cascade = tk.BooleanVar(value=False)
         self.prioritize_coordinates = tk.BooleanVar(value=True)
         self.ignore_state_matching = tk.BooleanVar(value=False)
         self.ignore_city_matching = tk.BooleanVar(value=False)
         self.ignore_zip_matching = tk.BooleanVar(value=False)
         self.ignore_name_matching = tk.BooleanVar(value=False)
         self.include_address_matching = tk.BooleanVar(value=True)
+        self.prune_house_number_mismatch = tk.BooleanVar(value=False)
+        self.plus_code_matching = tk.BooleanVar(value=False)
+        self.plus_code_lengths = tk.StringVar(value="10")
+        self.key_matching = tk.BooleanVar(value=False)
+        self.key_match_max_distance = tk.DoubleVar(value=0.25)
+        self.name_lsh = tk.BooleanVar(value=False)
+        self.adaptive_radius = tk.BooleanVar(value=False)
+        self.adaptive_min_distance = tk.DoubleVar(value=0.1)
+        self.adaptive_target_candidates = tk.IntVar(value=50)
+        self.nearest_candidates = tk.IntVar(value=0)
+        self.nearest_early_stop = tk.BooleanVar(value=False)
         self.show_all_potential_matches = tk.BooleanVar(value=True)
-        self.use_parallel_processing = tk.BooleanVar(value=True)
         self.batch_size = tk.IntVar(value=200)
         self.auto_open_results = tk.BooleanVar(value=True)
+        self.report_compression = tk.StringVar(value='none')
+        self.dataframe_backend = tk.StringVar(value='pandas')
         self.remember_window_size = tk.BooleanVar(value=True)
         self.enable_reverse_geocoding = tk.BooleanVar(value=False)
         self.geocoding_batch_size = tk.IntVar(value=100)
+        self.resume_from_checkpoint = tk.BooleanVar(value=True)
+        self.tiled_matching = tk.BooleanVar(value=False)
+        self.tile_size_degrees = tk.DoubleVar(value=1.0)
+        self.sweep_max_distances = tk.StringVar(value="0.25, 0.5, 1.0, 2.0")
+        self.sweep_min_name_similarities = tk.StringVar(value="0.5, 0.6, 0.7, 0.8")
+        self.sweep_min_confidences = tk.StringVar(value="0.5")
+        self.sweep_coordinate_precisions = tk.StringVar(value="3, 4")
+        self.sweep_write_reports = tk.BooleanVar(value=False)
+        
+        # Currently running worker job (see start_job)
+        self.job = None
         
         # Create widgets first
         self.create_widgets()
@@ -740,7 +4420,6 @@ class MerchantComparisonGUI:
                     widget.configure(fg=theme['fg'])
             if widget.winfo_class() in ("Labelframe", "TLabelframe"):  # tk vs ttk
                 try:  # ttk path
-                    import tkinter.ttk as ttk
                     s = ttk.Style()
                     s.theme_use('clam')  # Aqua ignores colors
                     s.configure('Light.TLabelframe', background=theme['bg'])
@@ -788,7 +4467,7 @@ class MerchantComparisonGUI:
     
     def create_widgets(self):
         # Title
-        title_label = tk.Label(self.root, text="Advanced Merchant Location Comparison Tool v3.0.1", 
+        title_label = tk.Label(self.root, text=f"Advanced Merchant Location Comparison Tool v{__version__}", 
                               font=("Arial", 16, "bold"))
         title_label.pack(pady=10)
         
@@ -894,6 +4573,30 @@ class MerchantComparisonGUI:
         tk.Label(geocoding_frame, text="Note: Uses same output directory as above. Output will have '_geocoded' suffix.", 
                 font=("Arial", 8), fg="gray").pack(pady=(0,10))
         
+        # Self-deduplication frame
+        dedup_frame = tk.LabelFrame(scrollable_frame, text="Self-Deduplication", font=("Arial", 10, "bold"))
+        dedup_frame.pack(pady=5, padx=10, fill="x")
+        
+        tk.Label(dedup_frame, text="Find duplicate locations inside a single provider CSV file:", 
+                font=("Arial", 9)).pack(anchor="w", padx=10, pady=(5,0))
+        
+        tk.Label(dedup_frame, text="CSV File to Deduplicate:", font=("Arial", 10, "bold")).pack(anchor="w", padx=10, pady=(10,0))
+        dedup_file_frame = tk.Frame(dedup_frame)
+        dedup_file_frame.pack(fill="x", pady=5, padx=10)
+        dedup_entry = tk.Entry(dedup_file_frame, textvariable=self.dedup_file, width=60)
+        dedup_entry.pack(side="left", fill="x", expand=True)
+        tk.Button(dedup_file_frame, text="Browse", command=self.browse_dedup_file).pack(side="right", padx=(5,0))
+        
+        dedup_button_frame = tk.Frame(dedup_frame)
+        dedup_button_frame.pack(pady=10)
+        self.dedup_button = tk.Button(dedup_button_frame, text="Find Duplicates in File", 
+                                     command=self.start_self_dedup, bg="#2196F3", fg="white",
+                                     font=("Arial", 10, "bold"), padx=20, pady=10)
+        self.dedup_button.pack()
+        
+        tk.Label(dedup_frame, text="Note: Uses the matching settings below. Output will have '_duplicates' suffix.", 
+                font=("Arial", 8), fg="gray").pack(pady=(0,10))
+        
         # Advanced Settings frame
         settings_frame = tk.LabelFrame(scrollable_frame, text="Advanced Matching Settings", font=("Arial", 10, "bold"))
         settings_frame.pack(pady=5, padx=10, fill="x")
@@ -905,7 +4608,7 @@ class MerchantComparisonGUI:
         dist_value_label = tk.Label(dist_frame, textvariable=self.max_distance, font=("Arial", 10, "bold"))
         dist_value_label.pack(side="right")
         dist_scale = tk.Scale(dist_frame, from_=0.1, to=25.0, resolution=0.1, orient="horizontal", 
-                variable=self.max_distance, command=self.save_settings_delayed)
+                variable=self.max_distance, command=self.on_threshold_changed)
         dist_scale.pack(side="right", fill="x", expand=True, padx=(10,10))
         
         tk.Label(settings_frame, text="💡 Coordinate Mode: Use 0.1-0.5 miles when ignoring city/state/zip", 
@@ -913,6 +4616,18 @@ class MerchantComparisonGUI:
         tk.Label(settings_frame, text="💡 Geographic Mode: Use 2-10 miles for city/state matching", 
                 font=("Arial", 8), fg="gray").pack(anchor="w", padx=10)
         
+        # Adaptive radius: shrinks in dense areas, up to the max distance in sparse ones
+        tk.Checkbutton(settings_frame, text="Adapt radius to local density (max distance is the upper bound)", 
+                      variable=self.adaptive_radius, command=self.save_settings).pack(anchor="w", padx=10)
+        adaptive_frame = tk.Frame(settings_frame)
+        adaptive_frame.pack(fill="x", padx=30)
+        tk.Label(adaptive_frame, text="Min radius (miles):").pack(side="left")
+        tk.Scale(adaptive_frame, from_=0.05, to=2.0, resolution=0.05, orient="horizontal",
+                variable=self.adaptive_min_distance, command=lambda x: self.save_settings_delayed()).pack(side="left", fill="x", expand=True)
+        tk.Label(adaptive_frame, text="Candidates per row:").pack(side="left", padx=(10,0))
+        tk.Scale(adaptive_frame, from_=5, to=500, resolution=5, orient="horizontal",
+                variable=self.adaptive_target_candidates, command=lambda x: self.save_settings_delayed()).pack(side="left", fill="x", expand=True)
+        
         # Name similarity threshold
         name_frame = tk.Frame(settings_frame)
         name_frame.pack(fill="x", padx=10, pady=5)
@@ -920,7 +4635,7 @@ class MerchantComparisonGUI:
         name_value_label = tk.Label(name_frame, textvariable=self.min_name_similarity, font=("Arial", 10, "bold"))
         name_value_label.pack(side="right")
         name_scale = tk.Scale(name_frame, from_=0.3, to=1.0, resolution=0.05, orient="horizontal", 
-                variable=self.min_name_similarity, command=self.save_settings_delayed)
+                variable=self.min_name_similarity, command=self.on_threshold_changed)
         name_scale.pack(side="right", fill="x", expand=True, padx=(10,10))
         
         # Confidence threshold
@@ -930,7 +4645,7 @@ class MerchantComparisonGUI:
         conf_value_label = tk.Label(conf_frame, textvariable=self.min_confidence, font=("Arial", 10, "bold"))
         conf_value_label.pack(side="right")
         conf_scale = tk.Scale(conf_frame, from_=0.3, to=1.0, resolution=0.05, orient="horizontal", 
-                variable=self.min_confidence, command=self.save_settings_delayed)
+                variable=self.min_confidence, command=self.on_threshold_changed)
         conf_scale.pack(side="right", fill="x", expand=True, padx=(10,10))
         
         # Coordinate precision setting
@@ -940,8 +4655,10 @@ class MerchantComparisonGUI:
         coord_value_label = tk.Label(coord_frame, textvariable=self.coordinate_precision, font=("Arial", 10, "bold"))
         coord_value_label.pack(side="right")
         coord_scale = tk.Scale(coord_frame, from_=2, to=6, resolution=1, orient="horizontal", 
-                variable=self.coordinate_precision, command=self.save_settings_delayed)
+                variable=self.coordinate_precision, command=self.on_threshold_changed)
         coord_scale.pack(side="right", fill="x", expand=True, padx=(10,10))
+        tk.Checkbutton(settings_frame, text="Cascade from 6 decimal places down to this precision (neighbouring cells included)",
+                      variable=self.coordinate_cascade, command=self.on_threshold_changed).pack(anchor="w", padx=10)
         
         # Options frame
         options_frame = tk.LabelFrame(scrollable_frame, text="Analysis Options", font=("Arial", 10, "bold"))
@@ -975,12 +4692,44 @@ class MerchantComparisonGUI:
         
         tk.Checkbutton(options_inner, text="Include address similarity matching", 
                       variable=self.include_address_matching, command=self.save_settings).pack(anchor="w")
+        tk.Checkbutton(options_inner, text="Skip candidates whose house numbers differ (faster address matching)", 
+                      variable=self.prune_house_number_mismatch, command=self.save_settings).pack(anchor="w", padx=20)
+        tk.Checkbutton(options_inner, text="Match co-located locations by plus code (neighbouring cells included)", 
+                      variable=self.plus_code_matching, command=self.save_settings).pack(anchor="w")
+        plus_code_frame = tk.Frame(options_inner)
+        plus_code_frame.pack(fill="x", padx=20)
+        tk.Label(plus_code_frame, text="Plus code lengths (10 ≈ 14 m, 8 ≈ 275 m cells):").pack(side="left")
+        plus_code_entry = tk.Entry(plus_code_frame, textvariable=self.plus_code_lengths, width=10)
+        plus_code_entry.pack(side="left", padx=(5,0))
+        plus_code_entry.bind("<FocusOut>", self.save_settings)
+        tk.Checkbutton(options_inner, text="Match exact phone number / website first (nearby rows with similar names only)", 
+                      variable=self.key_matching, command=self.save_settings).pack(anchor="w")
+        key_frame = tk.Frame(options_inner)
+        key_frame.pack(fill="x", padx=20)
+        tk.Label(key_frame, text="Key match max distance (miles):").pack(side="left")
+        tk.Scale(key_frame, from_=0.05, to=5.0, resolution=0.05, orient="horizontal",
+                variable=self.key_match_max_distance, command=lambda x: self.save_settings()).pack(side="left", fill="x", expand=True)
+        tk.Checkbutton(options_inner, text="Score only name-similar pairs (LSH); match rows without coordinates by name and state", 
+                      variable=self.name_lsh, command=self.save_settings).pack(anchor="w")
         tk.Checkbutton(options_inner, text="Show all potential matches (not just best)", 
                       variable=self.show_all_potential_matches, command=self.save_settings).pack(anchor="w")
-        tk.Checkbutton(options_inner, text="Use parallel processing (faster for large datasets)", 
-                      variable=self.use_parallel_processing, command=self.save_settings).pack(anchor="w")
+        nearest_frame = tk.Frame(options_inner)
+        nearest_frame.pack(fill="x", padx=20)
+        tk.Label(nearest_frame, text="Nearest candidates per row (0 = all):").pack(side="left")
+        tk.Scale(nearest_frame, from_=0, to=100, resolution=1, orient="horizontal",
+                variable=self.nearest_candidates, command=lambda x: self.save_settings_delayed()).pack(side="left", fill="x", expand=True)
+        tk.Checkbutton(options_inner, text="Best only: stop scoring nearest candidates early (faster; a row whose best match is taken gets none)",
+                      variable=self.nearest_early_stop, command=self.save_settings).pack(anchor="w", padx=20)
         tk.Checkbutton(options_inner, text="Auto-open results file when complete", 
                       variable=self.auto_open_results, command=self.save_settings).pack(anchor="w")
+        compression_frame = tk.Frame(options_inner)
+        compression_frame.pack(fill="x")
+        tk.Label(compression_frame, text="Report compression:").pack(side="left")
+        tk.OptionMenu(compression_frame, self.report_compression, *REPORT_COMPRESSION_SUFFIXES,
+                      command=lambda x: self.save_settings()).pack(side="left", padx=(5,0))
+        tk.Label(compression_frame, text="Data frame backend:").pack(side="left", padx=(15,0))
+        tk.OptionMenu(compression_frame, self.dataframe_backend, *DATAFRAME_BACKENDS,
+                      command=lambda x: self.save_settings()).pack(side="left", padx=(5,0))
         tk.Checkbutton(options_inner, text="Remember window size and position", 
                       variable=self.remember_window_size, command=self.save_settings).pack(anchor="w")
         tk.Checkbutton(options_inner, text="Enable reverse geocoding (corrected city/state from coordinates)", 
@@ -988,6 +4737,8 @@ class MerchantComparisonGUI:
         
         tk.Label(options_inner, text="⚠️ Warning: Reverse geocoding adds significant processing time", 
                 font=("Arial", 8), fg="red").pack(anchor="w", padx=20)
+        tk.Checkbutton(options_inner, text="Resume interrupted geocoding/matching from checkpoint", 
+                      variable=self.resume_from_checkpoint, command=self.save_settings).pack(anchor="w")
         
         # Performance settings
         perf_frame = tk.Frame(options_inner)
@@ -998,6 +4749,46 @@ class MerchantComparisonGUI:
         batch_scale.pack(side="right", fill="x", expand=True, padx=(10,0))
         tk.Label(perf_frame, textvariable=self.batch_size, font=("Arial", 9)).pack(side="right")
         
+        # Out-of-core matching for files larger than memory
+        tk.Checkbutton(options_inner, text="Tiled matching for very large files (low memory, report grouped by tile)", 
+                      variable=self.tiled_matching, command=self.save_settings).pack(anchor="w", pady=(5,0))
+        tile_frame = tk.Frame(options_inner)
+        tile_frame.pack(fill="x", padx=20)
+        tk.Label(tile_frame, text="Tile size (degrees):").pack(side="left")
+        tile_scale = tk.Scale(tile_frame, from_=0.25, to=5.0, resolution=0.25, orient="horizontal", 
+                variable=self.tile_size_degrees, command=self.save_settings_delayed)
+        tile_scale.pack(side="right", fill="x", expand=True, padx=(10,0))
+        tk.Label(tile_frame, textvariable=self.tile_size_degrees, font=("Arial", 9)).pack(side="right")
+        
+        # Threshold sweep frame
+        sweep_frame = tk.LabelFrame(scrollable_frame, text="Threshold Sweep", font=("Arial", 10, "bold"))
+        sweep_frame.pack(pady=5, padx=10, fill="x")
+        
+        tk.Label(sweep_frame, text="Compare many threshold settings with one candidate scoring pass (comma-separated values):", 
+                font=("Arial", 9)).pack(anchor="w", padx=10, pady=(5,0))
+        
+        for label, variable in (("Max distances (miles):", self.sweep_max_distances),
+                                ("Min name similarities:", self.sweep_min_name_similarities),
+                                ("Min confidence scores:", self.sweep_min_confidences),
+                                ("Coordinate precisions:", self.sweep_coordinate_precisions)):
+            sweep_row = tk.Frame(sweep_frame)
+            sweep_row.pack(fill="x", padx=10, pady=2)
+            tk.Label(sweep_row, text=label, width=25, anchor="w").pack(side="left")
+            tk.Entry(sweep_row, textvariable=variable, width=40).pack(side="left", fill="x", expand=True)
+        
+        tk.Checkbutton(sweep_frame, text="Write a full report for every setting", 
+                      variable=self.sweep_write_reports, command=self.save_settings).pack(anchor="w", padx=10)
+        
+        sweep_button_frame = tk.Frame(sweep_frame)
+        sweep_button_frame.pack(pady=10)
+        self.sweep_button = tk.Button(sweep_button_frame, text="Run Threshold Sweep", 
+                                     command=self.start_threshold_sweep, bg="#2196F3", fg="white",
+                                     font=("Arial", 10, "bold"), padx=20, pady=10)
+        self.sweep_button.pack()
+        
+        tk.Label(sweep_frame, text="Note: Uses the Piggy/CTX files and the ignore/address options above.", 
+                font=("Arial", 8), fg="gray").pack(pady=(0,10))
+        
         # Progress frame
         progress_frame = tk.Frame(scrollable_frame)
         progress_frame.pack(pady=5, padx=10, fill="x")
@@ -1020,6 +4811,11 @@ class MerchantComparisonGUI:
                                        font=("Arial", 12, "bold"), padx=30, pady=15)
         self.compare_button.pack(side="left", padx=5)
         
+        self.cancel_button = tk.Button(center_frame, text="Cancel", command=self.cancel_job,
+                                      bg="#607D8B", fg="white", font=("Arial", 12, "bold"),
+                                      padx=30, pady=15, state="disabled")
+        self.cancel_button.pack(side="left", padx=5)
+        
         tk.Button(center_frame, text="Clear All Fields", command=self.clear_fields,
                  bg="#FF9800", fg="white", font=("Arial", 12, "bold"), 
                  padx=30, pady=15).pack(side="left", padx=5)
@@ -1037,6 +4833,15 @@ class MerchantComparisonGUI:
         results_frame = tk.LabelFrame(scrollable_frame, text="Analysis Results", font=("Arial", 10, "bold"))
         results_frame.pack(pady=5, padx=10, fill="both", expand=True)
         
+        # Live summary for the current thresholds, re-filtered from the cached candidate table
+        self.live_summary_var = tk.StringVar(value="")
+        tk.Label(results_frame, textvariable=self.live_summary_var, font=("Arial", 9, "bold"),
+                 anchor="w", justify="left").pack(fill="x", padx=5, pady=(5,0))
+        
+        browse_frame = tk.Frame(results_frame)
+        browse_frame.pack(fill="x", padx=5, pady=(5,0))
+        tk.Button(browse_frame, text="Browse Results Table...", command=self.browse_results).pack(side="left")
+        
         # Create text widget with scrollbar
         text_frame = tk.Frame(results_frame)
         text_frame.pack(fill="both", expand=True, padx=5, pady=5)
@@ -1075,6 +4880,7 @@ class MerchantComparisonGUI:
                 self.min_name_similarity.set(settings.get('min_name_similarity', 0.6))
                 self.min_confidence.set(settings.get('min_confidence', 0.5))
                 self.coordinate_precision.set(settings.get('coordinate_precision', 4))
+                self.coordinate_cascade.set(settings.get('coordinate_cascade', False))
                 
                 # Load options
                 self.prioritize_coordinates.set(settings.get('prioritize_coordinates', True))
@@ -1083,14 +4889,35 @@ class MerchantComparisonGUI:
                 self.ignore_zip_matching.set(settings.get('ignore_zip_matching', False))
                 self.ignore_name_matching.set(settings.get('ignore_name_matching', False))
                 self.include_address_matching.set(settings.get('include_address_matching', True))
+                self.prune_house_number_mismatch.set(settings.get('prune_house_number_mismatch', False))
+                self.plus_code_matching.set(settings.get('plus_code_matching', False))
+                self.plus_code_lengths.set(settings.get('plus_code_lengths', "10"))
+                self.key_matching.set(settings.get('key_matching', False))
+                self.key_match_max_distance.set(settings.get('key_match_max_distance', 0.25))
+                self.name_lsh.set(settings.get('name_lsh', False))
+                self.adaptive_radius.set(settings.get('adaptive_radius', False))
+                self.adaptive_min_distance.set(settings.get('adaptive_min_distance', 0.1))
+                self.adaptive_target_candidates.set(settings.get('adaptive_target_candidates', 50))
+                self.nearest_candidates.set(settings.get('nearest_candidates', 0))
+                self.nearest_early_stop.set(settings.get('nearest_early_stop', False))
                 self.show_all_potential_matches.set(settings.get('show_all_potential_matches', True))
                 self.auto_open_results.set(settings.get('auto_open_results', True))
+                self.report_compression.set(settings.get('report_compression', 'none'))
+                self.dataframe_backend.set(settings.get('dataframe_backend', 'pandas'))
                 self.remember_window_size.set(settings.get('remember_window_size', True))
-                self.use_parallel_processing.set(settings.get('use_parallel_processing', True))
                 self.batch_size.set(settings.get('batch_size', 200))
                 self.enable_reverse_geocoding.set(settings.get('enable_reverse_geocoding', False))
                 self.geocoding_file.set(settings.get('geocoding_file', ''))
+                self.dedup_file.set(settings.get('dedup_file', ''))
                 self.geocoding_batch_size.set(settings.get('geocoding_batch_size', 100))
+                self.resume_from_checkpoint.set(settings.get('resume_from_checkpoint', True))
+                self.tiled_matching.set(settings.get('tiled_matching', False))
+                self.tile_size_degrees.set(settings.get('tile_size_degrees', 1.0))
+                self.sweep_max_distances.set(settings.get('sweep_max_distances', "0.25, 0.5, 1.0, 2.0"))
+                self.sweep_min_name_similarities.set(settings.get('sweep_min_name_similarities', "0.5, 0.6, 0.7, 0.8"))
+                self.sweep_min_confidences.set(settings.get('sweep_min_confidences', "0.5"))
+                self.sweep_coordinate_precisions.set(settings.get('sweep_coordinate_precisions', "3, 4"))
+                self.sweep_write_reports.set(settings.get('sweep_write_reports', False))
                 self.dark_mode.set(settings.get('dark_mode', False))
                 
                 # Load window settings if enabled
@@ -1110,34 +4937,60 @@ class MerchantComparisonGUI:
             if hasattr(self, 'status_var'):
                 self.status_var.set(f"Error loading settings: {str(e)}")
     
+    def get_settings(self):
+        """Snapshot of the current settings as a plain dict"""
+        return {
+            'piggy_file': self.piggy_file.get(),
+            'ctx_file': self.ctx_file.get(),
+            'geocoding_file': self.geocoding_file.get(),
+            'dedup_file': self.dedup_file.get(),
+            'output_dir': self.output_dir.get(),
+            'max_distance': self.max_distance.get(),
+            'min_name_similarity': self.min_name_similarity.get(),
+            'min_confidence': self.min_confidence.get(),
+            'coordinate_precision': self.coordinate_precision.get(),
+            'coordinate_cascade': self.coordinate_cascade.get(),
+            'prioritize_coordinates': self.prioritize_coordinates.get(),
+            'ignore_state_matching': self.ignore_state_matching.get(),
+            'ignore_city_matching': self.ignore_city_matching.get(),
+            'ignore_zip_matching': self.ignore_zip_matching.get(),
+            'ignore_name_matching': self.ignore_name_matching.get(),
+            'include_address_matching': self.include_address_matching.get(),
+            'prune_house_number_mismatch': self.prune_house_number_mismatch.get(),
+            'plus_code_matching': self.plus_code_matching.get(),
+            'plus_code_lengths': self.plus_code_lengths.get(),
+            'key_matching': self.key_matching.get(),
+            'key_match_max_distance': self.key_match_max_distance.get(),
+            'name_lsh': self.name_lsh.get(),
+            'adaptive_radius': self.adaptive_radius.get(),
+            'adaptive_min_distance': self.adaptive_min_distance.get(),
+            'adaptive_target_candidates': self.adaptive_target_candidates.get(),
+            'nearest_candidates': self.nearest_candidates.get(),
+            'nearest_early_stop': self.nearest_early_stop.get(),
+            'show_all_potential_matches': self.show_all_potential_matches.get(),
+            'auto_open_results': self.auto_open_results.get(),
+            'report_compression': self.report_compression.get(),
+            'dataframe_backend': self.dataframe_backend.get(),
+            'remember_window_size': self.remember_window_size.get(),
+            'batch_size': self.batch_size.get(),
+            'enable_reverse_geocoding': self.enable_reverse_geocoding.get(),
+            'geocoding_batch_size': self.geocoding_batch_size.get(),
+            'resume_from_checkpoint': self.resume_from_checkpoint.get(),
+            'tiled_matching': self.tiled_matching.get(),
+            'tile_size_degrees': self.tile_size_degrees.get(),
+            'sweep_max_distances': self.sweep_max_distances.get(),
+            'sweep_min_name_similarities': self.sweep_min_name_similarities.get(),
+            'sweep_min_confidences': self.sweep_min_confidences.get(),
+            'sweep_coordinate_precisions': self.sweep_coordinate_precisions.get(),
+            'sweep_write_reports': self.sweep_write_reports.get(),
+            'dark_mode': self.dark_mode.get(),
+            'window_geometry': self.root.geometry() if self.remember_window_size.get() else '950x900'
+        }
+    
     def save_settings(self, event=None):
         """Save current settings to file"""
         try:
-            settings = {
-                'piggy_file': self.piggy_file.get(),
-                'ctx_file': self.ctx_file.get(),
-                'geocoding_file': self.geocoding_file.get(),
-                'output_dir': self.output_dir.get(),
-                'max_distance': self.max_distance.get(),
-                'min_name_similarity': self.min_name_similarity.get(),
-                'min_confidence': self.min_confidence.get(),
-                'coordinate_precision': self.coordinate_precision.get(),
-                'prioritize_coordinates': self.prioritize_coordinates.get(),
-                'ignore_state_matching': self.ignore_state_matching.get(),
-                'ignore_city_matching': self.ignore_city_matching.get(),
-                'ignore_zip_matching': self.ignore_zip_matching.get(),
-                'ignore_name_matching': self.ignore_name_matching.get(),
-                'include_address_matching': self.include_address_matching.get(),
-                'show_all_potential_matches': self.show_all_potential_matches.get(),
-                'auto_open_results': self.auto_open_results.get(),
-                'remember_window_size': self.remember_window_size.get(),
-                'use_parallel_processing': self.use_parallel_processing.get(),
-                'batch_size': self.batch_size.get(),
-                'enable_reverse_geocoding': self.enable_reverse_geocoding.get(),
-                'geocoding_batch_size': self.geocoding_batch_size.get(),
-                'dark_mode': self.dark_mode.get(),
-                'window_geometry': self.root.geometry() if self.remember_window_size.get() else '950x900'
-            }
+            settings = self.get_settings()
             
             with open(self.settings_file, 'w') as f:
                 json.dump(settings, f, indent=2)
@@ -1152,11 +5005,55 @@ class MerchantComparisonGUI:
             self.root.after_cancel(self._save_timer)
         self._save_timer = self.root.after(500, self.save_settings)
     
+    def on_threshold_changed(self, event=None):
+        """Save the new slider value and refresh the live summary shortly after movement stops"""
+        self.save_settings_delayed()
+        if hasattr(self, '_preview_timer'):
+            self.root.after_cancel(self._preview_timer)
+        self._preview_timer = self.root.after(150, self.update_threshold_preview)
+    
+    def update_threshold_preview(self):
+        """Re-filter the last run's candidate table with the current thresholds"""
+        if self.job is not None:
+            return
+        
+        if self.candidate_cache is None:
+            self.candidate_cache = load_candidate_cache(str(self.candidate_cache_file))
+        cache = self.candidate_cache
+        if cache is None:
+            return
+        
+        settings = self.get_settings()
+        try:
+            key = candidate_cache_key(settings)
+        except OSError:
+            key = None
+        
+        if key != cache['key']:
+            self.live_summary_var.set("Live preview unavailable: input files or matching options changed since the last run")
+            return
+        
+        if settings['max_distance'] > cache['radius']:
+            self.live_summary_var.set(f"Max distance is wider than the last run's search radius ({cache['radius']} mi) - "
+                                      f"start the analysis to rerun the search")
+            return
+        
+        start = time.perf_counter()
+        matches = select_matches_from_features(cache['features'], settings)
+        summary = summarize_matches(matches, cache['piggy_count'], cache['ctx_count'])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        self.live_summary_var.set(
+            f"Live preview: High {summary['high_confidence']} | Medium {summary['medium_confidence']} | "
+            f"Low {summary['low_confidence']} | Potential {summary['potential']} | "
+            f"Unique Piggy {summary['unique_piggy']} | Unique CTX {summary['unique_ctx']}  ({elapsed_ms:.0f} ms)")
+    
     def clear_fields(self):
         """Clear all file fields"""
         self.piggy_file.set('')
         self.ctx_file.set('')
         self.geocoding_file.set('')
+        self.dedup_file.set('')
         self.results_text.delete(1.0, tk.END)
         self.save_settings()
         self.log_message("All fields cleared")
@@ -1200,6 +5097,16 @@ class MerchantComparisonGUI:
             self.geocoding_file.set(filename)
             self.save_settings()
     
+    def browse_dedup_file(self):
+        filename = filedialog.askopenfilename(
+            title="Select CSV File to Deduplicate",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            initialdir=os.path.dirname(self.dedup_file.get()) if self.dedup_file.get() else None
+        )
+        if filename:
+            self.dedup_file.set(filename)
+            self.save_settings()
+    
     def log_message(self, message):
         # Only log if the results_text widget exists
         if hasattr(self, 'results_text'):
@@ -1224,13 +5131,9 @@ class MerchantComparisonGUI:
             messagebox.showerror("Error", f"CTX CSV file not found:\n{self.ctx_file.get()}")
             return
         
-        # Start comparison in separate thread to prevent GUI freezing
-        self.compare_button.config(state="disabled")
-        self.progress_bar.start()
-        
-        thread = threading.Thread(target=self.run_advanced_comparison)
-        thread.daemon = True
-        thread.start()
+        # Run comparison in a worker process to keep the GUI responsive
+        self.start_job('comparison', self.compare_button, self.progress_var, self.progress_bar,
+                       "Ready for next analysis")
     
     def start_geocoding_only(self):
         # Validate input
@@ -1242,493 +5145,511 @@ class MerchantComparisonGUI:
             messagebox.showerror("Error", f"CSV file not found:\n{self.geocoding_file.get()}")
             return
         
-        # Start geocoding in separate thread
-        self.geocoding_button.config(state="disabled")
-        self.geocoding_progress_bar['value'] = 0
-        self.geocoding_progress_var.set("Starting geocoding...")
+        # Run geocoding in a worker process
+        self.start_job('geocoding', self.geocoding_button, self.geocoding_progress_var,
+                       self.geocoding_progress_bar, "Ready for geocoding", determinate=True)
+    
+    def start_self_dedup(self):
+        # Validate input
+        if not self.dedup_file.get():
+            messagebox.showerror("Error", "Please select a CSV file to deduplicate")
+            return
+        
+        if not os.path.exists(self.dedup_file.get()):
+            messagebox.showerror("Error", f"CSV file not found:\n{self.dedup_file.get()}")
+            return
         
-        thread = threading.Thread(target=self.run_geocoding_only)
-        thread.daemon = True
-        thread.start()
+        # Run deduplication in a worker process
+        self.start_job('self_dedup', self.dedup_button, self.progress_var, self.progress_bar,
+                       "Ready for next analysis")
     
-    def run_advanced_comparison(self):
+    def start_threshold_sweep(self):
+        # Validate inputs
+        if not self.piggy_file.get() or not self.ctx_file.get():
+            messagebox.showerror("Error", "Please select both CSV files")
+            return
+        
+        for path in (self.piggy_file.get(), self.ctx_file.get()):
+            if not os.path.exists(path):
+                messagebox.showerror("Error", f"CSV file not found:\n{path}")
+                return
+        
         try:
-            start_time = time.time()
-            self.progress_var.set("Loading and analyzing CSV files...")
-            
-            # Load files
-            piggy_df = pd.read_csv(self.piggy_file.get())
-            ctx_df = pd.read_csv(self.ctx_file.get())
-            
-            self.log_message(f"Loaded {len(piggy_df)} records from Piggy file")
-            self.log_message(f"Loaded {len(ctx_df)} records from CTX file")
-            
-            # Data quality analysis
-            self.progress_var.set("Analyzing data quality...")
-
-            piggy_valid_coords = piggy_df.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
-            ctx_valid_coords = ctx_df.dropna(subset=['latitude', 'longitude']).reset_index(drop=True)
-
-            self.log_message(f"Data quality check:")
-            self.log_message(f"  Piggy: {len(piggy_valid_coords)}/{len(piggy_df)} have valid coordinates")
-            self.log_message(f"  CTX: {len(ctx_valid_coords)}/{len(ctx_df)} have valid coordinates")
-            
-            # Advanced matching analysis
-            self.progress_var.set("Performing coordinate-priority matching...")
-            
-            all_matches = self.find_matches_advanced(piggy_valid_coords, ctx_valid_coords)
-            
-            processing_time = time.time() - start_time
-            self.log_message(f"Found {len(all_matches)} potential matches in {processing_time:.1f} seconds")
-            
-            # Create detailed comparison report
-            self.progress_var.set("Creating detailed comparison report...")
-            
-            # Check if reverse geocoding is enabled
-            enable_geocoding = self.enable_reverse_geocoding.get()
-            if enable_geocoding:
-                self.log_message("Reverse geocoding enabled - this may take additional time...")
-                # Add rate limiting delay for geocoding API
-                time.sleep(0.1)
-            
-            comparison_df = create_comparison_report_advanced(piggy_valid_coords, ctx_valid_coords, all_matches, enable_geocoding)
-            
-            # Save results with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename_suffix = "_with_geocoding" if enable_geocoding else ""
-            output_file = os.path.join(self.output_dir.get(), f"coordinate_priority_comparison_{timestamp}{filename_suffix}.csv")
-            comparison_df.to_csv(output_file, index=False)
-            
-            # Detailed analysis summary
-            high_conf = len([m for m in all_matches if m['confidence'] >= 0.9])
-            medium_conf = len([m for m in all_matches if 0.7 <= m['confidence'] < 0.9])
-            low_conf = len([m for m in all_matches if 0.5 <= m['confidence'] < 0.7])
-            potential = len([m for m in all_matches if m['confidence'] < 0.5])
-            
-            unique_piggy = len(comparison_df[comparison_df['match_type'] == 'PIGGY_UNIQUE'])
-            unique_ctx = len(comparison_df[comparison_df['match_type'] == 'CTX_UNIQUE'])
-            
-            total_time = time.time() - start_time
-            
-            self.log_message("\n" + "="*70)
-            self.log_message("COORDINATE-PRIORITY ANALYSIS COMPLETE!")
-            self.log_message("="*70)
-            self.log_message(f"Total processing time: {total_time:.1f} seconds")
-            self.log_message(f"\nMatch Quality Breakdown:")
-            self.log_message(f"  High confidence duplicates (≥90%): {high_conf}")
-            self.log_message(f"  Medium confidence duplicates (70-89%): {medium_conf}")
-            self.log_message(f"  Low confidence duplicates (50-69%): {low_conf}")
-            self.log_message(f"  Potential matches (<50%): {potential}")
-            self.log_message(f"\nUnique Locations:")
-            self.log_message(f"  Unique to Piggy: {unique_piggy}")
-            self.log_message(f"  Unique to CTX: {unique_ctx}")
-            
-            if enable_geocoding:
-                self.log_message(f"\nReverse geocoding completed - corrected city/state columns added")
-            
-            self.log_message(f"\nResults saved to: {output_file}")
-            
-            # Show sample high-confidence matches
-            if high_conf > 0:
-                self.log_message("\nSample high-confidence duplicates:")
-                high_conf_matches = [m for m in all_matches if m['confidence'] >= 0.9][:3]
-                for match in high_conf_matches:
-                    piggy_row = piggy_valid_coords.iloc[match['piggy_index']]
-                    ctx_row = ctx_valid_coords.iloc[match['ctx_index']]
-                    self.log_message(f"  • {piggy_row['name']} ↔ {ctx_row['name']}")
-                    self.log_message(f"    Distance: {match['distance_miles']:.3f} mi, Confidence: {match['confidence']:.1%}")
-            
-            self.progress_var.set("Coordinate-priority analysis complete!")
-            
-            # Auto-open results if enabled
-            if self.auto_open_results.get():
-                try:
-                    os.startfile(output_file)  # Windows
-                except:
-                    try:
-                        os.system(f'open "{output_file}"')  # macOS
-                    except:
-                        pass  # Linux or other
-            
-            messagebox.showinfo("Advanced Analysis Complete", 
-                f"Analysis complete in {total_time:.1f} seconds!\n\n"
-                f"High confidence duplicates: {high_conf}\n"
-                f"Medium confidence duplicates: {medium_conf}\n"
-                f"Low confidence duplicates: {low_conf}\n"
-                f"Potential matches: {potential}\n\n"
-                f"Unique to Piggy: {unique_piggy}\n"
-                f"Unique to CTX: {unique_ctx}\n\n"
-                f"Results saved to:\n{os.path.basename(output_file)}")
-            
-        except Exception as e:
-            self.log_message(f"Error: {str(e)}")
-            messagebox.showerror("Error", f"An error occurred:\n{str(e)}")
+            parse_sweep_values(self.sweep_max_distances.get(), float, 0)
+            parse_sweep_values(self.sweep_min_name_similarities.get(), float, 0)
+            parse_sweep_values(self.sweep_min_confidences.get(), float, 0)
+            parse_sweep_values(self.sweep_coordinate_precisions.get(), int, 0)
+        except ValueError:
+            messagebox.showerror("Error", "Sweep values must be comma-separated numbers")
+            return
         
-        finally:
-            self.progress_bar.stop()
-            self.compare_button.config(state="normal")
-            self.progress_var.set("Ready for next analysis")
+        self.save_settings()
+        self.start_job('sweep', self.sweep_button, self.progress_var, self.progress_bar,
+                       "Ready for next analysis")
     
-    def run_geocoding_only(self):
-        try:
-            start_time = time.time()
-            self.geocoding_progress_var.set("Loading CSV file for geocoding...")
-            
-            # Load file
-            df = pd.read_csv(self.geocoding_file.get())
-            self.log_message(f"Loaded {len(df)} records for geocoding")
-            
-            # Detect coordinate columns
-            lat_col = None
-            lon_col = None
-            
-            # Common latitude column names
-            lat_candidates = ['latitude', 'latitude', 'latitude', 'Latitude', 'latitude', 'LATITUDE']
-            lon_candidates = ['longitude', 'lng', 'longitude', 'longitude', 'Lng', 'Longitude', 'longitude', 'LNG', 'LONGITUDE']
-
-            for col in df.columns:
-                if col in lat_candidates:
-                    lat_col = col
-                elif col in lon_candidates:
-                    lon_col = col
-            
-            if not lat_col or not lon_col:
-                messagebox.showerror("Error", 
-                    f"Could not find latitude/longitude columns.\n"
-                    f"Looking for columns named: {', '.join(lat_candidates + lon_candidates)}\n"
-                    f"Found columns: {', '.join(df.columns.tolist())}")
-                return
-            
-            self.log_message(f"Using columns: {lat_col}, {lon_col}")
-            
-            # Filter valid coordinates
-            valid_coords = df.dropna(subset=[lat_col, lon_col])
-            self.log_message(f"Found {len(valid_coords)} records with valid coordinates")
-            
-            if len(valid_coords) == 0:
-                messagebox.showerror("Error", "No valid coordinates found in the file")
-                return
-            
-            # Set up progress bar
-            total_records = len(df)
-            self.geocoding_progress_bar['maximum'] = total_records
-            self.geocoding_progress_var.set("Starting reverse geocoding...")
-            
-            # Prepare coordinate pairs for batch processing
-            coordinates = [(row[lat_col] if pd.notna(row[lat_col]) else None, 
-                           row[lon_col] if pd.notna(row[lon_col]) else None) 
-                          for _, row in df.iterrows()]
-            
-            # Progress callback function
-            def update_progress(current, total):
-                self.geocoding_progress_bar['value'] = current
-                percentage = (current / total) * 100
-                self.geocoding_progress_var.set(f"Geocoding... {current}/{total} ({percentage:.1f}%)")
-                
-                # Also log progress at certain intervals
-                if current % self.geocoding_batch_size.get() == 0:
-                    self.log_message(f"Processed {current}/{total} records ({percentage:.1f}%)")
-                
-                # Update GUI
-                self.root.update_idletasks()
-            
-            # Perform batch reverse geocoding
-            self.log_message("Starting optimized reverse geocoding process...")
-            
-            # Process in smaller chunks for better performance
-            chunk_size = 50  # Process 50 records at a time
-            all_results = []
-            
-            for i in range(0, len(coordinates), chunk_size):
-                chunk = coordinates[i:i + chunk_size]
-                
-                # Process this chunk
-                chunk_results = []
-                for j, (lat, lon) in enumerate(chunk):
-                    if lat is not None and lon is not None:
-                        city, state = reverse_geocode_cached(lat, lon)
-                        chunk_results.append((city, state))
-                    else:
-                        chunk_results.append(('', ''))
-                    
-                    # Update progress
-                    current_record = i + j + 1
-                    if current_record % 10 == 0 or current_record == total_records:
-                        update_progress(current_record, total_records)
-                    
-                    # Faster rate limiting - only 20ms delay
-                    time.sleep(0.02)
-                
-                all_results.extend(chunk_results)
-                
-                # Small pause between chunks to prevent overwhelming the service
-                if i + chunk_size < len(coordinates):
-                    time.sleep(0.1)
-            
-            # Ensure final progress update
-            update_progress(total_records, total_records)
-            
-            # Add corrected columns to dataframe
-            corrected_cities = [result[0] for result in all_results]
-            corrected_states = [result[1] for result in all_results]
-            
-            df['corrected_city'] = corrected_cities
-            df['corrected_state'] = corrected_states
-            
-            # Save results
-            self.geocoding_progress_var.set("Saving geocoded results...")
-            
-            # Create output filename
-            input_filename = os.path.basename(self.geocoding_file.get())
-            name_without_ext = os.path.splitext(input_filename)[0]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"{name_without_ext}_geocoded_{timestamp}.csv"
-            output_file = os.path.join(self.output_dir.get(), output_filename)
-            
-            df.to_csv(output_file, index=False)
-            
-            processing_time = time.time() - start_time
-            valid_geocoded = len([city for city in corrected_cities if city.strip()])
-            processing_rate = len(df) / processing_time if processing_time > 0 else 0
-            
-            self.log_message("\n" + "="*50)
-            self.log_message("REVERSE GEOCODING COMPLETE!")
-            self.log_message("="*50)
-            self.log_message(f"Total processing time: {processing_time:.1f} seconds")
-            self.log_message(f"Processing rate: {processing_rate:.1f} records/second")
-            self.log_message(f"Total records processed: {len(df)}")
-            self.log_message(f"Successfully geocoded: {valid_geocoded}")
-            self.log_message(f"Failed to geocode: {len(df) - valid_geocoded}")
-            self.log_message(f"Cache hit rate: {(geocoder.cache_info().hits / (geocoder.cache_info().hits + geocoder.cache_info().misses) * 100):.1f}%" if hasattr(geocoder, 'cache_info') else "Cache info not available")
-            self.log_message(f"Results saved to: {output_file}")
-            
-            self.geocoding_progress_var.set("Reverse geocoding complete!")
-            
-            # Auto-open results if enabled
-            if self.auto_open_results.get():
-                try:
-                    os.startfile(output_file)  # Windows
-                except:
-                    try:
-                        os.system(f'open "{output_file}"')  # macOS
-                    except:
-                        pass  # Linux or other
-            
-            messagebox.showinfo("Geocoding Complete", 
-                f"Reverse geocoding complete in {processing_time:.1f} seconds!\n\n"
-                f"Processing rate: {processing_rate:.1f} records/second\n"
-                f"Total records: {len(df)}\n"
-                f"Successfully geocoded: {valid_geocoded}\n"
-                f"Failed to geocode: {len(df) - valid_geocoded}\n\n"
-                f"Results saved to:\n{output_filename}")
-            
-        except Exception as e:
-            self.log_message(f"Error during geocoding: {str(e)}")
-            messagebox.showerror("Error", f"An error occurred during geocoding:\n{str(e)}")
+    def start_job(self, job_name, button, progress_var, progress_bar, ready_text, determinate=False):
+        """Start a job in a separate process and begin draining its event queue"""
+        if self.job is not None:
+            messagebox.showwarning("Busy", "Another job is already running. Cancel it or wait for it to finish.")
+            return
         
-        finally:
-            self.geocoding_progress_bar['value'] = 0
-            self.geocoding_button.config(state="normal")
-            self.geocoding_progress_var.set("Ready for geocoding")
-    
-    def find_matches_advanced(self, piggy_df, ctx_df):
-        """New coordinate-priority matching algorithm"""
-        max_distance = self.max_distance.get()
-        min_name_sim = self.min_name_similarity.get()
-        min_confidence = self.min_confidence.get()
-        include_address = self.include_address_matching.get()
-        show_all_matches = self.show_all_potential_matches.get()
-        coordinate_precision = self.coordinate_precision.get()
-        
-        ignore_state = self.ignore_state_matching.get()
-        ignore_city = self.ignore_city_matching.get()
-        ignore_zip = self.ignore_zip_matching.get()
-        ignore_name = self.ignore_name_matching.get()
-        
-        self.log_message("Starting coordinate-priority matching algorithm...")
-        
-        # STEP 1: PRIMARY COORDINATE MATCHING (always first)
-        self.log_message(f"Step 1: Finding truncated coordinate matches (precision: {coordinate_precision} decimal places)")
-        exact_coordinate_matches = coordinate_priority_matching(piggy_df, ctx_df, coordinate_precision, max_distance, ignore_name, min_name_sim)
-
-        all_matches = []
-        matched_piggy_indices = set()
-        matched_ctx_indices = set()
-        
-        # Process exact coordinate matches
-        for coord_match in exact_coordinate_matches:
-            piggy_idx = coord_match['piggy_index']
-            ctx_idx = coord_match['ctx_index']
-            distance = coord_match['distance_miles']
-            
-            piggy_row = piggy_df.iloc[piggy_idx]
-            ctx_row = ctx_df.iloc[ctx_idx]
-            
-            # Calculate name similarity (if not ignored)
-            name_sim = 0.0 if ignore_name else advanced_name_similarity_cached(piggy_row['name'], ctx_row['name'])
-            
-            # Calculate street address similarity (only when ignoring geographic components)
-            street_addr_sim = 0.0
-            if include_address and (ignore_city or ignore_state or ignore_zip):
-                street_addr_sim = street_address_similarity(piggy_row['address1'], ctx_row['address1'])
-
-            # Calculate confidence using new algorithm
-            confidence = calculate_confidence_score_new(
-                distance, name_sim, street_addr_sim, piggy_row, ctx_row,
-                ignore_name, ignore_city, ignore_state, ignore_zip
-            )
-            
-            # Apply minimum thresholds
-            if not ignore_name and name_sim < min_name_sim:
-                continue
-            
-            if confidence < min_confidence:
-                continue
-            
-            # Create match record
-            match_info = {
-                'piggy_index': piggy_idx,
-                'ctx_index': ctx_idx,
-                'distance_miles': distance,
-                'name_similarity': name_sim,
-                'address_similarity': street_addr_sim,
-                'confidence': confidence,
-                'reasons': f"truncated_coordinates_{coordinate_precision}dp, coordinate_priority_match",
-                'city_match': not ignore_city,
-                'state_match': not ignore_state,
-                'geographic_warning': ''
-            }
-            
-            all_matches.append(match_info)
-            matched_piggy_indices.add(piggy_idx)
-            matched_ctx_indices.add(ctx_idx)
+        # Spawn (not fork) so the worker never inherits Tk state
+        mp_context = multiprocessing.get_context('spawn')
+        events = mp_context.Queue()
+        cancel_event = mp_context.Event()
+        settings = self.get_settings()
+        settings['candidate_cache_file'] = str(self.candidate_cache_file)
+        settings['snapshot_dir'] = str(self.snapshot_dir)
+        process = mp_context.Process(target=run_job_process,
+                                     args=(job_name, settings, events, cancel_event),
+                                     daemon=True)
+        
+        button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        if determinate:
+            progress_bar['value'] = 0
+        else:
+            progress_bar.start()
+        progress_var.set("Starting...")
         
-        self.log_message(f"Found {len(exact_coordinate_matches)} truncated coordinate matches")
+        process.start()
+        self.job = {
+            'process': process,
+            'events': events,
+            'cancel_event': cancel_event,
+            'cancel_deadline': None,
+            'button': button,
+            'progress_var': progress_var,
+            'progress_bar': progress_bar,
+            'determinate': determinate,
+            'ready_text': ready_text,
+            'stage': ''
+        }
+        self.root.after(EVENT_POLL_INTERVAL_MS, self.poll_job_events)
+    
+    def poll_job_events(self):
+        """Drain pending worker events, coalescing progress updates into one widget update"""
+        job = self.job
+        if job is None:
+            return
         
-        # STEP 2: PROXIMITY MATCHING for remaining locations (only if needed)
-        remaining_piggy = len(piggy_df) - len(matched_piggy_indices)
-        remaining_ctx = len(ctx_df) - len(matched_ctx_indices)
+        process_alive = job['process'].is_alive()
+        log_lines = []
+        last_stage = None
+        last_progress = None
+        finished = None
+        drained = False
         
-        if remaining_piggy > 0 and remaining_ctx > 0:
-            self.log_message(f"Step 2: Processing {remaining_piggy} remaining Piggy locations")
-            
-            # Create filtered datasets
-            unmatched_piggy_mask = ~piggy_df.index.isin(matched_piggy_indices)
-            unmatched_ctx_mask = ~ctx_df.index.isin(matched_ctx_indices)
-            
-            remaining_piggy_df = piggy_df[unmatched_piggy_mask]
-            remaining_ctx_df = ctx_df[unmatched_ctx_mask]
+        for _ in range(MAX_EVENTS_PER_POLL):
+            try:
+                event = job['events'].get_nowait()
+            except queue.Empty:
+                drained = True
+                break
             
-            # Process remaining locations with strict coordinate priority
-            for i, piggy_row in remaining_piggy_df.iterrows():
-                if pd.isna(piggy_row['latitude']) or pd.isna(piggy_row['longitude']):
-                    continue
-                
-                # Very restrictive spatial filtering for coordinate priority
-                nearby_ctx = spatial_index_filter(piggy_row['latitude'], piggy_row['longitude'], 
-                                                remaining_ctx_df, max_distance)
-                
-                if len(nearby_ctx) == 0:
-                    continue
-                
-                # Calculate distances
-                distances = haversine_vectorized(
-                    piggy_row['latitude'], piggy_row['longitude'],
-                    nearby_ctx['latitude'].values, nearby_ctx['longitude'].values
-                )
-                
-                # Filter by distance
-                distance_mask = distances <= max_distance
-                if not np.any(distance_mask):
-                    continue
-                
-                candidates = nearby_ctx[distance_mask].copy()
-                candidate_distances = distances[distance_mask]
-                
-                location_matches = []
-                
-                for idx, (ctx_idx, ctx_row) in enumerate(candidates.iterrows()):
-                    distance = candidate_distances[idx]
-                    
-                    # Name similarity (if not ignored)
-                    name_sim = 0.0 if ignore_name else advanced_name_similarity_cached(piggy_row['name'], ctx_row['name'])
-                    
-                    # Apply name similarity threshold (if not ignored)
-                    if not ignore_name and name_sim < min_name_sim:
-                        continue
-                    
-                    # Street address similarity (only when ignoring geographic components)
-                    street_addr_sim = 0.0
-                    if include_address and (ignore_city or ignore_state or ignore_zip):
-                        street_addr_sim = street_address_similarity(piggy_row['address1'], ctx_row['address1'])
-                    
-                    # Calculate confidence with coordinate priority
-                    confidence = calculate_confidence_score_new(
-                        distance, name_sim, street_addr_sim, piggy_row, ctx_row,
-                        ignore_name, ignore_city, ignore_state, ignore_zip
-                    )
-                    
-                    if confidence < min_confidence:
-                        continue
-                    
-                    # Create match record
-                    match_info = {
-                        'piggy_index': i,
-                        'ctx_index': ctx_idx,
-                        'distance_miles': distance,
-                        'name_similarity': name_sim,
-                        'address_similarity': street_addr_sim,
-                        'confidence': confidence,
-                        'reasons': f"coordinate_priority_proximity, distance_{distance:.3f}mi",
-                        'city_match': not ignore_city,
-                        'state_match': not ignore_state,
-                        'geographic_warning': ''
-                    }
-                    
-                    location_matches.append(match_info)
-                
-                # Sort by confidence and add matches
-                if location_matches:
-                    location_matches.sort(key=lambda x: x['confidence'], reverse=True)
-                    
-                    if show_all_matches:
-                        all_matches.extend(location_matches)
-                    else:
-                        all_matches.append(location_matches[0])
-        
-        self.log_message(f"Total matches found: {len(all_matches)}")
-        return all_matches
+            kind = event[0]
+            if kind == 'log':
+                log_lines.append(event[1])
+            elif kind == 'stage':
+                last_stage = event[1]
+            elif kind == 'progress':
+                last_progress = event[1:]
+            else:
+                finished = event
+                break
+        
+        if log_lines:
+            self.log_message("\n".join(log_lines))
+        
+        if last_stage is not None:
+            job['stage'] = last_stage
+            job['progress_var'].set(last_stage)
+        
+        if last_progress is not None:
+            current, total = last_progress
+            percentage = (current / total) * 100 if total else 100.0
+            if job['determinate']:
+                job['progress_bar']['maximum'] = total
+                job['progress_bar']['value'] = current
+            stage = job['stage'].rstrip('.') or "Processing"
+            job['progress_var'].set(f"{stage}... {current}/{total} ({percentage:.1f}%)")
+        
+        if finished is None:
+            if job['cancel_deadline'] is not None and time.monotonic() > job['cancel_deadline']:
+                # Worker did not stop in time - force it
+                job['process'].terminate()
+                finished = ('cancelled',)
+            elif not process_alive and drained:
+                finished = ('error', f"Worker process exited unexpectedly (exit code {job['process'].exitcode})")
+        
+        if finished is None:
+            self.root.after(EVENT_POLL_INTERVAL_MS, self.poll_job_events)
+        else:
+            self.finish_job(finished)
+    
+    def finish_job(self, event):
+        """Restore the GUI after a job finished, failed or was cancelled"""
+        job = self.job
+        self.job = None
+        
+        if job['determinate']:
+            job['progress_bar']['value'] = 0
+        else:
+            job['progress_bar'].stop()
+        job['button'].config(state="normal")
+        self.cancel_button.config(state="disabled")
+        job['progress_var'].set(job['ready_text'])
+        job['process'].join(timeout=1)
+        
+        kind = event[0]
+        if kind == 'done':
+            result = event[1]
+            # Pick up the candidate table written by the run
+            if result.get('candidate_cache_file'):
+                self.candidate_cache = None
+                self.update_threshold_preview()
+            if result.get('report_file'):
+                self.last_report_file = result['report_file']
+            # Auto-open results if enabled; reports open in the results browser
+            if self.auto_open_results.get():
+                if result.get('report_file'):
+                    self.open_results_browser(result['report_file'])
+                else:
+                    self.open_results_file(result['output_file'])
+            messagebox.showinfo(result['title'], result['message'])
+        elif kind == 'cancelled':
+            self.log_message("Job cancelled")
+            self.status_var.set("Job cancelled")
+        else:
+            self.log_message(f"Error: {event[1]}")
+            messagebox.showerror("Error", f"An error occurred:\n{event[1]}")
+    
+    def cancel_job(self):
+        """Ask the running worker to stop; it is terminated if it does not stop in time"""
+        if self.job is None or self.job['cancel_deadline'] is not None:
+            return
+        
+        self.job['cancel_event'].set()
+        self.job['cancel_deadline'] = time.monotonic() + CANCEL_GRACE_SECONDS
+        self.cancel_button.config(state="disabled")
+        self.job['progress_var'].set("Cancelling...")
+    
+    def browse_results(self):
+        """Open the last report, or a chosen one, in the results browser"""
+        report_file = self.last_report_file
+        if not report_file or not os.path.exists(report_file):
+            report_file = filedialog.askopenfilename(
+                title="Select Comparison Report", initialdir=self.output_dir.get() or None,
+                filetypes=[("Comparison reports", "*.csv *.csv.gz *.csv.zst"), ("All files", "*.*")])
+        if report_file:
+            self.open_results_browser(report_file)
+
+    def open_results_browser(self, report_file):
+        try:
+            ResultsBrowser(self.root, report_file)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open report:\n{e}")
+
+    def open_results_file(self, output_file):
+        try:
+            if sys.platform.startswith('win'):
+                os.startfile(output_file)
+            elif sys.platform == 'darwin':
+                os.system(f'open "{output_file}"')
+            else:
+                os.system(f'xdg-open "{output_file}" >/dev/null 2>&1 &')
+        except Exception:
+            pass
     
     def on_closing(self):
         """Handle window closing"""
+        if self.job is not None:
+            self.job['cancel_event'].set()
+            self.job['process'].terminate()
         self.save_settings()
         self.root.destroy()
 
-def main():
+# Defaults for command line runs (the GUI keeps its own in load_settings)
+DEFAULT_SETTINGS = {
+    'piggy_file': '',
+    'ctx_file': '',
+    'geocoding_file': '',
+    'dedup_file': '',
+    'output_dir': '.',
+    'max_distance': 2.0,
+    'min_name_similarity': 0.6,
+    'min_confidence': 0.5,
+    'coordinate_precision': 4,
+    'coordinate_cascade': False,
+    'ignore_state_matching': False,
+    'ignore_city_matching': False,
+    'ignore_zip_matching': False,
+    'ignore_name_matching': False,
+    'include_address_matching': True,
+    'prune_house_number_mismatch': False,
+    'plus_code_matching': False,
+    'plus_code_lengths': "10",
+    'key_matching': False,
+    'key_match_max_distance': 0.25,
+    'name_lsh': False,
+    'adaptive_radius': False,
+    'adaptive_min_distance': 0.1,
+    'adaptive_target_candidates': 50,
+    'nearest_candidates': 0,
+    'nearest_early_stop': False,
+    'show_all_potential_matches': True,
+    'batch_size': 200,
+    'enable_reverse_geocoding': False,
+    'report_compression': 'none',
+    'dataframe_backend': 'pandas',
+    'geocoding_batch_size': 100,
+    'resume_from_checkpoint': True,
+    'tiled_matching': False,
+    'tile_size_degrees': 1.0,
+    'sweep_max_distances': "0.25, 0.5, 1.0, 2.0",
+    'sweep_min_name_similarities': "0.5, 0.6, 0.7, 0.8",
+    'sweep_min_confidences': "0.5",
+    'sweep_coordinate_precisions': "3, 4",
+    'sweep_write_reports': False,
+    'batch_piggy_files': [],
+    'batch_ctx_files': [],
+    'batch_workers': 1,
+    'shard_count': 4,
+    'manifest_file': '',
+    'shard_number': 0,
+    'candidate_cache_file': None,
+    'snapshot_dir': None,
+    'service_host': '127.0.0.1',
+    'service_port': 8765
+}
+
+def build_arg_parser():
+    """Command line interface; without a command the GUI is started"""
+    parser = argparse.ArgumentParser(
+        prog="merchant_comparison.py",
+        description="Advanced merchant location comparison tool. Starts the GUI when no command is given.")
+    parser.add_argument('--version', action='version', version=f"%(prog)s {__version__}")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    # Options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-o', '--output-dir', dest='output_dir', default=DEFAULT_SETTINGS['output_dir'],
+                        help="directory for result files (default: current directory)")
+    common.add_argument('--no-resume', dest='resume_from_checkpoint', action='store_false',
+                        help="ignore checkpoints left by an interrupted run")
+    common.add_argument('--backend', dest='dataframe_backend', choices=list(DATAFRAME_BACKENDS),
+                        default=DEFAULT_SETTINGS['dataframe_backend'],
+                        help="library for loading the CSV files and finding unmatched rows; "
+                             "polars needs the polars package (default: %(default)s)")
+
+    # Report options shared by the commands writing a comparison report
+    report = argparse.ArgumentParser(add_help=False)
+    report.add_argument('--compress', dest='report_compression', choices=list(REPORT_COMPRESSION_SUFFIXES),
+                        default=DEFAULT_SETTINGS['report_compression'],
+                        help="compress the report; zstd needs the zstandard package (default: %(default)s)")
+
+    # Scoring options shared by every command that matches locations, dedup included
+    scoring = argparse.ArgumentParser(add_help=False)
+    scoring.add_argument('--max-distance', type=float, default=DEFAULT_SETTINGS['max_distance'],
+                         help="maximum distance in miles (default: %(default)s)")
+    scoring.add_argument('--min-name-similarity', type=float, default=DEFAULT_SETTINGS['min_name_similarity'],
+                         help="minimum name similarity (default: %(default)s)")
+    scoring.add_argument('--min-confidence', type=float, default=DEFAULT_SETTINGS['min_confidence'],
+                         help="minimum confidence score (default: %(default)s)")
+    scoring.add_argument('--ignore-state', dest='ignore_state_matching', action='store_true')
+    scoring.add_argument('--ignore-city', dest='ignore_city_matching', action='store_true')
+    scoring.add_argument('--ignore-zip', dest='ignore_zip_matching', action='store_true')
+    scoring.add_argument('--ignore-name', dest='ignore_name_matching', action='store_true')
+    scoring.add_argument('--no-address', dest='include_address_matching', action='store_false',
+                         help="disable street address similarity")
+    scoring.add_argument('--prune-house-numbers', dest='prune_house_number_mismatch', action='store_true',
+                         help="skip candidates whose house numbers differ")
+    scoring.add_argument('--snapshot-dir', dest='snapshot_dir', metavar='DIR',
+                         help="keep preprocessed snapshots of the input files in DIR for faster reruns")
+
+    # Matching options of the commands matching Piggy rows to CTX rows (not dedup)
+    matching = argparse.ArgumentParser(add_help=False, parents=[scoring])
+    matching.add_argument('--coordinate-precision', type=int, default=DEFAULT_SETTINGS['coordinate_precision'],
+                          help="decimal places for exact coordinate matching (default: %(default)s)")
+    matching.add_argument('--coordinate-cascade', dest='coordinate_cascade', action='store_true',
+                          help="match exact locations from 6 decimal places down to --coordinate-precision, "
+                               "neighbouring cells included")
+    matching.add_argument('--plus-codes', dest='plus_code_matching', action='store_true',
+                          help="match co-located rows by plus code before proximity matching")
+    matching.add_argument('--plus-code-lengths', dest='plus_code_lengths', default=DEFAULT_SETTINGS['plus_code_lengths'],
+                          help="plus code prefix lengths to join on (default: %(default)s)")
+    matching.add_argument('--key-matching', dest='key_matching', action='store_true',
+                          help="first match rows sharing a phone number or website and a similar name")
+    matching.add_argument('--key-match-distance', dest='key_match_max_distance', type=float,
+                          default=DEFAULT_SETTINGS['key_match_max_distance'],
+                          help="maximum distance in miles for phone/website matches (default: %(default)s)")
+    matching.add_argument('--name-lsh', dest='name_lsh', action='store_true',
+                          help="score only name-similar pairs (MinHash LSH) and match rows without "
+                               "coordinates by name and state")
+    matching.add_argument('--adaptive-radius', dest='adaptive_radius', action='store_true',
+                          help="shrink the search radius where CTX rows are dense, up to --max-distance")
+    matching.add_argument('--adaptive-min-distance', dest='adaptive_min_distance', type=float,
+                          default=DEFAULT_SETTINGS['adaptive_min_distance'],
+                          help="smallest adaptive radius in miles (default: %(default)s)")
+    matching.add_argument('--adaptive-candidates', dest='adaptive_target_candidates', type=int,
+                          default=DEFAULT_SETTINGS['adaptive_target_candidates'],
+                          help="CTX rows the adaptive radius aims to reach (default: %(default)s)")
+    matching.add_argument('--nearest', dest='nearest_candidates', type=int, metavar='K',
+                          default=DEFAULT_SETTINGS['nearest_candidates'],
+                          help="score only the K closest CTX rows of each Piggy row (default: all)")
+    matching.add_argument('--nearest-early-stop', dest='nearest_early_stop', action='store_true',
+                          help="with --nearest and --best-only, stop scoring a row's candidates once none can "
+                               "beat its best match; a row whose best CTX row is taken elsewhere gets no match")
+    matching.add_argument('--batch-size', type=int, default=DEFAULT_SETTINGS['batch_size'],
+                          help="rows per checkpointed batch (default: %(default)s)")
+    matching.add_argument('--candidate-cache', dest='candidate_cache_file', metavar='FILE',
+                          help="reuse/store the scored candidate table in FILE")
+
+    compare = commands.add_parser('compare', parents=[common, matching, report], help="compare a Piggy and a CTX CSV file")
+    compare.add_argument('piggy_file', help="Piggy CSV file")
+    compare.add_argument('ctx_file', help="CTX CSV file")
+    compare.add_argument('--best-only', dest='show_all_potential_matches', action='store_false',
+                         help="keep only the best match per Piggy location")
+    compare.add_argument('--tiled', dest='tiled_matching', action='store_true',
+                         help="partition both files by tile on disk and match tile by tile (low memory)")
+    compare.add_argument('--tile-size', dest='tile_size_degrees', type=float, default=DEFAULT_SETTINGS['tile_size_degrees'],
+                         help="tile size in degrees for --tiled (default: %(default)s)")
+    compare.add_argument('--reverse-geocoding', dest='enable_reverse_geocoding', action='store_true',
+                         help="add corrected city/state columns (slow)")
+    compare.set_defaults(job='comparison')
+
+    batch = commands.add_parser('batch', parents=[common, matching, report],
+                                help="compare several Piggy files with one or more CTX files, loading each CTX file once")
+    batch.add_argument('--piggy', dest='batch_piggy_files', nargs='+', required=True, metavar='FILE',
+                       help="Piggy CSV files")
+    batch.add_argument('--ctx', dest='batch_ctx_files', nargs='+', required=True, metavar='FILE',
+                       help="CTX CSV files; every Piggy file is compared with each")
+    batch.add_argument('--workers', dest='batch_workers', type=int, default=DEFAULT_SETTINGS['batch_workers'],
+                       help="comparisons run in parallel processes (default: %(default)s)")
+    batch.add_argument('--best-only', dest='show_all_potential_matches', action='store_false',
+                       help="keep only the best match per Piggy location")
+    batch.set_defaults(job='batch')
+
+    dedup = commands.add_parser('dedup', parents=[common, scoring], help="find duplicates inside one CSV file")
+    dedup.add_argument('dedup_file', help="CSV file to deduplicate")
+    dedup.set_defaults(job='self_dedup')
+
+    geocode = commands.add_parser('geocode', parents=[common], help="add corrected city/state to a CSV file")
+    geocode.add_argument('geocoding_file', help="CSV file to geocode")
+    geocode.set_defaults(job='geocoding')
+
+    sweep = commands.add_parser('sweep', parents=[common, matching, report], help="evaluate a grid of thresholds")
+    sweep.add_argument('piggy_file', help="Piggy CSV file")
+    sweep.add_argument('ctx_file', help="CTX CSV file")
+    sweep.add_argument('--max-distances', dest='sweep_max_distances', default=DEFAULT_SETTINGS['sweep_max_distances'])
+    sweep.add_argument('--min-name-similarities', dest='sweep_min_name_similarities',
+                       default=DEFAULT_SETTINGS['sweep_min_name_similarities'])
+    sweep.add_argument('--min-confidences', dest='sweep_min_confidences',
+                       default=DEFAULT_SETTINGS['sweep_min_confidences'])
+    sweep.add_argument('--coordinate-precisions', dest='sweep_coordinate_precisions',
+                       default=DEFAULT_SETTINGS['sweep_coordinate_precisions'])
+    sweep.add_argument('--write-reports', dest='sweep_write_reports', action='store_true',
+                       help="write a full report for every setting")
+    sweep.set_defaults(job='sweep')
+
+    # Distributed comparison: plan shards, run each anywhere, merge the results
+    plan = commands.add_parser('plan', parents=[common, matching],
+                               help="split a comparison into geographic shards and write a manifest")
+    plan.add_argument('piggy_file', help="Piggy CSV file")
+    plan.add_argument('ctx_file', help="CTX CSV file")
+    plan.add_argument('--shards', dest='shard_count', type=int, default=DEFAULT_SETTINGS['shard_count'],
+                      help="number of shards (default: %(default)s)")
+    plan.add_argument('--tile-size', dest='tile_size_degrees', type=float, default=DEFAULT_SETTINGS['tile_size_degrees'],
+                      help="tile size in degrees; shards are made of whole tiles (default: %(default)s)")
+    plan.add_argument('--best-only', dest='show_all_potential_matches', action='store_false',
+                      help="keep only the best match per Piggy location")
+    plan.add_argument('--reverse-geocoding', dest='enable_reverse_geocoding', action='store_true',
+                      help="add corrected city/state columns when merging (slow)")
+    plan.set_defaults(job='shard_plan')
+
+    run_shard_command = commands.add_parser('run-shard', parents=[common],
+                                            help="score one shard of a plan (settings come from the manifest)")
+    run_shard_command.add_argument('manifest_file', help="manifest.json written by plan")
+    run_shard_command.add_argument('shard_number', type=int, help="shard number, starting at 0")
+    run_shard_command.set_defaults(job='shard')
+
+    merge = commands.add_parser('merge', parents=[common, report], help="combine finished shards into the comparison report")
+    merge.add_argument('manifest_file', help="manifest.json written by plan")
+    merge.set_defaults(job='shard_merge')
+
+    serve = commands.add_parser('serve', parents=[common, matching],
+                                help="answer match queries against a CTX file over local HTTP/JSON")
+    serve.add_argument('ctx_file', help="CTX CSV file, or an index file written by build-index")
+    serve.add_argument('--host', dest='service_host', default=DEFAULT_SETTINGS['service_host'],
+                       help="address to listen on (default: %(default)s)")
+    serve.add_argument('--port', dest='service_port', type=int, default=DEFAULT_SETTINGS['service_port'],
+                       help="port to listen on (default: %(default)s)")
+    serve.add_argument('--best-only', dest='show_all_potential_matches', action='store_false',
+                       help="return only the best match per record")
+    serve.set_defaults(job='serve')
+
+    build_index = commands.add_parser('build-index', parents=[common, matching],
+                                      help="save a match index of a CTX file for serve and MerchantIndex.load")
+    build_index.add_argument('ctx_file', help="CTX CSV file to index")
+    build_index.add_argument('--best-only', dest='show_all_potential_matches', action='store_false',
+                             help="return only the best match per record")
+    build_index.set_defaults(job='build_index')
+
+    return parser
+
+def missing_packages(names):
+    """Packages from names that are not installed, checked without importing them"""
+    return [name for name in names if importlib.util.find_spec(name) is None]
+
+def run_command(args):
+    """Run a job from the command line, printing its log to stdout"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({key: value for key, value in vars(args).items() if key in DEFAULT_SETTINGS})
+
+    required = ['pandas', 'numpy']
+    if args.job == 'geocoding' or settings['enable_reverse_geocoding']:
+        required.append('geopy')
+    if settings['report_compression'] == 'zstd':
+        required.append('zstandard')
+    if settings['dataframe_backend'] == 'polars':
+        required.append('polars')
+    missing = missing_packages(required)
+    if missing:
+        print(f"Missing packages: {', '.join(missing)}\n"
+              f"Please install them using:\npip install {' '.join(missing)}", file=sys.stderr)
+        return 1
+
+    try:
+        result = JOBS[args.job](settings, JobReporter())
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+    print(f"\n{result['title']}: {result['output_file']}")
+    return 0
+
+def run_gui():
+    # Handle missing packages gracefully
+    # geopy is only checked when reverse geocoding is first used (see get_geocoder)
+    missing = missing_packages(['pandas', 'numpy'])
+    if missing:
+        root = tk.Tk()
+        root.withdraw()
+        messagebox.showerror("Missing Dependencies",
+                           f"The following packages need to be installed:\n{', '.join(missing)}\n\n"
+                           "Please install them using:\npip install " + " ".join(missing))
+        return 1
+
     root = tk.Tk()
     app = MerchantComparisonGUI(root)
     root.mainloop()
+    return 0
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command is None:
+        return run_gui()
+    return run_command(args)
 
 if __name__ == "__main__":
-    # Handle missing packages gracefully
-    missing_packages = []
-    
-    try:
-        import pandas as pd
-    except ImportError:
-        missing_packages.append("pandas")
-    
-    try:
-        import geopy
-    except ImportError:
-        missing_packages.append("geopy")
-    
-    if missing_packages:
-        root = tk.Tk()
-        root.withdraw()
-        messagebox.showerror("Missing Dependencies", 
-                           f"The following packages need to be installed:\n{', '.join(missing_packages)}\n\n"
-                           "Please install them using:\npip install " + " ".join(missing_packages))
-        sys.exit(1)
-    
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,475 @@
+"""Tests of merchant_comparison.
+
+fixtures/piggy.csv and fixtures/ctx.csv hold scattered locations, a dense
+cluster and a few rows without coordinates. fixtures/baseline_report.csv is
+the report the original row-by-row matcher wrote for them with the default
+settings. Run with: python -m pytest src/test/python
+"""
+import glob
+import http.client
+import json
+import os
+import queue
+import shutil
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'main', 'python'))
+
+import merchant_comparison  # noqa: E402
+
+FIXTURES = os.path.join(HERE, 'fixtures')
+PIGGY_FILE = os.path.join(FIXTURES, 'piggy.csv')
+CTX_FILE = os.path.join(FIXTURES, 'ctx.csv')
+# The cluster around 40, -100 sits on a tile corner, so pairs across tile edges are exercised
+TILE_SIZE = '2'
+
+
+def locations(*rows):
+    """DataFrame of dataset rows in Springfield, IL from (name, address, latitude, longitude)"""
+    return pd.DataFrame([{'name': name, 'address1': address, 'city': 'Springfield', 'territory': 'IL',
+                          'state': 'IL', 'zip': '62701', 'latitude': lat, 'longitude': lon}
+                         for name, address, lat, lon in rows])
+
+
+def read_report(path):
+    """A report CSV as text, so values compare exactly as written"""
+    return pd.read_csv(path, keep_default_na=False, dtype=str)
+
+
+def run_job(output_dir, *args):
+    """Run a command-line job writing to output_dir and return its comparison report"""
+    os.makedirs(output_dir, exist_ok=True)
+    assert merchant_comparison.main([*args, '-o', str(output_dir)]) == 0
+    report_file, = glob.glob(os.path.join(output_dir, 'coordinate_priority_comparison_*.csv'))
+    return read_report(report_file)
+
+
+def compare(output_dir, *args):
+    """Report of a compare run on the fixture"""
+    return run_job(output_dir, 'compare', PIGGY_FILE, CTX_FILE, '--no-resume', *args)
+
+
+def sorted_rows(report):
+    """Rows of a report in a fixed order, for runs that write them in a different one"""
+    return report.sort_values(list(report.columns)).reset_index(drop=True)
+
+
+def test_self_duplicates_are_grouped():
+    df = locations(("Joe's Pizza", '12 Main St', 39.8000, -89.6),
+                   ('Joes Pizza', '12 Main St', 39.8001, -89.6),
+                   ("Joe's Pizza", '12 Main St', 39.8002, -89.6),
+                   ('Corner Bakery', '14 Main St', 39.8003, -89.6),
+                   ("Joe's Pizza", '12 Main St', 41.0, -89.6))
+    pairs = merchant_comparison.find_self_duplicates(df, max_distance_miles=0.1)
+    # Every unordered pair once, never a row with itself
+    assert sorted((pair['first_index'], pair['second_index']) for pair in pairs) == [(0, 1), (0, 2), (1, 2)]
+    assert merchant_comparison.group_self_duplicates(pairs) == [[0, 1, 2]]
+
+    report = merchant_comparison.create_self_dedup_report(df, pairs)
+    assert report['duplicate_group'].tolist() == [1, 1, 1]
+    assert report['group_size'].tolist() == [3, 3, 3]
+
+
+def test_job_reporter_coalesces_progress_events():
+    events = queue.Queue()
+    reporter = merchant_comparison.JobReporter(events, min_interval=60)
+    for current in range(1, 101):
+        reporter.progress(current, 100)
+    reporter.log('done')
+    delivered = []
+    while not events.empty():
+        delivered.append(events.get())
+    # Only the first and the final progress event get through; log events always do
+    assert delivered == [('progress', 1, 100), ('progress', 100, 100), ('log', 'done')]
+
+
+def test_job_reporter_raises_when_cancelled():
+    cancel_event = threading.Event()
+    reporter = merchant_comparison.JobReporter(queue.Queue(), cancel_event)
+    reporter.progress(1, 10)
+    cancel_event.set()
+    with pytest.raises(merchant_comparison.AnalysisCancelled):
+        reporter.progress(2, 10)
+
+
+def test_job_checkpoint_resumes_completed_units(tmp_path):
+    path = str(tmp_path / 'job.checkpoint')
+    checkpoint = merchant_comparison.JobCheckpoint(path, 'inputs-1')
+    checkpoint.record('batch_0', {'matches': [1, 2]})
+    checkpoint.record('batch_1', {'matches': []})
+    checkpoint.close()
+    # A crash in the middle of writing the next unit
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "batch_2", "da')
+
+    resumed = merchant_comparison.JobCheckpoint(path, 'inputs-1', resume=True)
+    assert resumed.completed == {'batch_0': {'matches': [1, 2]}, 'batch_1': {'matches': []}}
+    resumed.record('batch_2', {'matches': [3]})
+    resumed.close()
+    resumed = merchant_comparison.JobCheckpoint(path, 'inputs-1', resume=True)
+    assert list(resumed.completed) == ['batch_0', 'batch_1', 'batch_2']
+    resumed.close()
+
+    # Changed inputs or settings start over
+    changed = merchant_comparison.JobCheckpoint(path, 'inputs-2', resume=True)
+    assert changed.completed == {}
+    changed.close(remove=True)
+    assert not os.path.exists(path)
+
+
+def test_sweep_with_nearest_candidates_matches_compare(tmp_path):
+    sweep_dir = tmp_path / 'sweep'
+    os.makedirs(sweep_dir)
+    assert merchant_comparison.main(['sweep', PIGGY_FILE, CTX_FILE, '--nearest', '1', '--max-distances', '2',
+                                     '--min-name-similarities', '0.6', '--coordinate-precisions', '2, 4',
+                                     '--write-reports', '--no-resume', '-o', str(sweep_dir)]) == 0
+    reports = sorted(glob.glob(str(sweep_dir / 'threshold_sweep_*_[0-9][0-9][0-9].csv')))
+    assert len(reports) == 2
+    # The co-located candidates --nearest always keeps depend on the coordinate precision
+    for report_file, precision in zip(reports, ('2', '4')):
+        single = compare(tmp_path / f'compare_{precision}', '--nearest', '1', '--coordinate-precision', precision)
+        pd.testing.assert_frame_equal(sorted_rows(read_report(report_file)), sorted_rows(single))
+
+
+def test_street_address_is_parsed_once_into_parts():
+    parsed = merchant_comparison.parse_street_address('123 Main St. Apt 4B, Springfield, IL, 62701')
+    assert parsed == ('123 main st apt 4b', '123', ('main', 'st', 'apt', '4b'), '4b')
+    assert merchant_comparison.parse_street_address('Main Street')[1:3] == ('', ('main', 'street'))
+    assert merchant_comparison.parse_street_address('') == (None, '', (), '')
+
+
+def test_house_number_mask_prunes_only_different_numbers():
+    others = np.array(['12', '14', ''], dtype=object)
+    assert merchant_comparison.house_number_mask('12', others).tolist() == [True, False, True]
+    assert merchant_comparison.house_number_mask('', others).tolist() == [True, True, True]
+
+
+def test_self_duplicates_with_different_house_numbers_are_pruned():
+    df = locations(('Corner Bakery', '12 Main St', 39.8000, -89.6),
+                   ('Corner Bakery', '14 Main St', 39.8001, -89.6))
+    options = dict(max_distance_miles=0.1, ignore_city=True)
+    assert len(merchant_comparison.find_self_duplicates(df, **options)) == 1
+    assert merchant_comparison.find_self_duplicates(df, prune_house_numbers=True, **options) == []
+
+
+def test_default_report_matches_baseline(tmp_path):
+    # Key, plus code and name LSH matching are all off by default
+    baseline = read_report(os.path.join(FIXTURES, 'baseline_report.csv'))
+    pd.testing.assert_frame_equal(compare(tmp_path / 'default'), baseline)
+
+
+def test_tiled_report_matches_in_memory(tmp_path):
+    # With name LSH the rows without coordinates are matched by name too
+    for run, args in enumerate(((), ('--name-lsh',))):
+        in_memory = compare(tmp_path / f'in_memory_{run}', *args)
+        tiled = compare(tmp_path / f'tiled_{run}', '--tiled', '--tile-size', TILE_SIZE, *args)
+        assert len(in_memory) > 0
+        pd.testing.assert_frame_equal(sorted_rows(tiled), sorted_rows(in_memory))
+
+
+def test_sharded_report_matches_in_memory(tmp_path):
+    in_memory = compare(tmp_path / 'in_memory')
+    shard_dir = tmp_path / 'shards'
+    assert merchant_comparison.main(['plan', PIGGY_FILE, CTX_FILE, '--shards', '3', '--tile-size', TILE_SIZE,
+                                     '-o', str(shard_dir)]) == 0
+    manifest_file = str(shard_dir / 'manifest.json')
+    for shard_number in range(3):
+        assert merchant_comparison.main(['run-shard', manifest_file, str(shard_number)]) == 0
+    merged = run_job(tmp_path / 'merged', 'merge', manifest_file)
+    pd.testing.assert_frame_equal(sorted_rows(merged), sorted_rows(in_memory))
+
+
+def test_snapshot_reruns_match_and_skip_hashing_unchanged_files(tmp_path, monkeypatch):
+    snapshot_dir = str(tmp_path / 'snapshots')
+    expected = compare(tmp_path / 'plain', '--plus-codes')
+    pd.testing.assert_frame_equal(compare(tmp_path / 'saved', '--plus-codes', '--snapshot-dir', snapshot_dir), expected)
+
+    hashed = []
+    file_sha1 = merchant_comparison.file_sha1
+    monkeypatch.setattr(merchant_comparison, 'file_sha1', lambda path: hashed.append(path) or file_sha1(path))
+    pd.testing.assert_frame_equal(compare(tmp_path / 'loaded', '--plus-codes', '--snapshot-dir', snapshot_dir), expected)
+    assert hashed == []
+
+    # Derived columns come from the snapshot as they would be computed
+    rows, _ = merchant_comparison.load_dataset(PIGGY_FILE, snapshot_dir)
+    plain = rows[['latitude', 'longitude', 'plusCode']]
+    np.testing.assert_array_equal(merchant_comparison.coordinate_radians(rows),
+                                  merchant_comparison.coordinate_radians(plain))
+    np.testing.assert_array_equal(merchant_comparison.plus_code_cells(rows, 8),
+                                  merchant_comparison.plus_code_cells(plain, 8))
+
+    # A new modification time hashes the file again, and the same contents load the same snapshot
+    stat = os.stat(PIGGY_FILE)
+    piggy_copy = str(tmp_path / 'piggy.csv')
+    shutil.copyfile(PIGGY_FILE, piggy_copy)
+    os.utime(piggy_copy, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    merchant_comparison.load_dataset(piggy_copy, snapshot_dir)
+    assert hashed == [piggy_copy]
+    assert len(glob.glob(os.path.join(snapshot_dir, '*', 'snapshot.json'))) == 2
+
+
+def test_registrable_domain_keeps_second_level_country_domains():
+    assert merchant_comparison.registrable_domain('https://www.shop.example.co.uk/menu') == 'example.co.uk'
+    assert merchant_comparison.registrable_domain('order.example.com.au') == 'example.com.au'
+    # A two-letter top-level domain alone does not make a second-level domain
+    assert merchant_comparison.registrable_domain('www.example.io') == 'example.io'
+    assert merchant_comparison.registrable_domain('shop.example.de') == 'example.de'
+    assert merchant_comparison.registrable_domain('facebook.com/joespizza') == ''
+    assert merchant_comparison.registrable_domain('localhost') == ''
+
+
+def test_key_match_needs_similar_names(tmp_path):
+    # A reused phone number: the closer CTX row is a different merchant
+    piggy = locations(("Joe's Pizza", '12 Main St', 40.0, -100.0)).assign(phone='(555) 123-4567')
+    ctx = locations(('Quick Lube', '20 Main St', 40.0015, -100.0),
+                    ('Joes Pizza', '12 Main St', 40.0029, -100.0)).assign(phone='555-123-4567')
+    piggy_file, ctx_file = str(tmp_path / 'piggy.csv'), str(tmp_path / 'ctx.csv')
+    piggy.to_csv(piggy_file, index=False)
+    ctx.to_csv(ctx_file, index=False)
+    report = run_job(tmp_path / 'report', 'compare', piggy_file, ctx_file, '--no-resume', '--key-matching')
+    key_matches = report[report['match_reasons'].str.contains('phone_key_match')]
+    assert key_matches['ctx_name'].tolist() == ['Joes Pizza']
+
+
+def test_name_pairs_are_scored_once(monkeypatch):
+    calls = []
+    similarity = merchant_comparison.cleaned_name_similarity
+    monkeypatch.setattr(merchant_comparison, 'cleaned_name_similarity',
+                        lambda name1, name2: calls.append((name1, name2)) or similarity(name1, name2))
+    piggy_ids, ctx_ids, vocabulary = merchant_comparison.factorize_names(
+        ['joes pizza', 'joes pizza', 'bakery'], ['joes pizza', 'corner bakery'])
+    piggy_ids, ctx_ids = np.repeat(piggy_ids, 2), np.tile(ctx_ids, 3)
+    scores = {}
+    result = merchant_comparison.score_name_pairs(piggy_ids, ctx_ids, vocabulary, scores)
+    assert result.tolist() == [similarity(vocabulary[i], vocabulary[j]) for i, j in zip(piggy_ids, ctx_ids)]
+    assert len(calls) == 4
+    # The scores are kept for the rest of the run
+    merchant_comparison.score_name_pairs(piggy_ids, ctx_ids, vocabulary, scores)
+    assert len(calls) == 4
+
+
+@pytest.mark.parametrize('compression', ['none', 'gzip', 'zstd'])
+def test_report_writer_streams_compressed_chunks(tmp_path, monkeypatch, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    monkeypatch.setattr(merchant_comparison, 'REPORT_CHUNK_ROWS', 2)
+    path = merchant_comparison.report_file_path(str(tmp_path), 'report', compression)
+    assert path.endswith({'none': '.csv', 'gzip': '.csv.gz', 'zstd': '.csv.zst'}[compression])
+    rows = [{'match_type': 'UNIQUE_TO_PIGGY' if n % 2 else 'HIGH_CONFIDENCE_DUPLICATE',
+             'confidence_score': 0 if n % 2 else 0.95, 'piggy_name': f'Store {n}'} for n in range(5)]
+    with merchant_comparison.ReportWriter(path, compression) as writer:
+        for row in rows:
+            writer.add(row)
+    # One header, then every row in order
+    pd.testing.assert_frame_equal(pd.read_csv(path), pd.DataFrame(rows).astype({'confidence_score': float}))
+
+
+def test_built_index_loads_and_answers_the_same_queries(tmp_path):
+    assert merchant_comparison.main(['build-index', CTX_FILE, '-o', str(tmp_path)]) == 0
+    index_file, = glob.glob(os.path.join(str(tmp_path), '*.mcindex'))
+    assert merchant_comparison.MerchantIndex.is_index_file(index_file)
+    assert not merchant_comparison.MerchantIndex.is_index_file(CTX_FILE)
+    loaded = merchant_comparison.MerchantIndex.load(index_file)
+
+    ctx_rows, _ = merchant_comparison.load_dataset(CTX_FILE)
+    built = merchant_comparison.MerchantIndex.build(ctx_rows, merchant_comparison.DEFAULT_SETTINGS)
+    assert len(loaded) == len(built) == len(ctx_rows)
+    pd.testing.assert_series_equal(pd.Series(loaded.row(7)), pd.Series(built.row(7)))
+
+    queries = pd.read_csv(PIGGY_FILE).dropna(subset=['latitude', 'longitude'])
+    answers = loaded.query_batch(queries)
+    assert len(answers) > 0
+    pd.testing.assert_frame_equal(answers, built.query_batch(queries))
+
+
+@pytest.mark.parametrize('options', [{}, {'name_lsh': True}, {'key_matching': True, 'plus_code_matching': True},
+                                     {'nearest_candidates': 2, 'show_all_potential_matches': False},
+                                     {'nearest_candidates': 2, 'show_all_potential_matches': False,
+                                      'nearest_early_stop': True}])
+def test_index_queries_match_compare(options):
+    settings = dict(merchant_comparison.DEFAULT_SETTINGS, **options)
+    piggy_rows, _ = merchant_comparison.load_dataset(PIGGY_FILE)
+    ctx_rows, _ = merchant_comparison.load_dataset(CTX_FILE)
+    features = merchant_comparison.build_candidate_features(piggy_rows, ctx_rows, settings,
+                                                            merchant_comparison.candidate_radius(settings))
+    matches = sorted((match['piggy_index'], match['ctx_index'], match['confidence'])
+                     for match in merchant_comparison.select_matches_from_features(features, settings))
+
+    # No fixture CTX row is the best match of two Piggy rows, so independent queries find the same pairs
+    answers = merchant_comparison.MerchantIndex.build(ctx_rows, settings).query_batch(piggy_rows)
+    assert len(matches) > 0
+    assert sorted(zip(answers['query_index'], answers['ctx_index'], answers['confidence'])) == matches
+
+
+def test_match_service_answers_and_limits_requests():
+    ctx_rows, _ = merchant_comparison.load_dataset(CTX_FILE)
+    index = merchant_comparison.MerchantIndex.build(ctx_rows, merchant_comparison.DEFAULT_SETTINGS)
+    server = merchant_comparison.make_match_server(index, ctx_file=CTX_FILE)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+
+    def request(method, path, body=None):
+        connection.request(method, path, body)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    record = pd.read_csv(PIGGY_FILE).dropna(subset=['latitude', 'longitude']).fillna('').to_dict('records')[0]
+    expected = [match['ctx_index'] for match in index.query_records([record])[0]]
+    try:
+        assert request('GET', '/health') == (200, {'status': 'ok', 'ctx_file': CTX_FILE, 'ctx_records': len(ctx_rows)})
+        status, answer = request('POST', '/match', json.dumps(record))
+        assert status == 200 and len(expected) > 0
+        assert [match['ctx_index'] for match in answer['matches']] == expected
+
+        status, answer = request('POST', '/match', json.dumps({'records': [record] * 100}))
+        assert status == 200
+        assert [[match['ctx_index'] for match in result['matches']] for result in answer['results']] == [expected] * 100
+        assert request('POST', '/match', json.dumps({'records': [record] * 101}))[0] == 400
+        assert request('POST', '/match', '{"name": ')[0] == 400
+        assert request('GET', '/match')[0] == 404
+
+        # Too large a body is refused before it is sent
+        connection.putrequest('POST', '/match')
+        connection.putheader('Content-Length', str(merchant_comparison.MATCH_SERVICE_MAX_BODY_BYTES + 1))
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 413
+        response.read()
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+
+
+REPORT_TABLE_ROWS = [
+    ['HIGH_CONFIDENCE_DUPLICATE', '0.95', 'Corner "Bakery"', 'IL', 'IL'],
+    ['UNIQUE_TO_PIGGY', '', 'Two\nLines', 'wi', ''],
+    ['MEDIUM_CONFIDENCE_DUPLICATE', '0.75', 'Deli', 'IL', 'IL'],
+    ['UNIQUE_TO_CTX', '', 'Tire Shop', '', 'il'],
+    ['HIGH_CONFIDENCE_DUPLICATE', '0.9', 'Cafe', 'WI', 'WI'],
+]
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_report_table_pages_and_filters(tmp_path, compressed):
+    path = str(tmp_path / ('report.csv.gz' if compressed else 'report.csv'))
+    frame = pd.DataFrame(REPORT_TABLE_ROWS, columns=['match_type', 'confidence_score', 'piggy_name',
+                                                     'piggy_state', 'ctx_territory'])
+    frame.to_csv(path, index=False)
+    table = merchant_comparison.ReportTable(path)
+    try:
+        assert len(table) == 5
+        # A quoted newline does not start a row
+        assert table.rows([1, 4]) == [REPORT_TABLE_ROWS[1], REPORT_TABLE_ROWS[4]]
+        assert table.view(match_type='HIGH_CONFIDENCE_DUPLICATE').tolist() == [0, 4]
+        assert table.view(min_confidence=0.8).tolist() == [0, 4]
+        # The Piggy state, else the CTX territory, in any case
+        assert table.view(state='il').tolist() == [0, 2, 3]
+        # Rows without a confidence come last either way
+        assert table.view(sort_column='confidence_score').tolist() == [2, 4, 0, 1, 3]
+        assert table.view(sort_column='confidence_score', descending=True).tolist() == [0, 4, 2, 3, 1]
+    finally:
+        table.close()
+
+
+def test_name_lsh_finds_near_duplicate_names():
+    piggy_names = ['starbucks coffee', 'mcdonalds', 'joes pizza', 'walgreens pharmacy', '']
+    ctx_names = ['starbucks cofee', 'mc donalds', 'joes pizzeria', 'walgreen pharmacy', 'zebra tire service', '']
+    piggy_ids, ctx_ids, vocabulary = merchant_comparison.factorize_names(piggy_names, ctx_names)
+    codes = merchant_comparison.name_lsh_pairs(piggy_ids, ctx_ids, vocabulary)
+    pairs = {(vocabulary[code // len(vocabulary)], vocabulary[code % len(vocabulary)]) for code in codes.tolist()}
+    # Every near duplicate is a candidate; unrelated and empty names are not
+    assert pairs == set(zip(piggy_names[:4], ctx_names[:4]))
+
+
+def test_adaptive_radius_is_bounded():
+    settings = {'adaptive_target_candidates': 3, 'adaptive_min_distance': 0.1}
+    # Reaches the third closest row
+    assert merchant_comparison.adaptive_search_radius(np.array([0.8, 0.2, 0.6, 0.4]), settings, 1.0) == 0.6
+    # Never below the minimum where rows are dense
+    assert merchant_comparison.adaptive_search_radius(np.array([0.01, 0.02, 0.03, 0.5]), settings, 1.0) == 0.1
+    # The full distance where there are too few rows to reach
+    assert merchant_comparison.adaptive_search_radius(np.array([0.2, 0.4]), settings, 1.0) == 1.0
+
+
+def test_nearest_early_stop_is_opt_in():
+    # The second Piggy row's closest CTX row is the co-located match of the first
+    piggy = locations(("Joe's Pizza", '12 Main St', 39.8000, -89.6), ("Joe's Pizza", '12 Main St', 39.8003, -89.6))
+    ctx = locations(("Joe's Pizza", '12 Main St', 39.8000, -89.6), ("Joe's Pizza", '12 Main St', 39.8030, -89.6))
+
+    def matches(**options):
+        settings = dict(merchant_comparison.DEFAULT_SETTINGS, show_all_potential_matches=False, **options)
+        features = merchant_comparison.build_candidate_features(piggy, ctx, settings,
+                                                                merchant_comparison.candidate_radius(settings))
+        return [(match['piggy_index'], match['ctx_index'])
+                for match in merchant_comparison.select_matches_from_features(features, settings)]
+
+    assert matches(nearest_candidates=5) == matches() == [(0, 0), (1, 1)]
+    # Scoring stops at the closest CTX row, so the second row is not offered the next one
+    assert matches(nearest_candidates=5, nearest_early_stop=True) == [(0, 0)]
+
+
+def test_polars_backend_matches_pandas(tmp_path):
+    pytest.importorskip('polars')
+    # With name LSH the rows without coordinates are loaded and matched by name too
+    for run, args in enumerate(((), ('--name-lsh',))):
+        pandas_report = compare(tmp_path / f'pandas_{run}', '--backend', 'pandas', *args)
+        polars_report = compare(tmp_path / f'polars_{run}', '--backend', 'polars', *args)
+        pd.testing.assert_frame_equal(polars_report, pandas_report)
+
+
+def test_batch_lists_every_comparison(tmp_path):
+    piggy_copy = str(tmp_path / 'piggy_copy.csv')
+    shutil.copy(PIGGY_FILE, piggy_copy)
+    batch_dir = tmp_path / 'batch'
+    assert merchant_comparison.main(['batch', '--piggy', PIGGY_FILE, piggy_copy, '--ctx', CTX_FILE,
+                                     '--no-resume', '-o', str(batch_dir)]) == 0
+    listing_file, = glob.glob(str(batch_dir / 'batch_comparison_*.csv'))
+    listing = pd.read_csv(listing_file)
+    assert listing['piggy_file'].tolist() == [PIGGY_FILE, piggy_copy]
+    assert listing['ctx_file'].tolist() == [CTX_FILE, CTX_FILE]
+    # Each listed report is the report compare writes
+    single = compare(tmp_path / 'single')
+    for report_file in listing['report_file']:
+        pd.testing.assert_frame_equal(read_report(report_file), single)
+
+
+def test_coordinate_cascade_matches_neighbouring_cells():
+    # Just either side of a 3 decimal place cell edge
+    lats = (40.0009999, 40.0010001)
+    settings = {'coordinate_precision': 3, 'coordinate_cascade': False}
+    assert merchant_comparison.coordinate_cell_levels(lats[0], -100.0, lats[1], -100.0, settings) == 0
+    settings['coordinate_cascade'] = True
+    assert merchant_comparison.coordinate_cell_levels(lats[0], -100.0, lats[1], -100.0, settings) == 6
+    assert merchant_comparison.coordinate_cell_levels(40.0, -100.0, 40.0005, -100.0, settings) == 3
+    assert merchant_comparison.coordinate_cell_levels(40.0, -100.0, 40.01, -100.0, settings) == 0
+
+
+def test_reverse_geocoding_waits_for_slow_lookups(monkeypatch):
+    release = threading.Event()
+
+    def lookup(lat, lon):
+        if lat == 40.0:
+            release.wait()  # a lookup slower than any fixed wait
+        if lat == 41.0:
+            raise ValueError("geocoder down")
+        return f'city {lat}', 'IL'
+
+    monkeypatch.setattr(merchant_comparison, 'get_geocoder', lambda: None)
+    monkeypatch.setattr(merchant_comparison, 'reverse_geocode_cached', lookup)
+    with merchant_comparison.ReverseGeocodingPipeline([(40.0, -89.0), (40.5, -89.0)]) as geocoding:
+        threading.Timer(0.2, release.set).start()
+        assert geocoding.location(40.5004, -89.0) == ('city 40.5', 'IL')
+        assert geocoding.location(40.0, -89.0) == ('city 40.0', 'IL')
+        assert geocoding.location(float('nan'), -89.0) == ('', '')
+    assert geocoding.location(42.0, -89.0) == ('', '')
+
+    with merchant_comparison.ReverseGeocodingPipeline([(41.0, -89.0)]) as geocoding:
+        with pytest.raises(RuntimeError, match="geocoder down"):
+            geocoding.location(40.0, -89.0)